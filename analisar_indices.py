@@ -0,0 +1,88 @@
+"""
+🤖 AGENTE RAG - NETPROJECT
+Diagnóstico de índices das consultas do agente
+
+Confere em information_schema quais índices recomendados para os joins e
+filtros das consultas existem, lista índices sem uso (performance_schema),
+roda EXPLAIN em cada template de QUERIES e gera um script de migração
+idempotente com os índices que faltam. Usa as credenciais de
+`.streamlit/secrets.toml`; com --sqlite roda sobre uma base sintética de
+benchmarks/dados_sinteticos.py.
+
+Uso:
+    python analisar_indices.py
+    python analisar_indices.py -o migracao_indices.sql
+    python analisar_indices.py --aplicar
+    python analisar_indices.py --sqlite /tmp/netproject_bench_10000_42.sqlite --aplicar
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import streamlit_app as app  # noqa: E402
+
+SIMBOLOS = {'ok': '✅', 'parcial': '🟡', 'ausente': '❌'}
+
+def pool_sqlite(caminho):
+    """PoolMySQL sobre uma base SQLite gerada pelos benchmarks"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+    from ambiente_sqlite import PoolSQLite
+
+    return PoolSQLite({'caminho': caminho})
+
+def relatorio(diagnostico):
+    """Texto do diagnóstico para o terminal"""
+    linhas = ["Índices recomendados"]
+    for indice in diagnostico['recomendados']:
+        linhas.append(f"  {SIMBOLOS[indice['situacao']]} {indice['tabela']}({', '.join(indice['colunas'])})"
+                      f" · {indice['situacao']}")
+
+    linhas.append("\nÍndices sem uso desde o início do servidor")
+    if diagnostico['sem_uso'] is None:
+        linhas.append("  (performance_schema indisponível)")
+    else:
+        linhas += [f"  {tabela}.{indice}" for tabela, indice in diagnostico['sem_uso']] or ["  nenhum"]
+
+    linhas.append("\nÍndices redundantes (prefixo de outro índice)")
+    linhas += [f"  {tabela}.{indice} → {outro}" for tabela, indice, outro in diagnostico['redundantes']] or ["  nenhum"]
+
+    linhas.append("\nPlanos")
+    for template, plano in diagnostico['planos'].items():
+        simbolo = '⚠️' if plano['problemas'] else '✅'
+        linhas.append(f"  {simbolo} {template}")
+        linhas += [f"      {problema}" for problema in plano['problemas']]
+    return "\n".join(linhas)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--saida', help='grava o script de migração neste arquivo')
+    parser.add_argument('--aplicar', action='store_true', help='cria os índices pendentes direto no banco')
+    parser.add_argument('--sqlite', metavar='ARQUIVO', help='diagnostica uma base SQLite sintética')
+    parser.add_argument('--verbose', action='store_true', help='mostra todos os acessos de cada plano')
+    args = parser.parse_args()
+
+    dialeto = 'sqlite' if args.sqlite else 'mysql'
+    pool = pool_sqlite(args.sqlite) if args.sqlite else app.criar_pool()
+    diagnostico = app.diagnosticar_indices(pool)
+    print(relatorio(diagnostico))
+    if args.verbose:
+        for template, plano in diagnostico['planos'].items():
+            print(f"\n{template}\n" + "\n".join(f"    {acesso}" for acesso in plano['acessos']))
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(app.gerar_migracao(diagnostico, dialeto))
+        print(f"\n📝 Migração gravada em {args.saida}", file=sys.stderr)
+
+    if args.aplicar:
+        criados = app.aplicar_indices(pool, diagnostico, dialeto)
+        print(f"\n✅ {len(criados)} índice(s) criado(s): {', '.join(criados) or 'nenhum'}", file=sys.stderr)
+        if criados:
+            print("\n" + relatorio(app.diagnosticar_indices(pool)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+🤖 AGENTE RAG - NETPROJECT
+Avaliação em lote (headless) de perguntas registradas
+
+Roda interpretar_pergunta + executar_consulta sobre um arquivo de perguntas
+e grava um JSONL com os resultados, sem a interface Streamlit. Perguntas
+repetidas são avaliadas uma vez e as consultas por projeto são fundidas em
+um IN (...) por intenção. Usa as credenciais de `.streamlit/secrets.toml`.
+
+Uso:
+    python avaliar_lote.py perguntas.txt -o resultados.jsonl
+    python avaliar_lote.py perguntas.jsonl --campo pergunta -o resultados.jsonl
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+from streamlit_app import (  # noqa: E402
+    BuscaNomes,
+    criar_pool,
+    executar_consultas_lote,
+    interpretar_pergunta,
+    normalizar_texto,
+)
+
+def ler_perguntas(caminho, campo):
+    """Lê perguntas de um .txt (uma por linha) ou .jsonl (campo `campo`)"""
+    perguntas = []
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            if caminho.endswith('.jsonl'):
+                linha = json.loads(linha)[campo]
+            perguntas.append(linha)
+    return perguntas
+
+def serializar(pergunta, interpretacao, resultado):
+    """Linha JSONL com a interpretação e o resultado da consulta"""
+    registro = {
+        'pergunta': pergunta,
+        'intencao': interpretacao['intencao'],
+        'cod_projeto': interpretacao['cod_projeto'],
+        'sucesso': resultado['sucesso'],
+    }
+    if resultado['sucesso']:
+        dados = resultado['dados']
+        registro['linhas'] = 0 if dados is None else len(dados)
+        registro['dados'] = [] if dados is None else json.loads(
+            dados.to_json(orient='records', date_format='iso', force_ascii=False)
+        )
+    else:
+        registro['erro'] = resultado['erro']
+    return json.dumps(registro, ensure_ascii=False, default=str)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entrada', help='arquivo .txt (uma pergunta por linha) ou .jsonl')
+    parser.add_argument('-o', '--saida', default='-', help='arquivo JSONL de saída (padrão: stdout)')
+    parser.add_argument('--campo', default='pergunta', help='campo da pergunta na entrada .jsonl')
+    args = parser.parse_args()
+
+    perguntas = ler_perguntas(args.entrada, args.campo)
+    pool = criar_pool()
+    busca_nomes = BuscaNomes(pool)
+    busca_nomes.atualizar()  # carga síncrona: perguntas com nome de projeto em vez de código
+    checkouts_antes = pool.metricas()['checkouts']
+    inicio = time.perf_counter()
+
+    # Deduplica pelo texto normalizado: cada pergunta distinta é interpretada uma vez
+    unicas = {}
+    for pergunta in perguntas:
+        unicas.setdefault(normalizar_texto(pergunta), pergunta)
+    chaves = list(unicas)
+    interpretacoes = [interpretar_pergunta(unicas[chave], busca_nomes) for chave in chaves]
+    resultados = dict(zip(chaves, zip(interpretacoes, executar_consultas_lote(pool, interpretacoes))))
+
+    saida = sys.stdout if args.saida == '-' else open(args.saida, 'w', encoding='utf-8')
+    try:
+        for pergunta in perguntas:
+            interpretacao, resultado = resultados[normalizar_texto(pergunta)]
+            saida.write(serializar(pergunta, interpretacao, resultado) + '\n')
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+
+    duracao = time.perf_counter() - inicio
+    consultas = pool.metricas()['checkouts'] - checkouts_antes
+    print(
+        f"✅ {len(perguntas)} perguntas ({len(unicas)} distintas) em {duracao:.2f}s "
+        f"→ {len(perguntas) / duracao:.1f} perguntas/s, {consultas} consultas ao banco",
+        file=sys.stderr,
+    )
+
+if __name__ == "__main__":
+    main()
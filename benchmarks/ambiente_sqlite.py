@@ -0,0 +1,30 @@
+"""
+O app sobre a base sintética, fora do `streamlit run`
+
+PoolSQLite e preparar_recursos, usados pelos benchmarks, pelos testes
+(tests/conftest.py) e pelo `analisar_indices.py --sqlite`.
+"""
+
+import streamlit_app as app
+from dados_sinteticos import ConexaoSQLite
+
+class PoolSQLite(app.PoolMySQL):
+    """PoolMySQL sobre o arquivo SQLite da base sintética"""
+
+    def _nova_conexao(self, **_):
+        return ConexaoSQLite(self.config['caminho'])
+
+def preparar_recursos(pool, cache, fixar=setattr):
+    """Fixa os singletons do app (st.cache_resource não guarda nada fora do `streamlit run`)
+
+    `fixar(app, nome, valor)` troca cada obter_*; os testes passam
+    `monkeypatch.setattr` para que os originais voltem ao fim de cada teste.
+    """
+    single_flight = app.SingleFlight()
+    metricas = app.Metricas(limiar_lento=float('inf'))
+    snapshot = app.SnapshotProjetos(pool)
+    fixar(app, 'obter_cache', lambda: cache)
+    fixar(app, 'obter_single_flight', lambda: single_flight)
+    fixar(app, 'obter_metricas', lambda: metricas)
+    fixar(app, 'obter_snapshot', lambda _pool: snapshot)
+    snapshot.atualizar()
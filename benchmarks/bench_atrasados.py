@@ -0,0 +1,149 @@
+"""
+Benchmark do explorador de projetos atrasados (keyset pagination)
+
+Para cada escala, copia a base sintética, cria o idx_projeto_status_prevista
+recomendado e mede a busca de páginas em posições diferentes da lista
+(primeira, 25%, 50% e última) com a chave de paginação, contra a mesma
+página buscada com OFFSET. Mede também a montagem da tabela de uma
+página (formatar_atrasados, por coluna; moeda e data formatadas pelo
+column_config no navegador) contra a formatação linha a linha do
+iterrows de antes. Percorre a lista inteira e confere que as páginas
+cobrem o total, sem repetir projetos, do mais atrasado para o menos; sai
+com erro se não. Uso:
+
+    python benchmarks/bench_atrasados.py [--escalas 1000 10000 100000] [--repeticoes 20]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite, preparar_recursos  # noqa: E402
+from bench_retrieval import base_sqlite, estatisticas  # noqa: E402
+
+POSICOES = (('primeira', 0.0), ('25%', 0.25), ('50%', 0.5), ('última', 1.0))
+
+def criar_indice(pool):
+    tabela, nome, busca, incluidas = next(i for i in app.INDICES_RECOMENDADOS if i[1] == 'idx_projeto_status_prevista')
+    indice = {'tabela': tabela, 'nome': nome, 'colunas': list(busca) + list(incluidas)}
+    db = pool._nova_conexao()._db
+    db.execute(app.comando_criar_indice(indice, 'sqlite'))
+    db.execute("ANALYZE")
+    db.commit()
+
+def percorrer(paginador):
+    """(chaves de início de cada página, todas as linhas em ordem)"""
+    chaves, linhas, chave = [], [], None
+    while True:
+        chaves.append(chave)
+        pagina, chave = paginador.pagina(chave)
+        linhas.append(pagina)
+        if chave is None:
+            return chaves, linhas
+
+def formatar_por_linha(pagina):
+    """O que o gerar_resposta de antes montava para cada projeto (sem as chamadas st.*)"""
+    textos = []
+    for _, proj in pagina.iterrows():
+        textos += [f"🔴 {proj['nom_projeto']} - {proj['dias_atraso']} dias de atraso",
+                   f"{proj['cod_projeto']}", f"{proj['dias_atraso']}", f"R$ {proj['receita_total']:,.2f}",
+                   f"**Responsável:** {proj['responsavel']}", f"**Previsão:** {proj['data_prevista']}"]
+    return textos
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return estatisticas(tempos)
+
+def medir_escala(pool, repeticoes):
+    """Imprime a tabela da escala; retorna os problemas encontrados na lista paginada"""
+    paginador = app.paginador_atrasados(pool)
+    total = int(app.get_total_atrasados(pool)['total'].iloc[0])
+    chaves, paginas = percorrer(paginador)
+    todas = [p for p in paginas if p is not None and len(p) > 0]
+    cods = np.concatenate([p['cod_projeto'].to_numpy() for p in todas]) if todas else np.array([])
+    dias = np.concatenate([p['dias_atraso'].to_numpy() for p in todas]) if todas else np.array([])
+    problemas = []
+    if len(cods) != total:
+        problemas.append(f"{len(cods)} linhas nas páginas, {total} no total")
+    if len(np.unique(cods)) != len(cods):
+        problemas.append("projetos repetidos entre páginas")
+    if (np.diff(dias) > 0).any():
+        problemas.append("dias de atraso fora de ordem")
+
+    # Os dois lados direto no cursor: só o custo da consulta de cada página
+    sql_offset = app.QUERIES['projetos_atrasados_pagina'].replace(
+        "LIMIT %s\n    ) p", "LIMIT %s OFFSET %s\n    ) p")
+    db = pool._nova_conexao()
+
+    def executar(sql, params):
+        cursor = db.cursor()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+
+    def com_chave(chave):
+        if chave is None:
+            return executar(app.QUERIES['projetos_atrasados_pagina'], (app.TAMANHO_PAGINA + 1,))
+        template, params = app._proxima_atrasado(chave)
+        executar(app.QUERIES[template], (*params, app.TAMANHO_PAGINA + 1))
+
+    def com_offset(inicio):
+        executar(sql_offset, (app.TAMANHO_PAGINA + 1, inicio))
+
+    print(f"{total:,} projetos atrasados · {len(chaves)} páginas de {app.TAMANHO_PAGINA}")
+    print(f"{'página':>10} {'keyset p50 (ms)':>16} {'OFFSET p50 (ms)':>16}")
+    for nome, fracao in POSICOES:
+        i = round(fracao * (len(chaves) - 1))
+        keyset = cronometrar(lambda: com_chave(chaves[i]), repeticoes)
+        offset = cronometrar(lambda: com_offset(i * app.TAMANHO_PAGINA), repeticoes)
+        print(f"{nome:>10} {keyset['p50_ms']:>16.2f} {offset['p50_ms']:>16.2f}")
+
+    pagina = paginas[0]
+    por_coluna = cronometrar(lambda: app.formatar_atrasados(pagina), repeticoes * 10)
+    por_linha = cronometrar(lambda: formatar_por_linha(pagina), repeticoes * 10)
+    print(f"formatação de uma página: por coluna {por_coluna['p50_ms']:.3f}ms · "
+          f"linha a linha (iterrows) {por_linha['p50_ms']:.3f}ms")
+    return problemas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    problemas = []
+
+    for escala in args.escalas:
+        diretorio = tempfile.mkdtemp(prefix="bench_atrasados_")
+        caminho = os.path.join(diretorio, "base.sqlite")
+        shutil.copyfile(base_sqlite(escala, args.semente, recriar=False), caminho)
+        try:
+            pool = PoolSQLite({'caminho': caminho})
+            criar_indice(pool)
+            preparar_recursos(pool, app.CacheMemoria(max_bytes=0))  # max_bytes=0: toda página vai ao banco
+            print(f"\n{escala:,} projetos")
+            problemas += [f"{escala}: {p}" for p in medir_escala(pool, args.repeticoes)]
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    print("\npáginas cobrem a lista, sem repetição e em ordem: "
+          + ("sim" if not problemas else "NÃO\n  " + "\n  ".join(problemas)))
+    if problemas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
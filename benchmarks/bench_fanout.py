@@ -0,0 +1,146 @@
+"""
+Benchmark e conferência das agregações de receita sem fan-out
+
+Compara as versões antigas de projeto_detalhes/receita_projeto (LEFT JOIN
+receita ⋈ receita_pagamento antes do SUM) com as atuais (derived tables
+pré-agregadas por tabela) nos projetos de maior fan-out da base sintética.
+Confere os totais das duas contra o cálculo direto em pandas sobre os
+dados gerados (sai com erro se a versão atual divergir) e mostra o volume
+de linhas intermediárias que cada uma agrega. Uso:
+
+    python benchmarks/bench_fanout.py [--projetos 100000] [--top 50]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+
+from streamlit_app import QUERIES  # noqa: E402
+from bench_retrieval import base_sqlite  # noqa: E402
+from dados_sinteticos import conectar_sqlite, gerar  # noqa: E402
+
+# Versões com fan-out, como eram antes das derived tables
+ANTIGAS = {
+    'projeto_detalhes': """
+    SELECT
+        p.cod_projeto,
+        COALESCE(SUM(r.total_valor_bruto), 0) as receita_total,
+        COALESCE(SUM(rp.vlr_bruto), 0) as receita_faturada
+    FROM projeto p
+    LEFT JOIN receita r ON p.cod_projeto = r.cod_projeto
+    LEFT JOIN receita_pagamento rp ON r.cod_receita = rp.cod_receita
+        AND rp.flg_status_fatura IN ('Pago', 'Programado')
+    WHERE p.cod_projeto = ?
+    GROUP BY p.cod_projeto
+    """,
+    'receita_projeto': """
+    SELECT
+        p.cod_projeto,
+        COALESCE(SUM(r.total_valor_bruto), 0) as receita_total,
+        COALESCE(SUM(CASE WHEN rp.flg_status_fatura = 'Pago' THEN rp.vlr_bruto ELSE 0 END), 0) as receita_paga,
+        COALESCE(SUM(CASE WHEN rp.flg_status_fatura = 'Programado' THEN rp.vlr_bruto ELSE 0 END), 0) as receita_programada
+    FROM projeto p
+    LEFT JOIN receita r ON p.cod_projeto = r.cod_projeto
+    LEFT JOIN receita_pagamento rp ON r.cod_receita = rp.cod_receita
+    WHERE p.cod_projeto = ?
+    GROUP BY p.cod_projeto
+    """,
+}
+COLUNAS = {
+    'projeto_detalhes': ['receita_total', 'receita_faturada'],
+    'receita_projeto': ['receita_total', 'receita_paga', 'receita_programada'],
+}
+
+def esperado(tabelas):
+    """Totais por projeto calculados direto dos DataFrames gerados"""
+    receita = tabelas['receita']
+    pagamentos = tabelas['receita_pagamento'].merge(receita[['cod_receita', 'cod_projeto']], on='cod_receita')
+    status = pagamentos['flg_status_fatura']
+    totais = receita.groupby('cod_projeto')['total_valor_bruto'].sum().rename('receita_total').to_frame()
+    for nome, filtro in (('receita_faturada', status.isin(['Pago', 'Programado'])),
+                         ('receita_paga', status == 'Pago'),
+                         ('receita_programada', status == 'Programado')):
+        totais[nome] = pagamentos[filtro].groupby('cod_projeto')['vlr_bruto'].sum()
+    return totais.fillna(0)
+
+def volume(tabelas):
+    """Linhas por projeto que entram em SUM(total_valor_bruto) e no GROUP BY, antes e depois
+
+    Antes, cada receita aparece uma vez por pagamento (LEFT JOIN: ao menos
+    uma) e o total dela é somado outras tantas vezes. Depois, receita e
+    pagamentos são agregados cada um na sua derived table.
+    """
+    pagamentos = tabelas['receita_pagamento'].groupby('cod_receita').size()
+    receita = tabelas['receita'].set_index('cod_receita')
+    receita['pagamentos'] = pagamentos.reindex(receita.index, fill_value=0)
+    por_projeto = receita.groupby('cod_projeto').agg(
+        receitas=('pagamentos', 'size'),
+        pagamentos=('pagamentos', 'sum'),
+        antes=('pagamentos', lambda p: int(np.maximum(p, 1).sum())),
+    )
+    por_projeto['depois'] = por_projeto['receitas'] + por_projeto['pagamentos']
+    return por_projeto
+
+def executar(db, sql, cod_projeto, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        cursor = db.execute(sql, (cod_projeto,) * sql.count('?'))
+        colunas = [d[0] for d in cursor.description]
+        linha = cursor.fetchone()
+    return dict(zip(colunas, linha)), (time.perf_counter() - inicio) / repeticoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=100_000)
+    parser.add_argument('--top', type=int, default=50, help='projetos de maior fan-out comparados')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    tabelas = gerar(args.projetos, args.semente)
+    totais = esperado(tabelas)
+    linhas = volume(tabelas).nlargest(args.top, 'antes')
+    db = conectar_sqlite(base_sqlite(args.projetos, args.semente, recriar=False))
+
+    atuais = {nome: QUERIES[nome].replace('%s', '?') for nome in ANTIGAS}
+    erros_antes, erros_depois = 0, 0
+    tempo_antes, tempo_depois = 0.0, 0.0
+    inflacao = []
+    for cod_projeto in linhas.index:
+        certo = totais.loc[cod_projeto]
+        for nome in ANTIGAS:
+            antigo, t_antigo = executar(db, ANTIGAS[nome], cod_projeto, args.repeticoes)
+            novo, t_novo = executar(db, atuais[nome], cod_projeto, args.repeticoes)
+            tempo_antes += t_antigo
+            tempo_depois += t_novo
+            for coluna in COLUNAS[nome]:
+                if not np.isclose(novo[coluna], certo[coluna], rtol=1e-9, atol=0.005):
+                    erros_depois += 1
+                    print(f"❌ {nome}.{coluna} do projeto {cod_projeto}: {novo[coluna]} ≠ {certo[coluna]}",
+                          file=sys.stderr)
+                if not np.isclose(antigo[coluna], certo[coluna], rtol=1e-9, atol=0.005):
+                    erros_antes += 1
+            if nome == 'receita_projeto' and certo['receita_total']:
+                inflacao.append(antigo['receita_total'] / certo['receita_total'])
+
+    comparados = len(linhas) * sum(len(c) for c in COLUNAS.values())
+    print(f"{len(linhas)} projetos de maior fan-out em {args.projetos:,}")
+    print(f"{'':>24} {'antes':>12} {'depois':>12}")
+    print(f"{'receitas somadas':>24} {linhas['antes'].sum():>12,} {linhas['receitas'].sum():>12,}")
+    print(f"{'linhas agrupadas':>24} {linhas['antes'].sum():>12,} {linhas['depois'].sum():>12,}")
+    print(f"{'tempo total (ms)':>24} {tempo_antes * 1e3:>12.1f} {tempo_depois * 1e3:>12.1f}")
+    print(f"{'totais errados':>24} {f'{erros_antes}/{comparados}':>12} {f'{erros_depois}/{comparados}':>12}")
+    if inflacao:
+        print(f"{'receita_total inflada':>24} {f'{np.median(inflacao):.1f}x (mediana)':>12}")
+    if erros_depois:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark do caminho de leitura de resultados
+
+Compara pd.read_sql (caminho antigo de executar_query) com
+cursor.fetchall() + montar_dataframe (colunas tipadas, categóricas e
+inteiros reduzidos) em 10 mil a 1 milhão de linhas no formato da
+listagem de faturas. Usa SQLite em memória como fonte, então mede só a
+decodificação no cliente, não o banco. Uso:
+
+    python benchmarks/bench_fetch.py [--linhas 10000 100000 1000000]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import sys
+import time
+import warnings
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import pandas as pd  # noqa: E402
+
+from streamlit_app import montar_dataframe, serializar_df  # noqa: E402
+
+CONSULTA = """
+SELECT cod_fatura, descricao, valor, data_faturamento, status, nom_usuario, horas
+FROM faturas
+"""
+
+def criar_base(linhas, semente=42):
+    """Tabela de faturas sintética com status/usuários de baixa cardinalidade"""
+    rnd = random.Random(semente)
+    db = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+    db.execute("""CREATE TABLE faturas (cod_fatura INTEGER, descricao TEXT, valor REAL,
+                  data_faturamento TIMESTAMP, status TEXT, nom_usuario TEXT, horas INTEGER)""")
+    status = ['Pago', 'Programado', 'Aberto', 'Cancelado']
+    usuarios = [f'Usuário {i}' for i in range(300)]
+    base = datetime(2020, 1, 1)
+    db.executemany("INSERT INTO faturas VALUES (?, ?, ?, ?, ?, ?, ?)", (
+        (i, f'Parcela {i % 48 + 1} do contrato {i // 48}', round(rnd.uniform(100, 90_000), 2),
+         base + timedelta(days=rnd.randint(0, 2000)), rnd.choice(status), rnd.choice(usuarios),
+         rnd.randint(0, 200))
+        for i in range(linhas)
+    ))
+    db.commit()
+    return db
+
+def ler_antigo(db):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # aviso do pandas sobre conexões DBAPI sem SQLAlchemy
+        return pd.read_sql(CONSULTA, db)
+
+def ler_colunar(db):
+    cursor = db.execute(CONSULTA)
+    return montar_dataframe(cursor.fetchall(), [d[0] for d in cursor.description])
+
+def medir(funcao, db, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        df = funcao(db)
+        tempos.append(time.perf_counter() - inicio)
+    return df, min(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'linhas':>9} {'caminho':>9} {'tempo (ms)':>11} {'memória (MB)':>13} {'cache Arrow (MB)':>17}")
+    for linhas in args.linhas:
+        db = criar_base(linhas)
+        for nome, funcao in (('read_sql', ler_antigo), ('colunar', ler_colunar)):
+            df, tempo = medir(funcao, db, args.repeticoes)
+            memoria = df.memory_usage(deep=True).sum() / 2**20
+            cache = len(serializar_df(df)) / 2**20
+            print(f"{linhas:>9} {nome:>9} {tempo * 1e3:>11.1f} {memoria:>13.1f} {cache:>17.1f}")
+        db.close()
+
+if __name__ == "__main__":
+    main()
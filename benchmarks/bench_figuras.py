@@ -0,0 +1,126 @@
+"""
+Benchmark das figuras: tamanho serializado e tempo de montagem, antes e depois
+
+Compara, para DataFrames com o formato dos resultados do app, a figura
+montada do zero a cada rerun (como antes) com a figura agregada (maiores
+categorias + "Outros", períodos longos por trimestre/ano) e memoizada
+pelo hash do conteúdo. Casos: equipe de um projeto com muitas pessoas
+(CONSULTA_ALOCACAO), receita mensal de todo o período por status e os 10
+projetos mais atrasados do dashboard. O tamanho é o JSON que o
+st.plotly_chart envia ao navegador. Confere que a agregação preserva os
+totais e sai com erro se não preservar. Uso:
+
+    python benchmarks/bench_figuras.py [--pessoas 100,500,2000] [--meses 590] [--reruns 50]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import plotly.express as px  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from bench_retrieval import estatisticas  # noqa: E402
+
+HORAS = ['horas_alocadas', 'horas_trabalhadas']
+
+def equipe(pessoas, rng):
+    """Alocações agregadas por pessoa, ordenadas como alocacoes_pagina"""
+    df = pd.DataFrame({
+        'nom_usuario': pd.Categorical([f"Pessoa {i:05d}" for i in range(pessoas)]),
+        'horas_alocadas': np.round(rng.pareto(1.5, pessoas) * 40, 1),
+        'horas_trabalhadas': np.round(rng.pareto(1.5, pessoas) * 35, 1),
+    })
+    return df.sort_values(['horas_alocadas', 'nom_usuario'], ascending=[False, True], ignore_index=True)
+
+def receita_mensal(meses, rng):
+    """Série de ReceitaMensal.serie('status') com `meses` meses"""
+    datas = pd.date_range('2018-01-01', periods=meses, freq='MS')
+    return pd.DataFrame({
+        'mes': np.repeat(datas, 2),
+        'status': np.tile(['Pago', 'Programado'], meses),
+        'faturas': rng.integers(1, 500, meses * 2),
+        'valor': np.round(rng.random(meses * 2) * 1e6, 2),
+    })
+
+def atrasados(rng):
+    return pd.DataFrame({
+        'nom_projeto': [f"Projeto {i}" for i in range(10)],
+        'dias_atraso': np.sort(rng.integers(30, 900, 10))[::-1],
+    })
+
+def medir(funcao, reruns):
+    tempos = []
+    for _ in range(reruns):
+        inicio = time.perf_counter()
+        fig = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return estatisticas(tempos), len(fig.to_json())
+
+def comparar(nome, antes, depois, reruns):
+    """Monta `antes` do zero a cada rerun; `depois` com um CacheFiguras novo (1ª montagem + reruns)"""
+    base, bytes_antes = medir(antes, reruns)
+    cache = app.CacheFiguras()
+    primeira, bytes_depois = medir(lambda: depois(cache), 1)
+    rerun, _ = medir(lambda: depois(cache), reruns)
+    print(f"{nome:>38} {bytes_antes / 1024:>10.1f} {bytes_depois / 1024:>10.1f} "
+          f"{base['p50_ms']:>11.2f} {primeira['p50_ms']:>11.2f} {rerun['p50_ms']:>11.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pessoas', default='100,500,2000', help='tamanhos de equipe, separados por vírgula')
+    parser.add_argument('--meses', type=int, default=590, help='meses da série de receita (2018–2066 na base sintética)')
+    parser.add_argument('--reruns', type=int, default=50)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.semente)
+
+    print(f"{'figura':>38} {'antes (KB)':>10} {'depois (KB)':>10} {'antes (ms)':>11} "
+          f"{'1ª vez (ms)':>11} {'rerun (ms)':>11}")
+    divergentes = []
+    barras = dict(x='nom_usuario', y=HORAS, title="Horas por Pessoa",
+                  labels={'nom_usuario': 'Pessoa', 'value': 'Horas'}, barmode='group')
+    for pessoas in (int(n) for n in args.pessoas.split(',')):
+        df = equipe(pessoas, rng)
+        pagina = df.iloc[:app.TAMANHO_PAGINA]
+        totais = df[HORAS].sum()
+        agregada = app.agrupar_maiores(pagina, 'nom_usuario', HORAS, totais=totais, categorias=pessoas)
+        if not np.allclose(agregada[HORAS].sum(), totais):
+            divergentes.append(f"equipe de {pessoas}")
+        comparar(f"equipe de {pessoas} (página)", lambda: px.bar(pagina, **barras),
+                 lambda cache: cache.figura(px.bar, app.agrupar_maiores(
+                     pagina, 'nom_usuario', HORAS, totais=totais, categorias=pessoas), **barras), args.reruns)
+        comparar(f"equipe de {pessoas} (todas as pessoas)", lambda: px.bar(df, **barras),
+                 lambda cache: cache.figura(px.bar, app.agrupar_maiores(df, 'nom_usuario', HORAS), **barras),
+                 args.reruns)
+
+    serie = receita_mensal(args.meses, rng)
+    reduzida, periodo = app.reduzir_pontos(serie, 'mes', ['status'], ['faturas', 'valor'])
+    if not np.isclose(reduzida['valor'].sum(), serie['valor'].sum()):
+        divergentes.append("receita mensal")
+    colunas = dict(x='mes', y='valor', color='status', title='Receita por Status de Faturamento')
+    comparar(f"receita de {args.meses} meses (por {periodo.lower()})", lambda: px.bar(serie, **colunas),
+             lambda cache: cache.figura(px.bar, app.reduzir_pontos(
+                 serie, 'mes', ['status'], ['faturas', 'valor'])[0], **colunas), args.reruns)
+
+    top = atrasados(rng)
+    barras_atraso = dict(x='nom_projeto', y='dias_atraso', color='dias_atraso', color_continuous_scale='Reds')
+    comparar("10 projetos mais atrasados", lambda: px.bar(top, **barras_atraso),
+             lambda cache: cache.figura(px.bar, top, layout={'xaxis_tickangle': -45}, **barras_atraso),
+             args.reruns)
+
+    print("\n'página' é o gráfico de antes (só a página exibida); 'depois' cobre a equipe toda, "
+          f"com as {app.MAX_CATEGORIAS - 1} maiores + \"Outros\"")
+    print("totais preservados na agregação: " + ("sim" if not divergentes else f"NÃO ({', '.join(divergentes)})"))
+    if divergentes:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark da detecção de intenções
+
+Compara a varredura original (substring por palavra, custo linear no
+vocabulário) com o MatcherIntencoes compilado, para vocabulários de 10 a
+10.000 termos. Uso:
+
+    python benchmarks/bench_intencoes.py [--perguntas 2000]
+"""
+
+import argparse
+import logging
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+from streamlit_app import INTENCOES, MatcherIntencoes, normalizar_texto  # noqa: E402
+
+PERGUNTAS_BASE = [
+    "Quais projetos estão atrasados?",
+    "Qual a receita total?",
+    "Status do projeto 34749",
+    "Qual a situação do projeto 12345?",
+    "Quem está alocado no projeto 55555?",
+    "Mostre as faturas pagas do projeto 40001",
+    "Quanto já foi faturado no projeto 40001?",
+    "Qual o andamento da equipe do projeto 31337?",
+]
+
+def varredura_original(intencoes, pergunta):
+    """Algoritmo anterior: substring de cada palavra de cada intenção"""
+    pergunta_lower = pergunta.lower()
+    scores = {}
+    for intencao, config in intencoes.items():
+        score = 0
+        for palavra in config['palavras']:
+            if palavra in pergunta_lower:
+                score += config['peso']
+        scores[intencao] = score
+    return scores
+
+def gerar_vocabulario(tamanho, semente=42):
+    """INTENCOES acrescido de termos sintéticos até `tamanho` palavras"""
+    rnd = random.Random(semente)
+    intencoes = {k: {'palavras': list(v['palavras']), 'peso': v['peso']} for k, v in INTENCOES.items()}
+    nomes = list(intencoes)
+    total = sum(len(v['palavras']) for v in intencoes.values())
+    while total < tamanho:
+        termo = ''.join(rnd.choices(string.ascii_lowercase, k=rnd.randint(5, 12)))
+        intencoes[rnd.choice(nomes)]['palavras'].append(termo)
+        total += 1
+    return intencoes
+
+def medir(funcao, perguntas):
+    inicio = time.perf_counter()
+    for pergunta in perguntas:
+        funcao(pergunta)
+    return (time.perf_counter() - inicio) / len(perguntas) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--perguntas', type=int, default=2000, help='perguntas por medição')
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    perguntas = [rnd.choice(PERGUNTAS_BASE) for _ in range(args.perguntas)]
+
+    print(f"{'termos':>8} {'compilação (ms)':>16} {'original (µs/perg.)':>20} {'compilado (µs/perg.)':>21} {'ganho':>7}")
+    for tamanho in (10, 100, 1_000, 10_000):
+        intencoes = gerar_vocabulario(tamanho)
+
+        inicio = time.perf_counter()
+        matcher = MatcherIntencoes(intencoes)
+        compilacao_ms = (time.perf_counter() - inicio) * 1e3
+
+        # Mesmos scores que a varredura original com texto e vocabulário normalizados
+        normalizadas = {k: {'palavras': [normalizar_texto(p) for p in v['palavras']], 'peso': v['peso']}
+                        for k, v in intencoes.items()}
+        for pergunta in PERGUNTAS_BASE:
+            assert matcher.pontuar(pergunta) == varredura_original(normalizadas, normalizar_texto(pergunta))
+
+        original = medir(lambda p: varredura_original(intencoes, p), perguntas)
+        compilado = medir(matcher.pontuar, perguntas)
+        print(f"{tamanho:>8} {compilacao_ms:>16.1f} {original:>20.1f} {compilado:>21.1f} {original / compilado:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
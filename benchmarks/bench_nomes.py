@@ -0,0 +1,93 @@
+"""
+Benchmark da busca aproximada de nomes de projeto
+
+Carrega a BuscaNomes sobre a base sintética e mede o tempo de construção
+dos índices, a latência de resolver() com nomes exatos e com erros de
+digitação (um caractere removido) e a taxa de acerto: o nome certo entre
+os candidatos devolvidos. Mede também a inclusão incremental de projetos
+novos. Uso:
+
+    python benchmarks/bench_nomes.py [--projetos 100000] [--amostras 1000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite  # noqa: E402
+from bench_retrieval import base_sqlite, estatisticas  # noqa: E402
+
+def com_erro(rng, nome):
+    """Nome com um caractere (que não é espaço) removido"""
+    posicoes = [i for i, c in enumerate(nome) if not c.isspace()]
+    i = posicoes[rng.integers(len(posicoes))]
+    return nome[:i] + nome[i + 1:]
+
+def medir(busca, perguntas, esperados):
+    tempos, acertos = [], 0
+    for pergunta, esperado in zip(perguntas, esperados):
+        inicio = time.perf_counter()
+        encontrado = busca.resolver(pergunta)
+        tempos.append(time.perf_counter() - inicio)
+        if encontrado and any(nome == esperado for _, nome in encontrado['candidatos']):
+            acertos += 1
+    return estatisticas(tempos), acertos / len(perguntas)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=100_000)
+    parser.add_argument('--amostras', type=int, default=1000)
+    parser.add_argument('--novos', type=int, default=1000, help='projetos incluídos de forma incremental')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    pool = PoolSQLite({'caminho': base_sqlite(args.projetos, args.semente, recriar=False)})
+    busca = app.BuscaNomes(pool)
+    inicio = time.perf_counter()
+    busca.atualizar()
+    construcao = time.perf_counter() - inicio
+    m = busca.metricas()
+    print(f"{m['projetos']:,} projetos · {m['nomes_projeto']:,} nomes de projeto distintos · "
+          f"{m['nomes_responsavel']:,} responsáveis · índices construídos em {construcao:.2f}s")
+
+    rng = np.random.default_rng(args.semente)
+    nomes = busca._dados['projeto']['nomes']
+    esperados = [nomes[i] for i in rng.integers(len(nomes), size=args.amostras)]
+    casos = {
+        'nome exato': [f"Status do projeto {nome}" for nome in esperados],
+        'um caractere a menos': [f"Status do projeto {com_erro(rng, nome)}" for nome in esperados],
+    }
+    print(f"\n{'consulta':>22} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'acerto':>8}")
+    for caso, perguntas in casos.items():
+        r, acerto = medir(busca, perguntas, esperados)
+        print(f"{caso:>22} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} {acerto:>8.1%}")
+
+    # Projetos novos entram sem reconstruir: mesmo caminho do aviso do monitor
+    db = pool._nova_conexao()._db
+    ultimo = busca._dados['ultimo_codigo']
+    novos = [(ultimo + i + 1, f"Projeto Incremental {i} Cliente {rng.integers(1_000_000)}")
+             for i in range(args.novos)]
+    db.executemany("INSERT INTO projeto (cod_projeto, nom_projeto, cod_responsavel, flg_status) "
+                   "VALUES (?, ?, 1, 1)", novos)
+    db.commit()
+    try:
+        inicio = time.perf_counter()
+        incluidos = busca.adicionar_novos()
+        duracao = time.perf_counter() - inicio
+        r, acerto = medir(busca, [f"Status do projeto {nome}" for _, nome in novos], [nome for _, nome in novos])
+        print(f"\n{incluidos:,} projetos novos incluídos em {duracao * 1e3:.1f}ms · "
+              f"p50 {r['p50_ms']:.3f}ms · acerto {acerto:.1%}")
+    finally:
+        db.execute("DELETE FROM projeto WHERE cod_projeto > ?", (ultimo,))
+        db.commit()
+
+if __name__ == "__main__":
+    main()
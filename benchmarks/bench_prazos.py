@@ -0,0 +1,101 @@
+"""
+Prazos, disjuntor e resultados de reserva com o banco ficando lento
+
+Roda as perguntas do bench_retrieval sobre a base sintética, sem cache de
+resultados, em três fases: normal (a reserva é preenchida), lento (toda
+consulta passaria do prazo: a resposta sai no prazo com o último
+resultado bom e o disjuntor abre) e recuperado (passada a espera do
+disjuntor, a consulta de teste o fecha). A lentidão vem de um progress
+handler do SQLite que dorme a cada 100 instruções; o cancelamento é o
+KILL QUERY do PoolMySQL, emulado pela base sintética. Sai com erro se,
+na fase lenta, alguma resposta passar do prazo ou faltar. Uso:
+
+    python benchmarks/bench_prazos.py [--projetos 10000] [--prazo 0.2] [--perguntas 60]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite, preparar_recursos  # noqa: E402
+from bench_retrieval import PERGUNTAS, base_sqlite, estatisticas  # noqa: E402
+
+class PoolLento(PoolSQLite):
+    """PoolSQLite cujas consultas dormem `atraso` segundos a cada 100 instruções do SQLite"""
+
+    atraso = 0.0
+
+    def _nova_conexao(self, **opcoes):
+        conexao = super()._nova_conexao(**opcoes)
+        conexao._db.set_progress_handler(lambda: time.sleep(self.atraso) if self.atraso else None, 100)
+        return conexao
+
+def fase(pool, perguntas):
+    """Estatísticas de latência e contagem de respostas atuais, de reserva e com erro"""
+    tempos, contagem = [], {'atuais': 0, 'reserva': 0, 'erros': 0}
+    for pergunta in perguntas:
+        inicio = time.perf_counter()
+        resultado = app.executar_consulta(pool, app.interpretar_pergunta(pergunta))
+        tempos.append(time.perf_counter() - inicio)
+        if not resultado['sucesso'] or resultado['dados'] is None:
+            contagem['erros'] += 1
+        elif app.obsoleto_desde(resultado['dados']) is not None:
+            contagem['reserva'] += 1
+        else:
+            contagem['atuais'] += 1
+    return {**estatisticas(tempos), **contagem}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=10_000)
+    parser.add_argument('--prazo', type=float, default=0.2, help='prazo de todos os templates (s)')
+    parser.add_argument('--perguntas', type=int, default=60)
+    parser.add_argument('--espera', type=float, default=2.0, help='segundos com o disjuntor aberto')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    # Sem MAX_EXECUTION_TIME no SQLite: o KILL QUERY sai no prazo, sem folga
+    pool = PoolLento({'caminho': base_sqlite(args.projetos, args.semente, recriar=False)}, folga_cancelamento=0.0)
+    preparar_recursos(pool, app.CacheMemoria(max_bytes=0))  # max_bytes=0: toda consulta vai ao banco
+    disjuntor = app.Disjuntor(janela=10, limiar=3, espera=args.espera)
+    app.obter_disjuntor = lambda: disjuntor
+
+    rng = np.random.default_rng(args.semente)
+    codigos = app.consultar(pool, 'snapshot_projetos')['cod_projeto'].to_numpy()
+    perguntas = [PERGUNTAS[i % len(PERGUNTAS)].format(cod=cod)
+                 for i, cod in enumerate(rng.choice(codigos[codigos <= 999_999], args.perguntas))]
+    app.obter_prazos = lambda: dict.fromkeys(app.QUERIES, args.prazo)
+
+    print(f"{args.projetos:,} projetos · prazo {args.prazo * 1000:.0f} ms · {len(perguntas)} perguntas por fase")
+    print(f"\n{'fase':>11} {'p50 (ms)':>10} {'p99 (ms)':>10} {'máx (ms)':>10} {'atuais':>7} {'reserva':>8} "
+          f"{'erros':>6} {'disjuntor':>12}")
+    resultados = {}
+    for nome, atraso in (('normal', 0.0), ('lento', args.prazo / 2), ('recuperado', 0.0)):
+        if nome == 'recuperado':
+            time.sleep(args.espera)
+        pool.atraso = atraso
+        r = resultados[nome] = fase(pool, perguntas)
+        print(f"{nome:>11} {r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f} {r['max_ms']:>10.1f} {r['atuais']:>7} "
+              f"{r['reserva']:>8} {r['erros']:>6} {disjuntor.estado:>12}")
+
+    excedidos = sum(c['prazos_excedidos'] for c in app.obter_metricas().resumo()['consultas'].values())
+    m = disjuntor.metricas()
+    print(f"\n{excedidos} consultas interrompidas ({pool.metricas()['canceladas']} por KILL QUERY) · "
+          f"disjuntor abriu {m['aberturas']}x e recusou {m['recusadas']} consultas")
+
+    # Erros da fase normal são respostas legítimas (projeto sem faturas, sem alocações)
+    lento, sem_resposta = resultados['lento'], resultados['lento']['erros'] - resultados['normal']['erros']
+    if sem_resposta > 0 or lento['max_ms'] > args.prazo * 1000 + 250:
+        print(f"❌ fase lenta: {sem_resposta} sem resposta, máximo {lento['max_ms']:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark da receita mensal consolidada (mês × projeto × status × responsável)
+
+Constrói a base consolidada do zero sobre a base sintética e mede a
+atualização sem mudanças, a retomada a partir dos arquivos gravados e a
+atualização incremental depois de alterar faturas de poucos meses
+(mudança de status, fatura nova e fatura movida de mês) e o responsável
+de um projeto, e a troca de um responsável sozinha, que só reaplica o
+mapa de responsáveis sem reler as faturas. Confere que o resultado incremental é igual ao de uma
+construção do zero e compara a leitura do painel com a mesma agregação
+feita ao vivo no banco. Sai com erro se os resultados divergirem. Uso:
+
+    python benchmarks/bench_receita_mensal.py [--projetos 100000] [--leituras 200]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import pandas as pd  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite  # noqa: E402
+from bench_retrieval import base_sqlite, estatisticas  # noqa: E402
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+def ler_painel(receita, primeiro, ultimo):
+    """O que o painel lê: série por status e os 10 maiores responsáveis do período"""
+    return receita.serie('status', primeiro, ultimo), receita.serie('responsavel', primeiro, ultimo, maiores=10)
+
+def divergencias(incremental, completa):
+    """Séries que diferem entre a base atualizada aos poucos e uma construída do zero"""
+    diferentes = []
+    for dimensao in ('status', 'responsavel'):
+        a, b = (r.serie(dimensao).sort_values(['mes', dimensao], ignore_index=True) for r in (incremental, completa))
+        try:
+            pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-9)
+        except AssertionError:
+            diferentes.append(dimensao)
+    return diferentes
+
+def alterar_faturas(db, mes):
+    """Status de metade das faturas de `mes`, uma fatura nova no mês atual e uma movida de mês"""
+    inicio = datetime(mes // 100, mes % 100, 1)
+    fim = datetime(*divmod(app._mes_seguinte(mes), 100), 1)
+    db.execute("UPDATE receita_pagamento SET flg_status_fatura = 'Pago' "
+               "WHERE dth_faturamento >= ? AND dth_faturamento < ? AND cod_receita_pagamento % 2 = 0",
+               (inicio, fim))
+    cod_receita, = db.execute("SELECT MIN(cod_receita) FROM receita").fetchone()
+    proxima, = db.execute("SELECT MAX(cod_receita_pagamento) + 1 FROM receita_pagamento").fetchone()
+    db.execute("INSERT INTO receita_pagamento VALUES (?, ?, 'Fatura do benchmark', 1234.56, ?, 'Programado')",
+               (proxima, cod_receita, datetime.now().replace(microsecond=0)))
+    db.execute("UPDATE receita_pagamento SET dth_faturamento = ? WHERE cod_receita_pagamento = "
+               "(SELECT MIN(cod_receita_pagamento) FROM receita_pagamento WHERE dth_faturamento >= ?)",
+               (datetime(2020, 6, 15), inicio))
+    cod_projeto, = db.execute("SELECT MIN(cod_projeto) FROM projeto").fetchone()
+    db.execute("UPDATE projeto SET cod_responsavel = (SELECT MAX(cod_usuario) FROM usuario) WHERE cod_projeto = ?",
+               (cod_projeto,))
+    db.commit()
+
+def trocar_responsavel(db):
+    """Passa o projeto de maior receita faturada para o primeiro usuário"""
+    db.execute("""
+        UPDATE projeto SET cod_responsavel = (SELECT MIN(cod_usuario) FROM usuario)
+        WHERE cod_projeto = (
+            SELECT r.cod_projeto FROM receita r
+            JOIN receita_pagamento rp ON rp.cod_receita = r.cod_receita
+            GROUP BY r.cod_projeto ORDER BY SUM(rp.vlr_bruto) DESC LIMIT 1)""")
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=100_000)
+    parser.add_argument('--leituras', type=int, default=200, help='leituras do painel medidas')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    # Cópia da base: as faturas são alteradas durante o benchmark
+    original = base_sqlite(args.projetos, args.semente, recriar=False)
+    diretorio = tempfile.mkdtemp(prefix="bench_receita_mensal_")
+    caminho = os.path.join(diretorio, "base.sqlite")
+    shutil.copyfile(original, caminho)
+    try:
+        pool = PoolSQLite({'caminho': caminho})
+        receita = app.ReceitaMensal(pool, os.path.join(diretorio, "consolidada"))
+        construcao = cronometrar(receita.atualizar)
+        m = receita.metricas()
+        print(f"{args.projetos:,} projetos · {m['meses']:,} meses · {m['linhas']:,} linhas consolidadas · "
+              f"construção do zero em {construcao:.2f}s")
+        print(f"atualização sem mudanças: {cronometrar(receita.atualizar):.2f}s "
+              f"({receita.metricas()['meses_reagregados']} meses reagregados)")
+
+        retomada = app.ReceitaMensal(pool, os.path.join(diretorio, "consolidada"))
+        carga = cronometrar(retomada.carregar)
+        print(f"retomada dos arquivos gravados: {carga:.2f}s + atualização {cronometrar(retomada.atualizar):.2f}s "
+              f"({retomada.metricas()['meses_reagregados']} meses reagregados)")
+
+        hoje = date.today().year * 100 + date.today().month
+        alterar_faturas(pool._nova_conexao()._db, hoje - 100)
+        receita.solicitar_atualizacao({'receita_pagamento': None, 'projeto': None})
+        incremental = cronometrar(receita.atualizar)
+        print(f"atualização após alterar faturas e 1 responsável: {incremental:.2f}s "
+              f"({receita.metricas()['meses_reagregados']} meses reagregados)")
+
+        # Só projeto/usuario mudou: o monitor não avisa receita, as marcas não são relidas
+        trocar_responsavel(pool._nova_conexao()._db)
+        receita.solicitar_atualizacao({'projeto': None})
+        remapeamento = cronometrar(lambda: receita.atualizar(reler_faturas=receita._faturas_alteradas))
+        print(f"atualização após trocar 1 responsável (sem reler faturas): {remapeamento:.2f}s")
+
+        completa = app.ReceitaMensal(pool, os.path.join(diretorio, "completa"))
+        completa.atualizar()
+        diferentes = divergencias(receita, completa)
+        print("incremental = construção do zero: " + ("sim" if not diferentes else f"NÃO ({', '.join(diferentes)})"))
+
+        # Painel (36 meses para trás, 12 para frente) contra a mesma agregação no banco
+        primeiro, ultimo = hoje - 300, hoje + 100
+        painel = estatisticas([cronometrar(lambda: ler_painel(receita, primeiro, ultimo))
+                               for _ in range(args.leituras)])
+        ao_vivo = estatisticas([cronometrar(lambda: receita._agregar(primeiro, ultimo)) for _ in range(3)])
+        print(f"painel: p50 {painel['p50_ms']:.2f}ms · p99 {painel['p99_ms']:.2f}ms · "
+              f"agregação ao vivo dos mesmos 48 meses (mês × projeto × status): p50 {ao_vivo['p50_ms']:.0f}ms")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+    if diferentes:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
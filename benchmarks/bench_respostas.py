@@ -0,0 +1,131 @@
+"""
+Benchmark do cache de respostas (intenção + cod_projeto) com tráfego concentrado
+
+Monta um fluxo de perguntas em que as de exemplo do chat e algumas dezenas
+de perguntas "de log" (redações variadas sobre poucos projetos) somam
+`--fracao-quente` do tráfego e o resto é cauda longa de projetos
+sorteados. Mede o caminho completo sem o cache de respostas
+(interpretar_pergunta → executar_consulta → figuras e JSON da resposta,
+com o cache de resultados já quente) e com ele, com TTL curto e recarga
+em segundo plano para que as chaves promovidas sejam renovadas durante a
+medição. Confere que as respostas do cache são iguais às montadas na hora
+e sai com erro se alguma divergir. Uso:
+
+    python benchmarks/bench_respostas.py [--projetos 10000] [--perguntas 3000] [--ttl 2]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite, preparar_recursos  # noqa: E402
+from bench_retrieval import PERGUNTAS, base_sqlite, estatisticas  # noqa: E402
+from dados_sinteticos import conectar_sqlite  # noqa: E402
+
+# Redações das perguntas "de log": mesma intenção e projeto, textos diferentes
+REDACOES = [
+    "Status do projeto {cod}",
+    "qual o status do projeto {cod}?",
+    "Faturas do projeto {cod}",
+    "mostre as faturas do {cod}",
+    "Qual a receita do projeto {cod}?",
+    "Quem está alocado no projeto {cod}?",
+]
+
+def montar_fluxo(caminho, quantidade, fracao_quente, semente):
+    """(perguntas, quentes): fluxo sorteado e a lista de perguntas concentradas"""
+    db = conectar_sqlite(caminho)
+    codigos = [cod for cod, in db.execute("SELECT cod_projeto FROM projeto")]
+    db.close()
+    rng = np.random.default_rng(semente)
+    logadas = [redacao.format(cod=cod) for cod in rng.choice(codigos, 6) for redacao in REDACOES]
+    quentes = [pergunta for _, pergunta in app.EXEMPLOS_PERGUNTAS] + logadas
+    # Zipf entre as quentes; a cauda sorteia um projeto por pergunta
+    pesos = 1 / np.arange(1, len(quentes) + 1)
+    pesos /= pesos.sum()
+    fluxo = []
+    for i in range(quantidade):
+        if rng.random() < fracao_quente:
+            fluxo.append(quentes[rng.choice(len(quentes), p=pesos)])
+        else:
+            fluxo.append(PERGUNTAS[i % len(PERGUNTAS)].format(cod=rng.choice(codigos)))
+    return fluxo, quentes
+
+def sem_cache(pool, busca_nomes, pergunta):
+    interpretacao = app.interpretar_pergunta(pergunta, busca_nomes)
+    return app.preparar_resposta(interpretacao, app.executar_consulta(pool, interpretacao))
+
+def ao_vivo(pool, busca_nomes, pergunta):
+    interpretacao = app.interpretar_pergunta(pergunta, busca_nomes)
+    return app.gerar_resposta_dados(interpretacao, app.executar_consulta(pool, interpretacao))
+
+def comparavel(dados):
+    return json.dumps(dados, default=str, sort_keys=True)
+
+def medir(funcao, fluxo):
+    tempos = []
+    for pergunta in fluxo:
+        inicio = time.perf_counter()
+        funcao(pergunta)
+        tempos.append(time.perf_counter() - inicio)
+    return estatisticas(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=10_000)
+    parser.add_argument('--perguntas', type=int, default=3000)
+    parser.add_argument('--fracao-quente', type=float, default=0.8, help='fração do tráfego nas perguntas quentes')
+    parser.add_argument('--ttl', type=float, default=2.0, help='TTL das respostas (s); a recarga roda a cada TTL/2')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    caminho = base_sqlite(args.projetos, args.semente, recriar=False)
+    pool = PoolSQLite({'caminho': caminho})
+    preparar_recursos(pool, app.CacheMemoria(max_bytes=512 * 2**20, ttl=3600))
+    busca_nomes = app.BuscaNomes(pool)
+    busca_nomes.atualizar()
+    app.obter_busca_nomes = lambda _pool: busca_nomes
+    fluxo, quentes = montar_fluxo(caminho, args.perguntas, args.fracao_quente, args.semente)
+
+    # Cache de resultados quente para os dois lados: a diferença é só o cache de respostas
+    for pergunta in fluxo:
+        sem_cache(pool, busca_nomes, pergunta)
+    base = medir(lambda pergunta: sem_cache(pool, busca_nomes, pergunta), fluxo)
+
+    respostas = app.CacheRespostas(pool, perguntas_quentes=[p for _, p in app.EXEMPLOS_PERGUNTAS],
+                                   ttl=args.ttl, intervalo=args.ttl / 2, limiar_quente=5)
+    inicio = time.perf_counter()
+    respostas.aquecer()
+    aquecimento = time.perf_counter() - inicio
+    respostas.iniciar()
+    com = medir(lambda pergunta: respostas.obter(respostas.interpretar(pergunta, busca_nomes)), fluxo)
+    m = respostas.metricas()
+    respostas.parar()
+
+    divergentes = [pergunta for pergunta in dict.fromkeys(quentes)
+                   if comparavel(respostas.dados(respostas.interpretar(pergunta, busca_nomes)))
+                   != comparavel(ao_vivo(pool, busca_nomes, pergunta))]
+
+    print(f"{args.projetos:,} projetos · {len(fluxo):,} perguntas ({args.fracao_quente:.0%} em {len(quentes)} quentes) · "
+          f"TTL {args.ttl:g}s · aquecimento em {aquecimento * 1000:.0f}ms")
+    print(f"\n{'caminho':>24} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'média (ms)':>11}")
+    for nome, r in (('sem cache de respostas', base), ('com cache de respostas', com)):
+        print(f"{nome:>24} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['media_ms']:>11.3f}")
+    consultas = m['hits'] + m['misses']
+    print(f"\nhit rate {m['hits'] / consultas:.1%} · {m['promovidas']} chaves promovidas · "
+          f"{m['quentes']} quentes · {m['recargas']} recargas em segundo plano · {m['entradas']} respostas guardadas")
+    print("respostas do cache = montadas na hora: " + ("sim" if not divergentes else f"NÃO ({len(divergentes)})"))
+    if divergentes:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark do retrieval sobre a base sintética
+
+Para cada escala, gera (ou reaproveita) a base de dados_sinteticos.py em
+SQLite e mede cada get_* e o caminho interpretar_pergunta →
+executar_consulta, com o cache de resultados desligado (toda chamada vai
+ao banco) e também com cache quente. Os resultados são acrescentados a um
+JSONL e comparados com a execução anterior da mesma escala: p50 acima da
+tolerância aparece como regressão. Com --mysql BANCO mede um MySQL de
+testes já carregado pelo gerador. Uso:
+
+    python benchmarks/bench_retrieval.py [--escalas 1000 10000 100000] [--amostras 200]
+    python benchmarks/bench_retrieval.py --mysql netproject_bench
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite, preparar_recursos  # noqa: E402
+from dados_sinteticos import carregar_sqlite, config_mysql, gerar  # noqa: E402
+
+RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados', 'retrieval.jsonl')
+
+# Funções sem projeto custam uma varredura inteira: medidas menos vezes
+FUNCOES_GLOBAIS = {
+    'get_projetos_atrasados': app.get_projetos_atrasados,
+    'get_resumo_geral': app.get_resumo_geral,
+    'get_receita_total': app.get_receita_total,
+    'pagina_atrasados': lambda pool: app.paginador_atrasados(pool).pagina(),
+}
+FUNCOES_PROJETO = {
+    'get_projeto_detalhes': app.get_projeto_detalhes,
+    'get_receita_projeto': app.get_receita_projeto,
+    'get_alocacoes_projeto': app.get_alocacoes_projeto,
+    'get_faturas_projeto': app.get_faturas_projeto,
+    'get_faturas_resumo': app.get_faturas_resumo,
+    'get_alocacoes_resumo': app.get_alocacoes_resumo,
+    'pagina_faturas': lambda pool, cod: app.paginador_faturas(pool, cod).pagina(),
+    'pagina_alocacoes': lambda pool, cod: app.paginador_alocacoes(pool, cod).pagina(),
+}
+PERGUNTAS = [
+    "Quais projetos estão atrasados?",
+    "Qual a receita total?",
+    "Status do projeto {cod}",
+    "Qual a receita do projeto {cod}?",
+    "Quem está alocado no projeto {cod}?",
+    "Faturas do projeto {cod}",
+]
+
+def base_sqlite(projetos, semente, recriar):
+    """Arquivo SQLite da escala, gerado só na primeira vez"""
+    caminho = os.path.join(tempfile.gettempdir(), f"netproject_bench_{projetos}_{semente}.sqlite")
+    if recriar or not os.path.exists(caminho):
+        inicio = time.perf_counter()
+        carregar_sqlite(gerar(projetos, semente), caminho + '.tmp')
+        os.replace(caminho + '.tmp', caminho)
+        print(f"  base de {projetos:,} projetos gerada em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    return caminho
+
+def estatisticas(tempos):
+    ms = np.asarray(tempos) * 1000
+    return {
+        'n': len(ms),
+        'media_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+def medir(funcao, argumentos):
+    tempos = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return estatisticas(tempos)
+
+def medir_escala(pool, amostras, repeticoes_globais, semente):
+    """{medida: estatísticas} de todas as funções e do caminho ponta a ponta"""
+    rng = np.random.default_rng(semente)
+    codigos = app.consultar(pool, 'snapshot_projetos')['cod_projeto'].to_numpy()
+    # Códigos de até 6 dígitos: os que extrair_codigo_projeto reconhece
+    codigos = rng.choice(codigos[codigos <= 999_999], amostras).tolist()
+    perguntas = [PERGUNTAS[i % len(PERGUNTAS)].format(cod=cod) for i, cod in enumerate(codigos)]
+
+    def ponta_a_ponta(pergunta):
+        app.executar_consulta(pool, app.interpretar_pergunta(pergunta))
+
+    resultados = {}
+    for nome, funcao in FUNCOES_GLOBAIS.items():
+        resultados[nome] = medir(funcao, [(pool,)] * repeticoes_globais)
+    for nome, funcao in FUNCOES_PROJETO.items():
+        resultados[nome] = medir(funcao, [(pool, cod) for cod in codigos])
+    resultados['ponta_a_ponta'] = medir(ponta_a_ponta, [(p,) for p in perguntas])
+
+    # Mesmas perguntas de novo com cache: primeira passada aquece, segunda é medida
+    cache = app.CacheMemoria()
+    app.obter_cache = lambda: cache
+    medir(ponta_a_ponta, [(p,) for p in perguntas])
+    resultados['ponta_a_ponta_cache'] = medir(ponta_a_ponta, [(p,) for p in perguntas])
+    return resultados
+
+def versao():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def execucao_anterior(caminho, backend, escala):
+    """{medida: registro} da última execução gravada para (backend, escala)"""
+    if not os.path.exists(caminho):
+        return {}
+    anteriores = {}
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            registro = json.loads(linha)
+            if registro['backend'] == backend and registro['escala'] == escala:
+                if registro['execucao'] != anteriores.get('_execucao'):
+                    anteriores = {'_execucao': registro['execucao']}
+                anteriores[registro['medida']] = registro
+    anteriores.pop('_execucao', None)
+    return anteriores
+
+def relatorio(escala, resultados, anteriores, tolerancia):
+    """Imprime a tabela da escala; retorna as medidas que regrediram"""
+    regressoes = []
+    print(f"\n{escala:,} projetos")
+    print(f"{'medida':>24} {'n':>5} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'vs anterior':>12}")
+    for medida, r in resultados.items():
+        comparacao = ''
+        anterior = anteriores.get(medida)
+        if anterior and anterior['p50_ms'] > 0:
+            variacao = r['p50_ms'] / anterior['p50_ms'] - 1
+            comparacao = f"{variacao:+.0%}"
+            if variacao > tolerancia:
+                comparacao += ' ⚠️'
+                regressoes.append(medida)
+        print(f"{medida:>24} {r['n']:>5} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} {comparacao:>12}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='quantidades de projetos (até 1000000)')
+    parser.add_argument('--mysql', metavar='BANCO', help='mede um MySQL de testes em vez do SQLite')
+    parser.add_argument('--amostras', type=int, default=200, help='projetos sorteados por função')
+    parser.add_argument('--repeticoes-globais', type=int, default=5)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--recriar', action='store_true', help='gera as bases SQLite de novo')
+    parser.add_argument('--resultados', default=RESULTADOS, help='JSONL onde os resultados são acrescentados')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='aumento de p50 considerado regressão')
+    args = parser.parse_args()
+
+    execucao = datetime.now().isoformat(timespec='seconds')
+    commit = versao()
+    os.makedirs(os.path.dirname(os.path.abspath(args.resultados)), exist_ok=True)
+
+    if args.mysql:
+        pool = app.PoolMySQL(config_mysql(args.mysql))
+        alvos = [('mysql', None, pool)]
+    else:
+        alvos = [('sqlite', escala, None) for escala in args.escalas]
+
+    regressoes = []
+    for backend, escala, pool in alvos:
+        if pool is None:
+            pool = PoolSQLite({'caminho': base_sqlite(escala, args.semente, args.recriar)})
+        preparar_recursos(pool, app.CacheMemoria(max_bytes=0))  # max_bytes=0: nada fica em cache
+        if escala is None:
+            escala = len(app.consultar(pool, 'snapshot_projetos'))
+
+        resultados = medir_escala(pool, args.amostras, args.repeticoes_globais, args.semente)
+        anteriores = execucao_anterior(args.resultados, backend, escala)
+        regressoes += [f"{escala}:{m}" for m in relatorio(escala, resultados, anteriores, args.tolerancia)]
+
+        with open(args.resultados, 'a', encoding='utf-8') as f:
+            for medida, r in resultados.items():
+                f.write(json.dumps({'execucao': execucao, 'commit': commit, 'backend': backend,
+                                    'escala': escala, 'semente': args.semente, 'medida': medida, **r}) + '\n')
+
+    if regressoes:
+        print(f"\n⚠️ p50 acima de +{args.tolerancia:.0%}: {', '.join(regressoes)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Teste de carga da interface Streamlit com várias sessões simultâneas
+
+Roda o streamlit_app.py com o AppTest (streamlit.testing) sobre a base
+sintética de dados_sinteticos.py. Cada uma das `--sessoes` threads abre
+sessões novas e segue um roteiro de usuário (botão de exemplo, perguntas
+digitadas por código e por nome, paginação, aba de dashboards) até
+completar `--duracao` segundos. As sessões dividem o processo como num
+servidor do Streamlit: pool, cache, snapshot e índice de nomes são os
+mesmos para todas.
+
+Reporta interações por segundo, p50/p95/p99 do rerun por tipo de
+interação, consultas ao banco por interação (as das threads de fundo à
+parte) e o RSS do processo. A latência inclui o parse das mensagens pelo
+AppTest, que o navegador faria do outro lado. Os resultados são
+acrescentados a um JSONL e comparados com a execução anterior da mesma
+configuração, para medir a capacidade antes e depois de mudanças no main().
+Uso:
+
+    python benchmarks/carga_app.py [--projetos 10000] [--sessoes 8] [--duracao 30]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import mysql.connector  # noqa: E402
+import numpy as np  # noqa: E402
+import streamlit as st  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.runtime.scriptrunner import get_script_run_ctx  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.runtime.secrets import Secrets  # noqa: E402
+from streamlit.testing.v1 import AppTest, local_script_runner  # noqa: E402
+
+from streamlit_app import PAINEIS  # noqa: E402
+from bench_retrieval import PERGUNTAS, base_sqlite, estatisticas, versao  # noqa: E402
+from dados_sinteticos import ConexaoSQLite, CursorSQLite, conectar_sqlite  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'streamlit_app.py')
+RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados', 'carga_app.jsonl')
+
+EXEMPLOS = ["📊 Projetos Atrasados", "💰 Receita Total", "📋 Status Projeto"]
+# Prefixos das threads que consultam o banco sem ser a pedido de uma sessão
+THREADS_FUNDO = ('monitor-alteracoes', 'snapshot-projetos', 'busca-nomes', 'replica-analitica', 'recarga-cache',
+                 'receita-mensal', 'respostas-quentes')
+
+# ============================================================================
+# CONTAGEM DE CONSULTAS
+# ============================================================================
+
+class Consultas:
+    """Consultas ao banco por sessão do AppTest e das threads de fundo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.por_sessao = defaultdict(int)
+        self.fundo = 0
+
+    def registrar(self):
+        ctx = get_script_run_ctx(suppress_warning=True)
+        # As threads de consultas paralelas herdam o contexto da sessão que as disparou
+        sessao = ctx.session_state['carga_sessao'] if ctx and 'carga_sessao' in ctx.session_state else None
+        with self._lock:
+            if sessao is not None:
+                self.por_sessao[sessao] += 1
+            elif threading.current_thread().name.startswith(THREADS_FUNDO):
+                self.fundo += 1
+
+CONSULTAS = Consultas()
+
+class CursorContado(CursorSQLite):
+    def execute(self, sql, params=()):
+        CONSULTAS.registrar()
+        return super().execute(sql, params)
+
+class ConexaoContada(ConexaoSQLite):
+    def cursor(self, prepared=False, **_):
+        return CursorContado(self._db)
+
+def preparar_app(caminho, cache):
+    """Aponta o app para a base SQLite e deixa o AppTest rodar sessões em paralelo"""
+    # O script do app importa o mesmo mysql.connector: o PoolMySQL passa a abrir conexões SQLite
+    mysql.connector.connect = lambda **_: ConexaoContada(caminho)
+
+    # Secrets fixos para o processo (o AppTest troca st.secrets a cada run quando recebe os seus)
+    secrets = Secrets([])
+    secrets._secrets = {
+        'mysql': {'host': 'sintetico', 'port': 0, 'user': '', 'password': '', 'database': caminho},
+        'cache': {'backend': 'memoria', 'max_mb': 0 if cache == 'desligado' else 512},
+    }
+    st.secrets = secrets
+
+    # Cada run do AppTest zera o Runtime ao terminar, no meio do run das outras sessões
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or runtime)
+
+    # Como no servidor, o script é compilado uma vez para todas as sessões (o AppTest
+    # recompilaria a cada run, e compilações simultâneas falham no Python 3.11)
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+
+def rss_mb():
+    """RSS atual do processo (Linux); fora dele, o pico"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 2**20 if sys.platform == 'darwin' else pico / 2**10
+
+# ============================================================================
+# ROTEIROS
+# ============================================================================
+
+def montar_roteiros(caminho, quantidade, semente):
+    """Roteiros de usuário: abrir, exemplo, perguntas, paginação, dashboards e de volta ao chat"""
+    db = conectar_sqlite(caminho)
+    projetos = db.execute("SELECT cod_projeto, nom_projeto FROM projeto").fetchall()
+    # Projetos com mais de uma página de faturas, para o roteiro exercitar a paginação
+    paginados = [cod for cod, in db.execute("""
+        SELECT r.cod_projeto FROM receita_pagamento rp JOIN receita r ON r.cod_receita = rp.cod_receita
+        GROUP BY r.cod_projeto HAVING COUNT(*) > 50""")] or [cod for cod, _ in projetos]
+    db.close()
+    rng = np.random.default_rng(semente)
+
+    def pergunta():
+        cod, nome = projetos[rng.integers(len(projetos))]
+        if rng.random() < 0.25:
+            return f"Status do projeto {nome}"
+        return PERGUNTAS[rng.integers(len(PERGUNTAS))].format(cod=cod)
+
+    roteiros = []
+    for _ in range(quantidade):
+        cod = paginados[rng.integers(len(paginados))]
+        roteiros.append([
+            ('abrir', None),
+            ('exemplo', EXEMPLOS[rng.integers(len(EXEMPLOS))]),
+            ('pergunta', pergunta()),
+            ('pergunta', f"Faturas do projeto {cod}"),
+            ('proxima', None),
+            ('painel', PAINEIS[1]),
+            ('painel', PAINEIS[0]),
+            ('pergunta', pergunta()),
+        ])
+    return roteiros
+
+def botao(at, rotulo):
+    return next((b for b in at.button if b.label == rotulo), None)
+
+def interagir(at, acao, valor):
+    """Executa a interação; False quando ela não se aplica à tela atual"""
+    if acao == 'abrir':
+        at.run()
+    elif acao == 'exemplo':
+        botao(at, valor).click().run()
+    elif acao == 'pergunta':
+        at.text_input[0].input(valor)
+        botao(at, "🚀 Enviar").click().run()
+    elif acao == 'proxima':
+        proxima = botao(at, "Próxima ▶")
+        if proxima is None or proxima.disabled:
+            return False
+        proxima.click().run()
+    elif acao == 'painel':
+        at.radio(key='painel').set_value(valor).run()
+    return True
+
+def executar_roteiro(sessao, roteiro, timeout):
+    """[(ação, segundos, consultas, erros)] de uma sessão nova seguindo o roteiro"""
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.session_state['carga_sessao'] = sessao
+    medidas = []
+    for acao, valor in roteiro:
+        antes = CONSULTAS.por_sessao[sessao]
+        inicio = time.perf_counter()
+        if not interagir(at, acao, valor):
+            continue
+        duracao = time.perf_counter() - inicio
+        medidas.append((acao, duracao, CONSULTAS.por_sessao[sessao] - antes, len(at.exception)))
+    return medidas
+
+def carga(roteiros, sessoes, duracao, timeout):
+    """Medidas de todas as interações feitas pelas `sessoes` threads durante `duracao` segundos"""
+    medidas = []
+    falhas = []
+    fim = time.perf_counter() + duracao
+    proximo = iter(range(10**9))
+    lock = threading.Lock()
+
+    def usuario():
+        while time.perf_counter() < fim:
+            with lock:
+                n = next(proximo)
+            try:
+                resultado = executar_roteiro(n, roteiros[n % len(roteiros)], timeout)
+            except Exception as e:  # run estourou o timeout ou a tela não tinha o widget esperado
+                falhas.append(repr(e))
+                continue
+            with lock:
+                medidas.extend(resultado)
+
+    threads = [threading.Thread(target=usuario, name=f"usuario-{i}") for i in range(sessoes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return medidas, falhas, time.perf_counter() - inicio
+
+# ============================================================================
+# RELATÓRIO
+# ============================================================================
+
+def resumir(medidas, falhas, decorrido):
+    """{medida: registro}: uma por tipo de interação e o total"""
+    resultados = {}
+    por_acao = defaultdict(list)
+    for acao, segundos, consultas, erros in medidas:
+        por_acao[acao].append((segundos, consultas, erros))
+    for acao, valores in [*por_acao.items(), ('total', [v for vs in por_acao.values() for v in vs])]:
+        segundos, consultas, erros = zip(*valores)
+        resultados[acao] = {**estatisticas(segundos),
+                            'consultas_por_interacao': round(float(np.mean(consultas)), 2),
+                            'erros': int(sum(erros))}
+    resultados['total'].update({
+        'interacoes_por_s': round(len(medidas) / decorrido, 2),
+        'falhas': len(falhas),
+    })
+    return resultados
+
+def execucao_anterior(caminho, chave):
+    """Registro 'total' da última execução gravada com a mesma configuração"""
+    anterior = None
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            for linha in f:
+                registro = json.loads(linha)
+                if registro['medida'] == 'total' and all(registro.get(k) == v for k, v in chave.items()):
+                    anterior = registro
+    return anterior
+
+def relatorio(resultados, rss, fundo, anterior):
+    print(f"\n{'interação':>10} {'n':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} "
+          f"{'consultas':>10} {'erros':>6}")
+    for acao, r in resultados.items():
+        print(f"{acao:>10} {r['n']:>6} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['p99_ms']:>10.1f} "
+              f"{r['consultas_por_interacao']:>10.2f} {r['erros']:>6}")
+    total = resultados['total']
+    print(f"\n{total['interacoes_por_s']:,.1f} interações/s · {total['falhas']} sessões com falha · "
+          f"{fundo:,} consultas das threads de fundo")
+    print(f"RSS: {rss['inicio']:,.0f} MB no início · {rss['aquecido']:,.0f} MB aquecido · "
+          f"{rss['fim']:,.0f} MB no fim")
+    if anterior:
+        print(f"vs anterior ({anterior['commit'] or anterior['execucao']}): "
+              f"{total['interacoes_por_s'] / anterior['interacoes_por_s'] - 1:+.0%} interações/s · "
+              f"p95 {total['p95_ms'] / anterior['p95_ms'] - 1:+.0%} · "
+              f"RSS {rss['fim'] - anterior['rss_fim_mb']:+,.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=10_000)
+    parser.add_argument('--sessoes', type=int, default=8, help='usuários simultâneos')
+    parser.add_argument('--duracao', type=float, default=30, help='segundos de carga')
+    parser.add_argument('--cache', choices=['memoria', 'desligado'], default='memoria')
+    parser.add_argument('--timeout', type=float, default=60, help='limite de cada rerun')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--resultados', default=RESULTADOS, help='JSONL onde os resultados são acrescentados')
+    args = parser.parse_args()
+
+    caminho = base_sqlite(args.projetos, args.semente, recriar=False)
+    roteiros = montar_roteiros(caminho, 500, args.semente)
+    rss = {'inicio': rss_mb()}
+    preparar_app(caminho, args.cache)
+
+    # Uma sessão sozinha primeiro: carrega pool, snapshot e índice de nomes antes da carga
+    aquecimento = executar_roteiro(-1, roteiros[-1], args.timeout)
+    time.sleep(1)
+    rss['aquecido'] = rss_mb()
+    print(f"{args.projetos:,} projetos · {args.sessoes} sessões · {args.duracao:g}s · cache {args.cache} · "
+          f"aquecimento em {sum(s for _, s, _, _ in aquecimento):.1f}s")
+
+    fundo = CONSULTAS.fundo
+    medidas, falhas, decorrido = carga(roteiros, args.sessoes, args.duracao, args.timeout)
+    fundo = CONSULTAS.fundo - fundo
+    rss['fim'] = rss_mb()
+    if not medidas:
+        sys.exit(f"nenhuma interação completa: {falhas[:3]}")
+    for falha in sorted(set(falhas))[:5]:
+        print(f"⚠️ {falha}", file=sys.stderr)
+
+    resultados = resumir(medidas, falhas, decorrido)
+    chave = {'escala': args.projetos, 'sessoes': args.sessoes, 'cache': args.cache}
+    relatorio(resultados, rss, fundo, execucao_anterior(args.resultados, chave))
+
+    execucao = datetime.now().isoformat(timespec='seconds')
+    commit = versao()
+    resultados['total'].update({'rss_fim_mb': round(rss['fim'], 1), 'consultas_fundo': fundo})
+    os.makedirs(os.path.dirname(os.path.abspath(args.resultados)), exist_ok=True)
+    with open(args.resultados, 'a', encoding='utf-8') as f:
+        for medida, r in resultados.items():
+            f.write(json.dumps({'execucao': execucao, 'commit': commit, **chave, 'semente': args.semente,
+                                'medida': medida, **r}) + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Teste de carga do serviço HTTP (servico.py) sobre a base sintética
+
+Sobe o serviço em outro processo, apontado para a base SQLite de
+dados_sinteticos.py, e dispara perguntas variadas (agregados, por código e
+por nome de projeto) com `--concorrencia` clientes simultâneos durante
+`--duracao` segundos. Reporta requisições por segundo, p50/p95/p99 e os
+códigos HTTP recebidos. Uso:
+
+    python benchmarks/carga_servico.py [--projetos 10000] [--concorrencia 32] [--duracao 20]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import numpy as np  # noqa: E402
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite, preparar_recursos  # noqa: E402
+from bench_retrieval import PERGUNTAS, base_sqlite  # noqa: E402
+from dados_sinteticos import conectar_sqlite  # noqa: E402
+
+def servidor(caminho, porta, threads, timeout, sem_cache):
+    """Processo do serviço: mesmo Servico do servico.py, com o pool na base SQLite"""
+    pool = PoolSQLite({'caminho': caminho})
+    preparar_recursos(pool, app.CacheMemoria(max_bytes=0 if sem_cache else 256 * 2**20))
+    import servico  # depois de fixar os recursos: o servico importa obter_cache/obter_metricas por nome
+    asyncio.run(servico.servir(servico.Servico(pool, threads=threads, timeout=timeout), porta))
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def montar_perguntas(caminho, quantidade, semente):
+    """Perguntas do bench_retrieval com códigos sorteados, mais um quarto citando o nome do projeto"""
+    db = conectar_sqlite(caminho)
+    projetos = db.execute("SELECT cod_projeto, nom_projeto FROM projeto").fetchall()
+    db.close()
+    rng = np.random.default_rng(semente)
+    perguntas = []
+    for i, j in enumerate(rng.integers(len(projetos), size=quantidade)):
+        cod, nome = projetos[j]
+        if i % 4 == 3:
+            perguntas.append(f"Status do projeto {nome}")
+        else:
+            perguntas.append(PERGUNTAS[i % len(PERGUNTAS)].format(cod=cod))
+    return perguntas
+
+async def disparar(url, perguntas, concorrencia, duracao, timeout):
+    """[(segundos, status)] de todas as requisições feitas no período"""
+    cliente = AsyncHTTPClient(max_clients=concorrencia)
+    resultados = []
+    fim = time.perf_counter() + duracao
+    proxima = iter(range(10**9))
+
+    async def trabalhador():
+        while time.perf_counter() < fim:
+            pergunta = perguntas[next(proxima) % len(perguntas)]
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.fetch(url, method='POST', request_timeout=timeout + 5,
+                                               body=json.dumps({'pergunta': pergunta}))
+                status = resposta.code
+            except HTTPClientError as e:
+                status = e.code
+            resultados.append((time.perf_counter() - inicio, status))
+
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return resultados
+
+async def aguardar(url_saude, limite=120):
+    cliente = AsyncHTTPClient()
+    fim = time.perf_counter() + limite
+    while time.perf_counter() < fim:
+        try:
+            saude = json.loads((await cliente.fetch(url_saude)).body)
+            if saude['busca_nomes']['carregado_em']:
+                return saude
+        except (OSError, HTTPClientError):
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("serviço não respondeu")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=10_000)
+    parser.add_argument('--concorrencia', type=int, default=32, help='clientes simultâneos')
+    parser.add_argument('--duracao', type=float, default=20, help='segundos de carga')
+    parser.add_argument('--threads', type=int, default=8, help='threads do serviço')
+    parser.add_argument('--timeout', type=float, default=10.0, help='timeout por requisição no serviço')
+    parser.add_argument('--sem-cache', action='store_true', help='toda pergunta vai ao banco')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    caminho = base_sqlite(args.projetos, args.semente, recriar=False)
+    porta = porta_livre()
+    processo = multiprocessing.Process(target=servidor, daemon=True,
+                                       args=(caminho, porta, args.threads, args.timeout, args.sem_cache))
+    processo.start()
+    perguntas = montar_perguntas(caminho, 2000, args.semente)
+
+    async def carga():
+        base = f"http://127.0.0.1:{porta}"
+        await aguardar(f"{base}/saude")
+        resultados = await disparar(f"{base}/perguntar", perguntas, args.concorrencia, args.duracao, args.timeout)
+        return resultados, (await AsyncHTTPClient().fetch(f"{base}/saude")).body
+
+    try:
+        resultados, saude = asyncio.run(carga())
+    finally:
+        processo.terminate()
+
+    tempos = np.array([t for t, _ in resultados]) * 1000
+    status = Counter(s for _, s in resultados)
+    servico = json.loads(saude)['servico']
+    print(f"{args.projetos:,} projetos · {args.concorrencia} clientes · {args.threads} threads · "
+          f"cache {'desligado' if args.sem_cache else 'ligado'}")
+    print(f"{len(resultados):,} requisições em {args.duracao:g}s → {len(resultados) / args.duracao:,.1f} req/s")
+    print(f"latência (ms): p50 {np.percentile(tempos, 50):.1f} · p95 {np.percentile(tempos, 95):.1f} · "
+          f"p99 {np.percentile(tempos, 99):.1f} · máx {tempos.max():.1f}")
+    print("status HTTP: " + ", ".join(f"{s}: {n:,}" for s, n in sorted(status.items())))
+    print(f"serviço: {servico['timeouts']} timeouts · {servico['recusadas']} recusadas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Base sintética do NetProject para benchmarks
+
+Gera projeto, usuario, receita, receita_pagamento e DWDT_RECURSO_ALOCACAO
+com as colunas e tipos usados pelas consultas do app, de mil a um milhão
+de projetos. A quantidade de faturas segue uma cauda longa (Pareto): a
+maioria dos contratos tem poucas parcelas e alguns têm centenas. A base
+pode ser carregada num arquivo SQLite local (com as funções do MySQL que
+as consultas usam) ou num banco MySQL de testes. Uso:
+
+    python benchmarks/dados_sinteticos.py --projetos 100000 --sqlite base.sqlite
+    python benchmarks/dados_sinteticos.py --projetos 100000 --mysql netproject_bench
+
+Com --mysql, host/usuário/senha vêm de `.streamlit/secrets.toml`; o banco
+de destino precisa ser diferente do configurado ali (as tabelas são
+recriadas).
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+import time
+import weakref
+from itertools import count
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+PRIMEIRO_COD_PROJETO = 10_000
+MAX_PARCELAS = 500
+
+TIPOS = ['Implantação', 'Migração', 'Consultoria', 'Suporte', 'Upgrade', 'Treinamento',
+         'Integração', 'Manutenção']
+PRODUTOS = ['ERP', 'CRM', 'BI', 'Portal', 'Data Lake', 'E-commerce', 'Folha', 'Fiscal',
+            'App Mobile', 'Infraestrutura']
+CLIENTES = ['Alfa', 'Beta', 'Aurora', 'Horizonte', 'Atlântico', 'Cerrado', 'Pampa', 'Serra',
+            'Litoral', 'Vale', 'Nova Era', 'Delta']
+SETORES = ['Logística', 'Saúde', 'Varejo', 'Energia', 'Agro', 'Educação', 'Seguros', 'Têxtil',
+           'Mineração', 'Telecom']
+NOMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela',
+         'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Santos', 'Lima', 'Pereira', 'Costa', 'Ribeiro',
+              'Almeida', 'Carvalho', 'Gomes', 'Martins', 'Rocha', 'Barbosa']
+STATUS_FATURA = ['Pago', 'Programado', 'Aberto', 'Cancelado']
+PESOS_STATUS = [0.55, 0.20, 0.20, 0.05]
+
+# Colunas no dialeto do MySQL; o SQLite aceita o mesmo texto (DECIMAL vira REAL na carga)
+TABELAS = {
+    'usuario': """
+        cod_usuario INT PRIMARY KEY,
+        nom_usuario VARCHAR(120) NOT NULL""",
+    'projeto': """
+        cod_projeto INT PRIMARY KEY,
+        nom_projeto VARCHAR(200) NOT NULL,
+        cod_responsavel INT,
+        dth_inicio DATETIME,
+        dth_prevista DATETIME,
+        flg_status TINYINT NOT NULL""",
+    'receita': """
+        cod_receita INT PRIMARY KEY,
+        cod_projeto INT NOT NULL,
+        total_valor_bruto DECIMAL(15,2)""",
+    'receita_pagamento': """
+        cod_receita_pagamento INT PRIMARY KEY,
+        cod_receita INT NOT NULL,
+        dsc_receita_pagamento VARCHAR(200),
+        vlr_bruto DECIMAL(15,2),
+        dth_faturamento DATETIME NULL,
+        flg_status_fatura VARCHAR(20)""",
+    'DWDT_RECURSO_ALOCACAO': """
+        cod_projeto INT NOT NULL,
+        cod_usuario INT NOT NULL,
+        num_horas_aloc DECIMAL(10,2),
+        num_horas_trab DECIMAL(10,2)""",
+}
+
+# Índices das chaves estrangeiras, criados depois da carga
+INDICES = [
+    ('idx_projeto_responsavel', 'projeto', 'cod_responsavel'),
+    ('idx_receita_projeto', 'receita', 'cod_projeto'),
+    ('idx_pagamento_receita', 'receita_pagamento', 'cod_receita'),
+    ('idx_alocacao_projeto', 'DWDT_RECURSO_ALOCACAO', 'cod_projeto'),
+]
+
+# ============================================================================
+# GERAÇÃO
+# ============================================================================
+
+def _escolher(rng, opcoes, n, pesos=None):
+    """n valores de `opcoes` (array object, sem laço Python)"""
+    indices = rng.choice(len(opcoes), n, p=pesos) if pesos else rng.integers(0, len(opcoes), n)
+    return np.asarray(opcoes, dtype=object)[indices]
+
+def _datas(rng, n, inicio, anos):
+    """n datas-hora uniformes em `anos` anos a partir de `inicio`"""
+    segundos = rng.integers(0, int(anos * 365 * 86400), n).astype('timedelta64[s]')
+    return np.datetime64(inicio, 's') + segundos
+
+def gerar(projetos, semente=42, alfa_faturas=1.5):
+    """{tabela: DataFrame} com `projetos` projetos
+
+    `alfa_faturas` é o expoente da Pareto de parcelas por receita (menor =
+    cauda mais longa).
+    """
+    rng = np.random.default_rng(semente)
+
+    # usuario: nomes únicos (sufixo numérico quando as combinações acabam)
+    n_usuarios = max(50, projetos // 20)
+    i = np.arange(n_usuarios)
+    combinacoes = len(NOMES) * len(SOBRENOMES)
+    nomes = (np.asarray(NOMES, dtype=object)[i % len(NOMES)] + ' '
+             + np.asarray(SOBRENOMES, dtype=object)[(i // len(NOMES)) % len(SOBRENOMES)])
+    rodada = i // combinacoes
+    nomes = np.where(rodada > 0, nomes + ' ' + (rodada + 1).astype(str).astype(object), nomes)
+    usuario = pd.DataFrame({'cod_usuario': i + 1, 'nom_usuario': nomes})
+
+    # projeto
+    cod_projeto = PRIMEIRO_COD_PROJETO + np.arange(projetos)
+    nom_projeto = (_escolher(rng, TIPOS, projetos) + ' ' + _escolher(rng, PRODUTOS, projetos)
+                   + ' - ' + _escolher(rng, CLIENTES, projetos) + ' ' + _escolher(rng, SETORES, projetos))
+    dth_inicio = _datas(rng, projetos, '2018-01-01', 8)
+    dth_prevista = dth_inicio + rng.integers(30, 900, projetos).astype('timedelta64[D]')
+    projeto = pd.DataFrame({
+        'cod_projeto': cod_projeto,
+        'nom_projeto': nom_projeto,
+        'cod_responsavel': rng.integers(1, n_usuarios + 1, projetos),
+        'dth_inicio': dth_inicio,
+        'dth_prevista': dth_prevista,
+        'flg_status': (rng.random(projetos) < 0.75).astype(np.int8),
+    })
+
+    # receita: ~1,5 contratos por projeto
+    qtd_receitas = rng.poisson(1.5, projetos)
+    n_receitas = int(qtd_receitas.sum())
+    total_receita = np.round(rng.lognormal(10.5, 1.0, n_receitas), 2)
+    inicio_receita = np.repeat(dth_inicio, qtd_receitas)
+    receita = pd.DataFrame({
+        'cod_receita': np.arange(1, n_receitas + 1),
+        'cod_projeto': np.repeat(cod_projeto, qtd_receitas),
+        'total_valor_bruto': total_receita,
+    })
+
+    # receita_pagamento: parcelas por contrato com cauda longa
+    parcelas = np.minimum(np.floor(rng.pareto(alfa_faturas, n_receitas) * 3).astype(np.int64), MAX_PARCELAS)
+    n_faturas = int(parcelas.sum())
+    desloc = np.repeat(np.cumsum(parcelas) - parcelas, parcelas)
+    numero = np.arange(n_faturas) - desloc + 1  # 1..n dentro de cada contrato
+    de = np.repeat(parcelas, parcelas)
+    dth_faturamento = (np.repeat(inicio_receita, parcelas)
+                       + (numero * 30).astype('timedelta64[D]')
+                       + rng.integers(-5, 6, n_faturas).astype('timedelta64[D]'))
+    dth_faturamento[rng.random(n_faturas) < 0.03] = np.datetime64('NaT')
+    receita_pagamento = pd.DataFrame({
+        'cod_receita_pagamento': np.arange(1, n_faturas + 1),
+        'cod_receita': np.repeat(receita['cod_receita'].to_numpy(), parcelas),
+        'dsc_receita_pagamento': 'Parcela ' + pd.Series(numero).astype(str) + '/' + pd.Series(de).astype(str),
+        'vlr_bruto': np.round(np.repeat(total_receita / np.maximum(parcelas, 1), parcelas)
+                              * rng.uniform(0.9, 1.1, n_faturas), 2),
+        'dth_faturamento': dth_faturamento,
+        'flg_status_fatura': _escolher(rng, STATUS_FATURA, n_faturas, PESOS_STATUS),
+    })
+
+    # DWDT_RECURSO_ALOCACAO: ~4 linhas por projeto (a mesma pessoa pode repetir)
+    qtd_alocacoes = rng.poisson(4, projetos)
+    n_alocacoes = int(qtd_alocacoes.sum())
+    horas = rng.integers(4, 400, n_alocacoes).astype(np.float64)
+    alocacao = pd.DataFrame({
+        'cod_projeto': np.repeat(cod_projeto, qtd_alocacoes),
+        'cod_usuario': rng.integers(1, n_usuarios + 1, n_alocacoes),
+        'num_horas_aloc': horas,
+        'num_horas_trab': np.round(horas * rng.uniform(0.3, 1.2, n_alocacoes), 1),
+    })
+
+    return {
+        'usuario': usuario,
+        'projeto': projeto,
+        'receita': receita,
+        'receita_pagamento': receita_pagamento,
+        'DWDT_RECURSO_ALOCACAO': alocacao,
+    }
+
+def _linhas(df, tamanho=100_000):
+    """Tuplas de tipos Python (datas em texto, NaT → None), em blocos"""
+    for inicio in range(0, len(df), tamanho):
+        bloco = df.iloc[inicio:inicio + tamanho]
+        colunas = []
+        for nome in bloco.columns:
+            serie = bloco[nome]
+            if pd.api.types.is_datetime64_any_dtype(serie):
+                texto = serie.dt.strftime('%Y-%m-%d %H:%M:%S').astype(object)
+                colunas.append(texto.where(serie.notna(), None).tolist())
+            else:
+                colunas.append(serie.tolist())
+        yield list(zip(*colunas))
+
+# ============================================================================
+# SQLITE (substituto local do MySQL)
+# ============================================================================
+
+def _data(valor):
+    return None if valor is None else date.fromisoformat(str(valor)[:10])
+
+# DATETIME volta como datetime, como no mysql.connector
+sqlite3.register_converter('DATETIME', lambda b: datetime.fromisoformat(b.decode()))
+
+def conectar_sqlite(caminho):
+    """Conexão sqlite3 com NOW(), CURDATE(), DATEDIFF(), YEAR(), MONTH() e DATABASE() do MySQL"""
+    db = sqlite3.connect(caminho, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    db.create_function('NOW', 0, lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    db.create_function('CURDATE', 0, lambda: date.today().isoformat())
+    db.create_function('DATABASE', 0, lambda: 'main')
+    db.create_function('DATEDIFF', 2, lambda a, b: None if a is None or b is None
+                       else (_data(a) - _data(b)).days, deterministic=True)
+    db.create_function('YEAR', 1, lambda a: None if a is None else int(str(a)[:4]), deterministic=True)
+    db.create_function('MONTH', 1, lambda a: None if a is None else int(str(a)[5:7]), deterministic=True)
+    return db
+
+def atualizar_catalogo(db):
+    """Espelha os índices do SQLite em information_schema.STATISTICS, como no MySQL"""
+    if 'information_schema' not in {linha[1] for linha in db.execute("PRAGMA database_list")}:
+        db.execute("ATTACH DATABASE ':memory:' AS information_schema")
+        db.execute("""
+            CREATE TABLE information_schema.STATISTICS (
+                TABLE_SCHEMA TEXT, TABLE_NAME TEXT, NON_UNIQUE INTEGER,
+                INDEX_NAME TEXT, SEQ_IN_INDEX INTEGER, COLUMN_NAME TEXT
+            )
+        """)
+    linhas = []
+    tabelas = [t for t, in db.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")]
+    for tabela in tabelas:
+        for _, indice, unico, origem, _ in db.execute(f"PRAGMA main.index_list('{tabela}')"):
+            nome = 'PRIMARY' if origem == 'pk' else indice
+            for seq, _, coluna in db.execute(f"PRAGMA main.index_info('{indice}')"):
+                linhas.append(('main', tabela, int(not unico), nome, seq + 1, coluna))
+    db.execute("DELETE FROM information_schema.STATISTICS")
+    db.executemany("INSERT INTO information_schema.STATISTICS VALUES (?, ?, ?, ?, ?, ?)", linhas)
+
+# connection_id -> conexão aberta, para o KILL QUERY
+_CONEXOES = weakref.WeakValueDictionary()
+_IDS_CONEXAO = count(1)
+
+class CursorSQLite:
+    """Cursor com a interface usada do mysql.connector (`%s`, column_names)
+
+    Consultas a information_schema.STATISTICS veem os índices atuais,
+    EXPLAIN vira EXPLAIN QUERY PLAN, para o diagnóstico de índices, e
+    KILL QUERY <id> interrompe a consulta em andamento na outra conexão.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._cursor = db.cursor()
+        self.column_names = ()
+        self.description = None
+
+    def execute(self, sql, params=()):
+        kill = re.match(r'\s*KILL\s+QUERY\s+(\d+)\s*$', sql, re.IGNORECASE)
+        if kill:
+            conexao = _CONEXOES.get(int(kill.group(1)))
+            if conexao is not None:
+                conexao._db.interrupt()
+            return
+        if 'information_schema' in sql:
+            atualizar_catalogo(self._db)
+        comando = sql.lstrip()
+        if comando[:8].upper() == 'EXPLAIN ' and not comando[8:].lstrip().upper().startswith('QUERY PLAN'):
+            sql = 'EXPLAIN QUERY PLAN ' + comando[8:]
+        self._cursor.execute(sql.replace('%s', '?'), tuple(params or ()))
+        self.description = self._cursor.description
+        self.column_names = tuple(d[0] for d in self.description or ())
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, tamanho):
+        return self._cursor.fetchmany(tamanho)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def close(self):
+        self._cursor.close()
+
+class ConexaoSQLite:
+    """Conexão SQLite que o PoolMySQL consegue usar no lugar do mysql.connector"""
+
+    def __init__(self, caminho):
+        self._db = conectar_sqlite(caminho)
+        self.connection_id = next(_IDS_CONEXAO)
+        _CONEXOES[self.connection_id] = self
+
+    def cursor(self, prepared=False, **_):
+        return CursorSQLite(self._db)
+
+    def ping(self, reconnect=False):
+        self._db.execute("SELECT 1")
+
+    def reconnect(self, **_):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+def carregar_sqlite(tabelas, caminho):
+    """Recria as tabelas no arquivo SQLite e carrega os DataFrames"""
+    db = conectar_sqlite(caminho)
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    for nome, df in tabelas.items():
+        colunas = re.sub(r'DECIMAL\(\d+,\s*\d+\)', 'REAL', TABELAS[nome])
+        db.execute(f"DROP TABLE IF EXISTS {nome}")
+        db.execute(f"CREATE TABLE {nome} ({colunas})")
+        sql = f"INSERT INTO {nome} VALUES ({', '.join(['?'] * len(df.columns))})"
+        for bloco in _linhas(df):
+            db.executemany(sql, bloco)
+    for indice, tabela, coluna in INDICES:
+        db.execute(f"CREATE INDEX {indice} ON {tabela} ({coluna})")
+    db.commit()
+    db.execute("ANALYZE")
+    db.close()
+
+# ============================================================================
+# MYSQL DE TESTES
+# ============================================================================
+
+def carregar_mysql(tabelas, config):
+    """Recria as tabelas no banco MySQL de `config` e carrega os DataFrames"""
+    import mysql.connector
+
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+    try:
+        for nome, df in tabelas.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {nome}")
+            cursor.execute(f"CREATE TABLE {nome} ({TABELAS[nome]}) ENGINE=InnoDB")
+            sql = f"INSERT INTO {nome} VALUES ({', '.join(['%s'] * len(df.columns))})"
+            for bloco in _linhas(df, tamanho=5_000):
+                cursor.executemany(sql, bloco)
+                conn.commit()
+        for indice, tabela, coluna in INDICES:
+            cursor.execute(f"CREATE INDEX {indice} ON {tabela} ({coluna})")
+        for nome in tabelas:
+            cursor.execute(f"ANALYZE TABLE {nome}")
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+def config_mysql(banco):
+    """Credenciais de `.streamlit/secrets.toml`, apontando para o banco de testes"""
+    import streamlit as st
+
+    cfg = st.secrets["mysql"]
+    if banco == cfg["database"]:
+        raise SystemExit(f"❌ '{banco}' é o banco configurado no app; use um banco de testes")
+    return {'host': cfg["host"], 'port': cfg["port"], 'user': cfg["user"],
+            'password': cfg["password"], 'database': banco}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=10_000, help='quantidade de projetos (1000 a 1000000)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--alfa-faturas', type=float, default=1.5, help='expoente da cauda de faturas')
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--sqlite', metavar='ARQUIVO', help='arquivo SQLite de destino')
+    destino.add_argument('--mysql', metavar='BANCO', help='banco MySQL de testes de destino')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    tabelas = gerar(args.projetos, args.semente, args.alfa_faturas)
+    geracao = time.perf_counter() - inicio
+    if args.sqlite:
+        carregar_sqlite(tabelas, args.sqlite)
+    else:
+        carregar_mysql(tabelas, config_mysql(args.mysql))
+    contagens = ', '.join(f"{nome}: {len(df):,}" for nome, df in tabelas.items())
+    print(f"✅ {contagens} (gerado em {geracao:.1f}s, carregado em "
+          f"{time.perf_counter() - inicio - geracao:.1f}s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
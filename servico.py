@@ -0,0 +1,221 @@
+"""
+🤖 AGENTE RAG - NETPROJECT
+Serviço HTTP/JSON do agente (sem a interface Streamlit)
+
+Expõe o pipeline do chat (interpretar_pergunta → executar_consulta →
+gerar_resposta_dados) para outras ferramentas, sem o rerun do script a
+cada chamada. O servidor é assíncrono (Tornado, o mesmo que o Streamlit
+usa); as consultas rodam em um conjunto limitado de threads sobre o pool
+MySQL, o cache e o snapshot compartilhados, com timeout por requisição.
+Perguntas repetidas saem prontas do cache de respostas (o mesmo do app).
+Usa as credenciais de `.streamlit/secrets.toml`.
+
+Uso:
+    python servico.py [--porta 8600] [--threads 8] [--timeout 10]
+
+Rotas:
+    POST /perguntar  {"pergunta": "...", "apos": <proxima>}  → resposta em JSON
+    GET  /saude      pool, caches, índice de nomes e fila do serviço
+    GET  /metricas   métricas no formato Prometheus
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import tornado.web  # noqa: E402  (instalado com o Streamlit)
+
+from streamlit_app import (  # noqa: E402
+    criar_pool,
+    executar_consulta,
+    gerar_resposta_dados,
+    limite_requisicao,
+    obter_busca_nomes,
+    obter_cache,
+    obter_disjuntor,
+    obter_metricas,
+    obter_reserva,
+    obter_respostas,
+)
+
+class Sobrecarregado(Exception):
+    """Fila cheia: recusar na hora é melhor que deixar a requisição estourar o timeout na fila"""
+
+def _chave_para_json(chave):
+    """Chave de paginação → lista JSON (datas viram {"data": ISO})"""
+    if chave is None:
+        return None
+    return [{'data': v.isoformat()} if isinstance(v, (datetime, date)) else v for v in chave]
+
+def _chave_de_json(valores):
+    """Inverso de _chave_para_json"""
+    if valores is None:
+        return None
+    if not isinstance(valores, list):
+        raise ValueError("apos deve ser a lista recebida em `proxima`")
+    return tuple(datetime.fromisoformat(v['data']) if isinstance(v, dict) else v for v in valores)
+
+def _json_padrao(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return str(valor)
+
+class Servico:
+    """Pipeline do agente compartilhado pelas requisições
+
+    Cada pergunta ocupa uma thread do executor (as consultas são síncronas)
+    e o event loop só aguarda. Além de `threads` em execução, aceita até
+    `max_pendentes` na fila; acima disso responde 503. No timeout a
+    requisição responde 504 e, se ainda estava na fila, é descartada; se
+    já estava no banco, a consulta é cancelada (KILL QUERY) no mesmo
+    timeout, ou antes, no prazo do template.
+    """
+
+    def __init__(self, pool, threads=8, timeout=10.0, max_pendentes=None):
+        self.pool = pool
+        self.timeout = timeout
+        self.max_pendentes = max_pendentes or threads * 8
+        self.pendentes = 0
+        self.contadores = {'respostas': 0, 'erros': 0, 'timeouts': 0, 'recusadas': 0}
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="servico")
+        self.busca_nomes = obter_busca_nomes(pool)
+        self.respostas = obter_respostas(pool)  # aquece as perguntas quentes na partida
+
+    def responder(self, pergunta, apos=None, limite=None):
+        """Pipeline completo para uma pergunta (roda numa thread do executor)
+
+        `limite` (time.monotonic()) é o fim do timeout da requisição: as
+        consultas ainda em andamento nesse momento são canceladas.
+        """
+        with limite_requisicao(limite):
+            interpretacao = self.respostas.interpretar(pergunta, self.busca_nomes)
+            if not interpretacao['intencao']:
+                return {'sucesso': False, 'intencao': None, 'cod_projeto': interpretacao['cod_projeto'],
+                        'erro': 'Não consegui entender a pergunta. Tente reformular.'}
+            if apos is None:
+                return self.respostas.dados(interpretacao)
+            return gerar_resposta_dados(interpretacao, executar_consulta(self.pool, interpretacao), apos)
+
+    def _liberar(self, _):
+        self.pendentes -= 1
+
+    async def perguntar(self, pergunta, apos=None):
+        if self.pendentes >= self.max_pendentes:
+            self.contadores['recusadas'] += 1
+            raise Sobrecarregado()
+        loop = asyncio.get_running_loop()
+        futuro = self.executor.submit(self.responder, pergunta, apos, time.monotonic() + self.timeout)
+        # A vaga só é liberada quando a thread termina, mesmo que a requisição já tenha expirado
+        self.pendentes += 1
+        futuro.add_done_callback(lambda f: loop.call_soon_threadsafe(self._liberar, f))
+        try:
+            resposta = await asyncio.wait_for(asyncio.wrap_future(futuro), self.timeout)
+        except asyncio.TimeoutError:
+            self.contadores['timeouts'] += 1
+            raise
+        except Exception:
+            self.contadores['erros'] += 1
+            raise
+        self.contadores['respostas'] += 1
+        return resposta
+
+    def saude(self):
+        return {
+            'pool': self.pool.metricas(),
+            'cache': obter_cache().metricas(),
+            'disjuntor': obter_disjuntor().metricas(),
+            'reserva': obter_reserva().metricas(),
+            'respostas': self.respostas.metricas(),
+            'busca_nomes': {**self.busca_nomes.metricas(),
+                            'carregado_em': self.busca_nomes.carregado_em},
+            'servico': {'pendentes': self.pendentes, 'max_pendentes': self.max_pendentes,
+                        'timeout_s': self.timeout, **self.contadores},
+        }
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, servico):
+        self.servico = servico
+
+    def responder_json(self, status, corpo):
+        self.set_status(status)
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        self.finish(json.dumps(corpo, ensure_ascii=False, default=_json_padrao))
+
+class PerguntarHandler(BaseHandler):
+    async def post(self):
+        inicio = time.perf_counter()
+        try:
+            corpo = json.loads(self.request.body or b'{}')
+            pergunta = corpo.get('pergunta')
+            apos = _chave_de_json(corpo.get('apos'))
+        except (ValueError, AttributeError, TypeError, KeyError) as e:
+            return self.responder_json(400, {'erro': f'Corpo inválido: {e}'})
+        if not isinstance(pergunta, str) or not pergunta.strip():
+            return self.responder_json(400, {'erro': 'Campo "pergunta" obrigatório'})
+
+        try:
+            resposta = await self.servico.perguntar(pergunta, apos)
+        except Sobrecarregado:
+            self.set_header('Retry-After', '1')
+            return self.responder_json(503, {'erro': 'Serviço sobrecarregado, tente novamente'})
+        except asyncio.TimeoutError:
+            return self.responder_json(504, {'erro': f'Sem resposta em {self.servico.timeout:g}s'})
+        except Exception as e:
+            return self.responder_json(500, {'erro': str(e)})
+
+        if 'proxima' in resposta:
+            resposta['proxima'] = _chave_para_json(resposta['proxima'])
+        duracao = time.perf_counter() - inicio
+        obter_metricas().observar('camada', 'servico', duracao)
+        resposta['duracao_ms'] = round(duracao * 1000, 2)
+        self.responder_json(200, resposta)
+
+class SaudeHandler(BaseHandler):
+    def get(self):
+        self.responder_json(200, self.servico.saude())
+
+class MetricasHandler(BaseHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.finish(obter_metricas().prometheus())
+
+def criar_aplicacao(servico):
+    rotas = [
+        (r'/perguntar', PerguntarHandler),
+        (r'/saude', SaudeHandler),
+        (r'/metricas', MetricasHandler),
+    ]
+    return tornado.web.Application([(rota, handler, {'servico': servico}) for rota, handler in rotas])
+
+async def servir(servico, porta, endereco='127.0.0.1'):
+    """Atende até o processo ser encerrado"""
+    criar_aplicacao(servico).listen(porta, address=endereco)
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--porta', type=int, default=8600)
+    parser.add_argument('--endereco', default='127.0.0.1')
+    parser.add_argument('--threads', type=int, default=8, help='perguntas processadas ao mesmo tempo')
+    parser.add_argument('--timeout', type=float, default=10.0, help='segundos por requisição')
+    parser.add_argument('--max-pendentes', type=int, help='fila máxima antes de responder 503 (padrão: 8 × threads)')
+    args = parser.parse_args()
+
+    servico = Servico(criar_pool(), threads=args.threads, timeout=args.timeout, max_pendentes=args.max_pendentes)
+    print(f"🤖 Servindo em http://{args.endereco}:{args.porta} ({args.threads} threads, "
+          f"timeout {args.timeout:g}s)")
+    asyncio.run(servir(servico, args.porta, args.endereco))
+
+if __name__ == "__main__":
+    main()
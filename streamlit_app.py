@@ -10,9 +10,39 @@ TCC Pós-Graduação em IA e Big Data
 import streamlit as st
 import mysql.connector
 import pandas as pd
-from datetime import datetime
+import numpy as np
+import contextvars
+import hashlib
+import heapq
+import inspect
+import json
+import math
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from datetime import date, datetime
+from decimal import Decimal
 import plotly.express as px
-import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.parquet as pq
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    import duckdb
+except ImportError:  # só necessário para a réplica analítica (opcional)
+    duckdb = None
 
 # ============================================================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -120,35 +150,1369 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ============================================================================
-# FUNÇÕES DE CONEXÃO E CACHE
+# RECURSOS COMPARTILHADOS (um por processo, com ou sem Streamlit)
 # ============================================================================
 
 @st.cache_resource
-def conectar_mysql():
-    """Conecta ao banco MySQL (com cache para reutilizar conexão)"""
+def _registro_recursos():
+    """{nome da função: ({chave: recurso}, trava)} dos recursos compartilhados"""
+    return {}
+
+# No `streamlit run` o st.cache_resource devolve o mesmo registro a cada rerun:
+# threads de fundo iniciadas numa execução encontram os recursos criados nas seguintes
+_RECURSOS = _registro_recursos()
+
+def recurso_compartilhado(funcao):
+    """Um recurso por processo (pool, cache, threads), com ou sem Streamlit
+
+    O st.cache_resource não guarda nada sem ScriptRunContext (serviço HTTP,
+    scripts, threads de fundo do próprio app) e criaria outro
+    pool/cache/thread a cada chamada. Os recursos ficam num registro do
+    processo, o mesmo para sessões e threads de fundo, com a regra de chave
+    do st.cache_resource: argumentos com prefixo `_` não entram nela.
+    """
+    assinatura = inspect.signature(funcao)
+    recursos, trava = _RECURSOS.setdefault(funcao.__qualname__, ({}, threading.RLock()))
+
+    @wraps(funcao)
+    def obter(*args, **kwargs):
+        argumentos = assinatura.bind(*args, **kwargs)
+        chave = tuple((nome, valor) for nome, valor in argumentos.arguments.items() if not nome.startswith('_'))
+        with trava:
+            if chave not in recursos:
+                recursos[chave] = funcao(*args, **kwargs)
+            return recursos[chave]
+
+    obter.clear = recursos.clear
+    return obter
+
+# ============================================================================
+# INSTRUMENTAÇÃO (latência por camada e por consulta, consultas lentas)
+# ============================================================================
+
+# Limites superiores (s) dos buckets dos histogramas de latência
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metricas:
+    """Histogramas de latência, contadores e log de consultas lentas do processo
+
+    Histogramas por camada do pipeline (interpretação, retrieval, query,
+    geração) e por template de consulta no banco; contadores de hit/miss do
+    cache e de linhas retornadas por template. Consultas acima de
+    `limiar_lento` guardam o plano do EXPLAIN.
+    """
+
+    def __init__(self, limiar_lento=0.5, explain=True, max_lentas=50):
+        self.limiar_lento = limiar_lento
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (metrica, rotulo) -> [contagens por bucket, soma, total]
+        self._contadores = {}   # (nome, template) -> valor
+        self._lentas = deque(maxlen=max_lentas)
+
+    def observar(self, metrica, rotulo, segundos):
+        indice = bisect_left(BUCKETS_LATENCIA, segundos)
+        with self._lock:
+            histograma = self._histogramas.get((metrica, rotulo))
+            if histograma is None:
+                histograma = self._histogramas[(metrica, rotulo)] = [[0] * (len(BUCKETS_LATENCIA) + 1), 0.0, 0]
+            histograma[0][indice] += 1
+            histograma[1] += segundos
+            histograma[2] += 1
+
+    def contar(self, nome, template, valor=1):
+        with self._lock:
+            self._contadores[(nome, template)] = self._contadores.get((nome, template), 0) + valor
+
+    def registrar_lenta(self, template, params, segundos, linhas, plano=None, erro=None):
+        with self._lock:
+            self._lentas.appendleft({
+                'quando': datetime.now().isoformat(timespec='seconds'),
+                'template': template,
+                'params': json.dumps(list(params), default=str)[:500],
+                'duracao_s': round(segundos, 4),
+                'linhas': linhas,
+                'plano': plano,
+                'erro_explain': erro,
+            })
+
+    def consultas_lentas(self):
+        with self._lock:
+            return list(self._lentas)
+
+    def limpar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+            self._lentas.clear()
+
+    @staticmethod
+    def _percentil(contagens, total, q):
+        """Estimativa do percentil q interpolando dentro do bucket"""
+        alvo = q * total
+        acumulado = 0
+        for i, contagem in enumerate(contagens):
+            if contagem and acumulado + contagem >= alvo:
+                inferior = BUCKETS_LATENCIA[i - 1] if i else 0.0
+                superior = BUCKETS_LATENCIA[i] if i < len(BUCKETS_LATENCIA) else BUCKETS_LATENCIA[-1]
+                return inferior + (superior - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return 0.0
+
+    def resumo(self):
+        """Snapshot serializável em JSON: camadas, templates e consultas lentas"""
+        with self._lock:
+            histogramas = {chave: (list(h[0]), h[1], h[2]) for chave, h in self._histogramas.items()}
+            contadores = dict(self._contadores)
+            lentas = list(self._lentas)
+
+        def linha(contagens, soma, total):
+            return {
+                'total': total,
+                'media_ms': 1000 * soma / total if total else 0.0,
+                'p50_ms': 1000 * self._percentil(contagens, total, 0.50),
+                'p95_ms': 1000 * self._percentil(contagens, total, 0.95),
+                'p99_ms': 1000 * self._percentil(contagens, total, 0.99),
+                'buckets': dict(zip([*map(str, BUCKETS_LATENCIA), '+Inf'], contagens)),
+            }
+
+        templates = {t for (_, t) in contadores} | {r for (m, r) in histogramas if m == 'consulta'}
+        return {
+            'camadas': {r: linha(*h) for (m, r), h in sorted(histogramas.items()) if m == 'camada'},
+            'consultas': {
+                t: {
+                    **(linha(*histogramas[('consulta', t)]) if ('consulta', t) in histogramas else {}),
+                    'cache_hits': contadores.get(('cache_hits', t), 0),
+                    'cache_misses': contadores.get(('cache_misses', t), 0),
+                    'linhas': contadores.get(('linhas', t), 0),
+                    'replica': contadores.get(('replica', t), 0),
+                    'prazos_excedidos': contadores.get(('prazos_excedidos', t), 0),
+                    'obsoletos': contadores.get(('obsoletos', t), 0),
+                }
+                for t in sorted(templates)
+            },
+            'consultas_lentas': lentas,
+        }
+
+    def prometheus(self):
+        """Exposição no formato texto do Prometheus"""
+        with self._lock:
+            histogramas = sorted((chave, (list(h[0]), h[1], h[2])) for chave, h in self._histogramas.items())
+            contadores = sorted(self._contadores.items())
+
+        linhas = []
+        for metrica, rotulo, descricao in (
+            ('camada', 'camada', 'Latência por camada do pipeline RAG'),
+            ('consulta', 'template', 'Latência das consultas no banco por template'),
+        ):
+            nome = f"netproject_{metrica}_segundos"
+            linhas += [f"# HELP {nome} {descricao}", f"# TYPE {nome} histogram"]
+            for (m, valor), (contagens, soma, total) in histogramas:
+                if m != metrica:
+                    continue
+                acumulado = 0
+                for limite, contagem in zip([*map(str, BUCKETS_LATENCIA), '+Inf'], contagens):
+                    acumulado += contagem
+                    linhas.append(f'{nome}_bucket{{{rotulo}="{valor}",le="{limite}"}} {acumulado}')
+                linhas.append(f'{nome}_sum{{{rotulo}="{valor}"}} {soma:.6f}')
+                linhas.append(f'{nome}_count{{{rotulo}="{valor}"}} {total}')
+        for nome, descricao in (
+            ('cache_hits', 'Consultas atendidas pelo cache de resultados'),
+            ('cache_misses', 'Consultas que foram ao banco'),
+            ('linhas', 'Linhas retornadas pelo banco'),
+            ('replica', 'Consultas atendidas pela réplica analítica'),
+            ('prazos_excedidos', 'Consultas interrompidas por passar do prazo'),
+            ('obsoletos', 'Consultas respondidas com o último resultado bom (banco lento ou fora)'),
+        ):
+            linhas += [f"# HELP netproject_{nome}_total {descricao}", f"# TYPE netproject_{nome}_total counter"]
+            linhas += [f'netproject_{nome}_total{{template="{t}"}} {v}' for (n, t), v in contadores if n == nome]
+        return "\n".join(linhas) + "\n"
+
+@recurso_compartilhado
+def obter_metricas():
+    """Métricas do processo, configuradas na seção [metricas] dos secrets"""
+    cfg = ler_config("metricas")
+    return Metricas(
+        limiar_lento=float(cfg.get("limiar_lento_ms", 500)) / 1000,
+        explain=bool(cfg.get("explain", True)),
+        max_lentas=int(cfg.get("max_lentas", 50)),
+    )
+
+def medir_camada(camada):
+    """Decorador: registra a duração de cada chamada no histograma da camada"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                obter_metricas().observar('camada', camada, time.perf_counter() - inicio)
+        return medida
+    return decorador
+
+def capturar_explain(conn, sql, params):
+    """Plano do EXPLAIN da consulta como lista de dicts"""
+    cursor = conn.cursor()
     try:
-        conn = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            port=st.secrets["mysql"]["port"],
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"]
-        )
+        cursor.execute("EXPLAIN " + sql, params)
+        colunas = cursor.column_names
+        return [
+            {coluna: valor if valor is None or isinstance(valor, (int, float)) else str(valor)
+             for coluna, valor in zip(colunas, linha)}
+            for linha in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+
+# ============================================================================
+# FUNÇÕES DE CONEXÃO E CACHE
+# ============================================================================
+
+class PoolMySQL:
+    """Pool de conexões MySQL thread-safe, com ping de liveness e métricas"""
+
+    # Erros que indicam conexão quebrada (socket caído, servidor reiniciado)
+    ERROS_CONEXAO = (mysql.connector.errors.OperationalError,
+                     mysql.connector.errors.InterfaceError)
+
+    def __init__(self, config, tamanho=10, timeout_checkout=30.0, intervalo_ping=10.0, folga_cancelamento=0.5,
+                 timeout_cancelamento=2.0):
+        self.config = config
+        self.tamanho = tamanho
+        self.timeout_checkout = timeout_checkout
+        self.intervalo_ping = intervalo_ping
+        # Espera além do prazo antes do KILL QUERY: o MAX_EXECUTION_TIME do servidor age primeiro
+        self.folga_cancelamento = folga_cancelamento
+        # Conexão do KILL QUERY: com o banco travado, desiste logo em vez de prender o vigia
+        self.timeout_cancelamento = timeout_cancelamento
+
+        self._cond = threading.Condition()
+        self._livres = []  # pilha LIFO de (conexão, último uso)
+        self._criadas = 0
+        self._em_uso = 0
+        self._checkouts = 0
+        self._esperas = 0
+        self._tempo_espera = 0.0
+        self._tempo_espera_max = 0.0
+        self._reconexoes = 0
+        self._descartadas = 0
+        # Cursores preparados por conexão: {conn: {template: cursor}}
+        self._preparados = weakref.WeakKeyDictionary()
+        # Réplica analítica para as agregações (definida por obter_replica, se ativa)
+        self.replica = None
+        self._vigia = VigiaPrazos(self.cancelar)
+
+    def _nova_conexao(self, **opcoes):
+        return mysql.connector.connect(**{**self.config, **opcoes})
+
+    def _validar(self, conn, ultimo_uso):
+        """Pinga conexões ociosas e reconecta se o socket caiu"""
+        if time.monotonic() - ultimo_uso < self.intervalo_ping:
+            return conn
+        try:
+            conn.ping(reconnect=False)
+        except mysql.connector.Error:
+            conn.reconnect(attempts=2, delay=0.5)
+            with self._cond:
+                self._reconexoes += 1
+                # Statements preparados morrem junto com a sessão antiga
+                self._preparados.pop(conn, None)
         return conn
+
+    def obter(self, timeout=None):
+        """Retira uma conexão do pool, esperando se todas estiverem em uso"""
+        inicio = time.perf_counter()
+        timeout = self.timeout_checkout if timeout is None else min(timeout, self.timeout_checkout)
+        limite = inicio + timeout
+        esperou = False
+
+        with self._cond:
+            while not self._livres and self._criadas >= self.tamanho:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    raise mysql.connector.errors.PoolError(
+                        f"Pool esgotado: {self.tamanho} conexões em uso há {timeout:g}s"
+                    )
+                if not esperou:
+                    self._esperas += 1
+                    esperou = True
+                self._cond.wait(restante)
+
+            if self._livres:
+                conn, ultimo_uso = self._livres.pop()
+            else:
+                conn, ultimo_uso = None, None
+                self._criadas += 1
+
+            espera = time.perf_counter() - inicio
+            self._em_uso += 1
+            self._checkouts += 1
+            self._tempo_espera += espera
+            self._tempo_espera_max = max(self._tempo_espera_max, espera)
+
+        try:
+            if conn is None:
+                return self._nova_conexao()
+            return self._validar(conn, ultimo_uso)
+        except Exception:
+            self._liberar_vaga()
+            raise
+
+    def devolver(self, conn, descartar=False):
+        """Devolve a conexão ao pool (ou a descarta se estiver quebrada)"""
+        if descartar:
+            with self._cond:
+                self._preparados.pop(conn, None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._liberar_vaga()
+            return
+
+        with self._cond:
+            self._em_uso -= 1
+            self._livres.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _liberar_vaga(self):
+        with self._cond:
+            self._em_uso -= 1
+            self._criadas -= 1
+            self._descartadas += 1
+            self._cond.notify()
+
+    @contextmanager
+    def conexao(self, timeout=None):
+        """Checkout/retorno de uma conexão: `with pool.conexao() as conn:`"""
+        conn = self.obter(timeout)
+        descartar = False
+        try:
+            yield conn
+        except self.ERROS_CONEXAO:
+            descartar = True
+            raise
+        finally:
+            self.devolver(conn, descartar)
+
+    def cursor_preparado(self, conn, template):
+        """Cursor com prepared statement reutilizado por conexão (um por template)"""
+        with self._cond:
+            cursores = self._preparados.setdefault(conn, {})
+            cursor = cursores.get(template)
+        if cursor is None:
+            cursor = conn.cursor(prepared=True)
+            with self._cond:
+                cursores[template] = cursor
+        return cursor
+
+    def executar(self, funcao, timeout=None):
+        """Executa funcao(conn) com uma conexão do pool, refazendo uma vez se a conexão cair"""
+        try:
+            with self.conexao(timeout) as conn:
+                return funcao(conn)
+        except self.ERROS_CONEXAO:
+            with self._cond:
+                self._reconexoes += 1
+            with self.conexao(timeout) as conn:
+                return funcao(conn)
+
+    def cancelar(self, conn):
+        """KILL QUERY da consulta em andamento em `conn`, por uma conexão à parte"""
+        auxiliar = self._nova_conexao(connection_timeout=self.timeout_cancelamento)
+        try:
+            cursor = auxiliar.cursor()
+            cursor.execute(f"KILL QUERY {int(conn.connection_id)}")
+            cursor.close()
+        finally:
+            auxiliar.close()
+
+    @contextmanager
+    def prazo(self, conn, segundos):
+        """Cancela o que rodar em `conn` dentro do bloco se passar de `segundos` (PrazoExcedido)"""
+        if not segundos:
+            yield
+            return
+        vigia = self._vigia.vigiar(conn, segundos + self.folga_cancelamento)
+        try:
+            yield
+        except Exception as e:
+            cancelada, vigia = self._vigia.liberar(vigia), None
+            if cancelada or getattr(e, 'errno', None) in ERROS_PRAZO:
+                raise PrazoExcedido(f"Consulta passou do prazo de {segundos:g}s") from e
+            raise
+        finally:
+            if vigia is not None:
+                self._vigia.liberar(vigia)
+
+    def metricas(self):
+        """Métricas de uso do pool para dimensionamento sob carga"""
+        with self._cond:
+            return {
+                'tamanho': self.tamanho,
+                'abertas': self._criadas,
+                'em_uso': self._em_uso,
+                'livres': len(self._livres),
+                'checkouts': self._checkouts,
+                'esperas': self._esperas,
+                'tempo_espera_total_s': round(self._tempo_espera, 4),
+                'tempo_espera_max_s': round(self._tempo_espera_max, 4),
+                'reconexoes': self._reconexoes,
+                'descartadas': self._descartadas,
+                'canceladas': self._vigia.canceladas,
+            }
+
+@recurso_compartilhado
+def criar_pool():
+    """Cria o pool de conexões (um por processo, compartilhado entre sessões)
+
+    Valida que o banco responde só aqui, na criação: se falhar, nada fica
+    guardado e a próxima chamada tenta de novo.
+    """
+    cfg = st.secrets["mysql"]
+    pool = PoolMySQL(
+        config={
+            'host': cfg["host"],
+            'port': cfg["port"],
+            'user': cfg["user"],
+            'password': cfg["password"],
+            'database': cfg["database"],
+            # Sem autocommit, cada conexão ficaria presa no snapshot da primeira leitura
+            'autocommit': True,
+        },
+        tamanho=int(cfg.get("pool_size", 10)),
+        timeout_checkout=float(cfg.get("pool_timeout", 30)),
+        intervalo_ping=float(cfg.get("pool_ping_intervalo", 10)),
+    )
+    with pool.conexao():
+        pass
+    return pool
+
+def conectar_mysql():
+    """Retorna o pool de conexões MySQL (validado uma vez, ao ser criado)"""
+    try:
+        pool = criar_pool()
+        obter_monitor(pool)
+        obter_replica(pool)
+        return pool
     except Exception as e:
         st.error(f"❌ Erro ao conectar: {str(e)}")
         return None
 
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def executar_query(_conn, query):
-    """Executa query e retorna DataFrame (com cache)"""
+def ler_config(secao):
+    """Lê uma seção opcional de st.secrets (dict vazio se ausente)"""
+    try:
+        return dict(st.secrets.get(secao, {}))
+    except FileNotFoundError:
+        return {}
+
+def _executar_preparado(pool, conn, chave, sql, params, prazo=None):
+    """Executa o SQL como prepared statement (reutilizado por `chave`) e monta o DataFrame"""
+    cursor = pool.cursor_preparado(conn, chave)
+    metricas = obter_metricas()
+    template = chave.split(':', 1)[0]  # lotes usam "template:tamanho"
+    inicio = time.perf_counter()
+    try:
+        with pool.prazo(conn, prazo_efetivo(prazo)):
+            # Passa sempre o mesmo objeto str: o cursor só re-prepara se o texto mudar
+            cursor.execute(sql, params)
+            linhas = cursor.fetchall()
+    except TimeoutError:  # PrazoExcedido
+        metricas.contar('prazos_excedidos', template)
+        raise
+    duracao = time.perf_counter() - inicio
+    df = montar_dataframe(linhas, cursor.column_names)
+
+    metricas.observar('consulta', template, duracao)
+    metricas.contar('linhas', template, len(linhas))
+    if duracao >= metricas.limiar_lento:
+        plano, erro = None, None
+        if metricas.explain:
+            try:
+                plano = capturar_explain(conn, sql, params)
+            except Exception as e:
+                erro = str(e)
+        metricas.registrar_lenta(template, params, duracao, len(linhas), plano, erro)
+    return df
+
+@contextmanager
+def _cursor_com_prazo(pool, conn, template):
+    """Cursor para ler o template em lotes, com o prazo dele (hint e KILL QUERY) até o fim do bloco
+
+    Para as cargas de fundo que leem as linhas do cursor direto, sem
+    montar o DataFrame de _executar_preparado.
+    """
+    prazo = obter_prazos()[template]
+    cursor = conn.cursor()
+    try:
+        with pool.prazo(conn, prazo_efetivo(prazo)):
+            yield cursor, sql_com_prazo(QUERIES[template], prazo)
+    except TimeoutError:  # PrazoExcedido
+        obter_metricas().contar('prazos_excedidos', template)
+        raise
+    finally:
+        cursor.close()
+
+# Colunas de texto com poucos valores distintos: viram categóricas
+COLUNAS_CATEGORICAS = {'flg_status_fatura', 'status', 'nom_usuario', 'responsavel'}
+
+def colunas_objeto(linhas):
+    """Linhas do cursor (tuplas) → uma array object por coluna
+
+    zip(*linhas) transpõe em C; np.fromiter não tenta interpretar valores
+    como sequências (bytearray, por exemplo) como np.array faria.
+    """
+    return [np.fromiter(coluna, dtype=object, count=len(linhas)) for coluna in zip(*linhas)]
+
+def montar_dataframe(linhas, colunas):
+    """Linhas do cursor → DataFrame com uma coluna tipada (e compacta) por campo"""
+    if not linhas:
+        return pd.DataFrame(columns=list(colunas))
+    return pd.DataFrame(
+        {nome: _coluna_tipada(nome, valores) for nome, valores in zip(colunas, colunas_objeto(linhas))},
+        copy=False,
+    )
+
+def _coluna_tipada(nome, valores):
+    """Converte uma coluna object para o dtype mais compacto sem perda"""
+    nulos = pd.isna(valores)
+    primeiro = int(np.argmin(nulos))
+    amostra = None if nulos[primeiro] else valores[primeiro]
     try:
-        df = pd.read_sql(query, _conn)
+        if isinstance(amostra, (int, np.integer)) and not nulos.any():
+            return pd.to_numeric(valores.astype(np.int64), downcast='integer')
+        if isinstance(amostra, (int, float, Decimal, np.integer, np.floating)):
+            # Inteiro com NULL vira float com NaN, como no pd.read_sql; valores
+            # monetários ficam em float64 (somas em float32 perderiam centavos)
+            coluna = valores.copy()
+            coluna[nulos] = np.nan
+            return coluna.astype(np.float64)
+        if isinstance(amostra, str) and nome in COLUNAS_CATEGORICAS:
+            return pd.Categorical(valores)
+        if isinstance(amostra, datetime):
+            return pd.to_datetime(valores)
+    except (TypeError, ValueError, OverflowError):
+        pass  # tipos misturados: deixa como object
+    return valores.copy()
+
+def _buscar_e_gravar(pool, cache, template, params):
+    """Executa o template no banco e grava o resultado no cache com suas dependências"""
+    replica = pool.replica
+    if template in QUERIES_REPLICA and replica is not None and replica.atualizada():
+        inicio = time.perf_counter()
+        df = replica.consultar(template, params)
+        obter_metricas().observar('consulta', template, time.perf_counter() - inicio)
+        obter_metricas().contar('replica', template)
+    else:
+        prazo = obter_prazos()[template]
+        sql = sql_com_prazo(QUERIES[template], prazo)
+        df = obter_disjuntor().executar(lambda: pool.executar(
+            lambda conn: _executar_preparado(pool, conn, template, sql, params, prazo), timeout=prazo or None),
+            prazo)
+    chave = chave_cache(template, params)
+    obter_reserva().guardar(chave, df)
+    # Sem dependências declaradas: depende de tudo, invalidado por qualquer alteração
+    dependencias = DEPENDENCIAS.get(template, {'tabelas': TABELAS_MONITORADAS, 'por_projeto': False})
+    cod_projeto = params[0] if dependencias['por_projeto'] and params else None
+    cache.gravar(chave, df, tabelas=dependencias['tabelas'], cod_projeto=cod_projeto)
+    return df
+
+@medir_camada('query')
+def executar_query(pool, template, params=()):
+    """Executa um template de QUERIES com parâmetros vinculados e retorna DataFrame (com cache)"""
+    cache = obter_cache()
+    chave = chave_cache(template, params)
+    df = cache.obter(chave)
+    if df is not None:
+        obter_metricas().contar('cache_hits', template)
         return df
+    obter_metricas().contar('cache_misses', template)
+    try:
+        # Misses simultâneos da mesma chave disparam uma única query
+        return obter_single_flight().executar(chave, lambda: _buscar_e_gravar(pool, cache, template, params))
+    except (ConnectionError, *Disjuntor.FALHAS) as e:  # CircuitoAberto e banco lento ou fora
+        # Banco lento ou fora: o último resultado bom, marcado com a data, em vez do erro
+        df = obter_reserva().obter(chave)
+        if df is not None:
+            obter_metricas().contar('obsoletos', template)
+            return df
+        st.error(f"❌ Erro na query: {str(e)}")
+        return None
     except Exception as e:
         st.error(f"❌ Erro na query: {str(e)}")
         return None
 
+def _normalizar_params(params):
+    """Normaliza parâmetros para que a mesma consulta gere sempre a mesma chave de cache"""
+    normalizados = []
+    for valor in params:
+        if hasattr(valor, 'item'):  # escalares numpy/pandas
+            valor = valor.item()
+        if isinstance(valor, str):
+            valor = valor.strip()
+            if valor.isdigit():
+                valor = int(valor)
+        normalizados.append(valor)
+    return tuple(normalizados)
+
+def consultar(pool, template, *params):
+    """API de retrieval: id do template + parâmetros vinculados"""
+    if template not in QUERIES:
+        raise KeyError(f"Template de consulta desconhecido: {template}")
+    return executar_query(pool, template, _normalizar_params(params))
+
+# ============================================================================
+# CACHE DE RESULTADOS (compartilhado entre processos)
+# ============================================================================
+
+def serializar_df(df):
+    """DataFrame → bytes (Arrow IPC; pickle se o Arrow não suportar algum tipo)"""
+    try:
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, tabela.schema) as writer:
+            writer.write_table(tabela)
+        return b'A' + sink.getvalue().to_pybytes()
+    except (pa.ArrowException, TypeError, ValueError):
+        return b'P' + pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+def desserializar_df(dados):
+    """bytes → DataFrame (inverso de serializar_df)"""
+    if dados[:1] == b'A':
+        return pa.ipc.open_stream(dados[1:]).read_all().to_pandas()
+    return pickle.loads(dados[1:])
+
+def chave_cache(template, params):
+    """Chave estável (template, params) para qualquer backend"""
+    return f"{template}|{json.dumps(list(params), default=str)}"
+
+def ler_chave_cache(chave):
+    """Inverso de chave_cache: (template, params)"""
+    template, params = chave.split('|', 1)
+    return template, tuple(json.loads(params))
+
+class CacheMemoria:
+    """Cache LRU no processo, limitado em bytes
+
+    `obter` devolve uma cópia rasa: colunas atribuídas ou removidas por quem
+    chamou não alteram a entrada vista pelas outras sessões.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> [df, tamanho, criado_em, tabelas, cod_projeto, hits]
+        self._bytes = 0
+        self._contadores = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidacoes': 0}
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or time.time() - entrada[2] > self.ttl:
+                if entrada is not None:
+                    self._remover(chave)
+                self._contadores['misses'] += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self._contadores['hits'] += 1
+            entrada[5] += 1
+            return entrada[0].copy(deep=False)
+
+    def gravar(self, chave, df, tabelas=(), cod_projeto=None):
+        tamanho = int(df.memory_usage(deep=True).sum())
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            hits = 0
+            if chave in self._entradas:
+                hits = self._entradas[chave][5]
+                self._remover(chave)
+            self._entradas[chave] = [df, tamanho, time.time(), frozenset(tabelas), cod_projeto, hits]
+            self._bytes += tamanho
+            while self._bytes > self.max_bytes:
+                self._remover(next(iter(self._entradas)))
+                self._contadores['evictions'] += 1
+
+    def _remover(self, chave):
+        self._bytes -= self._entradas.pop(chave)[1]
+
+    def invalidar(self, tabela, projetos=None):
+        """Remove entradas que dependem da tabela (só dos projetos dados, se informados)
+
+        Retorna [(chave, hits)] das entradas removidas.
+        """
+        with self._lock:
+            removidas = [
+                (chave, e[5]) for chave, e in self._entradas.items()
+                if tabela in e[3] and (projetos is None or e[4] is None or e[4] in projetos)
+            ]
+            for chave, _ in removidas:
+                self._remover(chave)
+            self._contadores['invalidacoes'] += len(removidas)
+            return removidas
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def metricas(self):
+        with self._lock:
+            return {**self._contadores, 'entradas': len(self._entradas), 'bytes': self._bytes,
+                    'max_bytes': self.max_bytes}
+
+class CacheDisco:
+    """Cache LRU em arquivo SQLite, compartilhado por todos os processos do host
+
+    DataFrames ficam serializados em Arrow IPC; o SQLite (modo WAL) cuida do
+    lock entre processos. Contadores de hit/miss/eviction também ficam no
+    arquivo, então refletem todas as réplicas. Leituras não abrem transação
+    de escrita: hits, misses e horário de acesso acumulam no processo e são
+    gravados juntos a cada `intervalo_contadores` segundos (ou na próxima
+    escrita ou invalidação). `metricas()` não toca no arquivo: mostra os
+    contadores da última gravação somados aos pendentes, e os totais de
+    entradas/bytes mantidos a cada escrita (os de outros processos aparecem
+    na próxima escrita deste).
+    """
+
+    def __init__(self, caminho, max_bytes=1024 * 2**20, ttl=300, intervalo_contadores=5.0):
+        self.caminho = caminho
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.intervalo_contadores = intervalo_contadores
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._acessos = {}  # chave -> [último acesso, hits] ainda não gravados
+        self._pendentes = {'hits': 0, 'misses': 0}
+        self._gravado_em = time.time()
+        self._contadores = {}  # valores do arquivo na última gravação
+        self._totais = {'entradas': 0, 'bytes': 0}
+        with self._conexao() as db:
+            colunas = [linha[1] for linha in db.execute("PRAGMA table_info(entradas)")]
+            if colunas and 'tabelas' not in colunas:
+                db.execute("DROP TABLE entradas")  # arquivo de uma versão anterior: é só cache
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS entradas (
+                    chave TEXT PRIMARY KEY,
+                    valor BLOB NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    tabelas TEXT NOT NULL DEFAULT '',
+                    cod_projeto INTEGER,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_entradas_acesso ON entradas (acessado_em)")
+            db.execute("CREATE TABLE IF NOT EXISTS contadores (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+            db.executemany("INSERT OR IGNORE INTO contadores VALUES (?, 0)",
+                           [('hits',), ('misses',), ('evictions',), ('invalidacoes',)])
+            self._contadores = dict(db.execute("SELECT nome, valor FROM contadores"))
+            self._totais['entradas'], self._totais['bytes'] = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM entradas").fetchone()
+
+    def _conexao(self):
+        """Uma conexão SQLite por thread"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = _TransacaoSQLite(db)
+        return self._local.db
+
+    def obter(self, chave):
+        agora = time.time()
+        # Leitura fora de transação: no WAL não espera nem bloqueia os escritores
+        linha = self._conexao().db.execute(
+            "SELECT valor, criado_em FROM entradas WHERE chave = ?", (chave,)).fetchone()
+        valida = linha is not None and agora - linha[1] <= self.ttl
+        with self._lock:
+            if valida:
+                acesso = self._acessos.setdefault(chave, [agora, 0])
+                acesso[0] = agora
+                acesso[1] += 1
+            self._pendentes['hits' if valida else 'misses'] += 1
+            gravar = agora - self._gravado_em >= self.intervalo_contadores
+        if gravar:
+            with self._conexao() as db:
+                self._gravar_contadores(db)
+        return desserializar_df(linha[0]) if valida else None
+
+    def _gravar_contadores(self, db):
+        """Grava (na transação de `db`) os acessos acumulados e remove as entradas expiradas"""
+        with self._lock:
+            acessos, self._acessos = self._acessos, {}
+            pendentes, self._pendentes = self._pendentes, {'hits': 0, 'misses': 0}
+            self._gravado_em = time.time()
+        db.executemany("UPDATE entradas SET acessado_em = MAX(acessado_em, ?), hits = hits + ? WHERE chave = ?",
+                       [(acesso, hits, chave) for chave, (acesso, hits) in acessos.items()])
+        db.executemany("UPDATE contadores SET valor = valor + ? WHERE nome = ?",
+                       [(valor, nome) for nome, valor in pendentes.items() if valor])
+        expiradas = db.execute("DELETE FROM entradas WHERE criado_em < ? RETURNING tamanho",
+                               (time.time() - self.ttl,)).fetchall()
+        contadores = dict(db.execute("SELECT nome, valor FROM contadores"))
+        with self._lock:
+            self._contadores = contadores
+            self._totais['entradas'] -= len(expiradas)
+            self._totais['bytes'] -= sum(tamanho for tamanho, in expiradas)
+
+    def gravar(self, chave, df, tabelas=(), cod_projeto=None):
+        valor = serializar_df(df)
+        if len(valor) > self.max_bytes:
+            return
+        agora = time.time()
+        # Delimitadores nas pontas permitem LIKE '%|tabela|%' sem falso positivo
+        marcadas = '|' + '|'.join(sorted(tabelas)) + '|'
+        with self._conexao() as db:
+            self._gravar_contadores(db)  # LRU e hits atualizados antes de despejar
+            linha = db.execute("SELECT hits FROM entradas WHERE chave = ?", (chave,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (chave, valor, len(valor), agora, agora, marcadas, cod_projeto,
+                        linha[0] if linha else 0))
+            entradas, total = db.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM entradas").fetchone()
+            with self._lock:
+                self._totais = {'entradas': entradas, 'bytes': total}
+            if total > self.max_bytes:
+                self._despejar(db, total - self.max_bytes)
+
+    def _despejar(self, db, excesso):
+        """Remove as entradas menos recentemente usadas até liberar `excesso` bytes"""
+        vitimas, liberados = [], 0
+        for chave, tamanho in db.execute("SELECT chave, tamanho FROM entradas ORDER BY acessado_em"):
+            if liberados >= excesso:
+                break
+            vitimas.append((chave,))
+            liberados += tamanho
+        db.executemany("DELETE FROM entradas WHERE chave = ?", vitimas)
+        db.execute("UPDATE contadores SET valor = valor + ? WHERE nome = 'evictions'", (len(vitimas),))
+        with self._lock:
+            self._contadores['evictions'] = self._contadores.get('evictions', 0) + len(vitimas)
+            self._totais['entradas'] -= len(vitimas)
+            self._totais['bytes'] -= liberados
+
+    def invalidar(self, tabela, projetos=None):
+        """Remove entradas que dependem da tabela (só dos projetos dados, se informados)
+
+        Retorna [(chave, hits)] das entradas removidas.
+        """
+        sql = "SELECT chave, hits, tamanho FROM entradas WHERE tabelas LIKE ?"
+        params = [f"%|{tabela}|%"]
+        if projetos is not None:
+            projetos = list(projetos)
+            sql += f" AND (cod_projeto IS NULL OR cod_projeto IN ({', '.join('?' * len(projetos))}))"
+            params += projetos
+        with self._conexao() as db:
+            self._gravar_contadores(db)
+            removidas = db.execute(sql, params).fetchall()
+            db.executemany("DELETE FROM entradas WHERE chave = ?", [(chave,) for chave, _, _ in removidas])
+            db.execute("UPDATE contadores SET valor = valor + ? WHERE nome = 'invalidacoes'", (len(removidas),))
+        with self._lock:
+            self._contadores['invalidacoes'] = self._contadores.get('invalidacoes', 0) + len(removidas)
+            self._totais['entradas'] -= len(removidas)
+            self._totais['bytes'] -= sum(tamanho for _, _, tamanho in removidas)
+        return [(chave, hits) for chave, hits, _ in removidas]
+
+    def limpar(self):
+        with self._conexao() as db:
+            db.execute("DELETE FROM entradas")
+        with self._lock:
+            self._totais = {'entradas': 0, 'bytes': 0}
+
+    def metricas(self):
+        """Só lê o estado do processo: não abre transação nem varre a tabela"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            for nome, valor in self._pendentes.items():
+                contadores[nome] = contadores.get(nome, 0) + valor
+            return {**contadores, **self._totais, 'max_bytes': self.max_bytes}
+
+class _TransacaoSQLite:
+    """`with db:` abre uma transação IMMEDIATE (serializa escritores entre processos)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, tipo, *_):
+        self.db.execute("ROLLBACK" if tipo else "COMMIT")
+
+@recurso_compartilhado
+def obter_cache():
+    """Backend do cache de resultados, configurado na seção [cache] dos secrets"""
+    cfg = ler_config("cache")
+    max_bytes = int(float(cfg.get("max_mb", 512)) * 2**20)
+    # O TTL longo só vale quando o monitor vê UPDATEs em todas as tabelas (coluna de
+    # atualização configurada); contagem e UPDATE_TIME sozinhos deixam passar alterações
+    invalidacao = ler_config("invalidacao")
+    colunas = invalidacao.get("colunas_atualizacao") or {}
+    completo = invalidacao.get("ativo", True) and all(tabela in colunas for tabela in TABELAS_MONITORADAS)
+    ttl = float(cfg.get("ttl", 86400 if completo else 300))
+    if cfg.get("backend", "disco") == "memoria":
+        return CacheMemoria(max_bytes=max_bytes, ttl=ttl)
+    caminho = cfg.get("caminho") or os.path.join(tempfile.gettempdir(), "netproject_cache.sqlite")
+    return CacheDisco(caminho, max_bytes=max_bytes, ttl=ttl)
+
+# ============================================================================
+# PRAZOS, DISJUNTOR E RESULTADOS DE RESERVA
+# ============================================================================
+
+# Prazo (s) por template; os demais usam o padrão. Agregações sobre tabelas inteiras têm mais folga
+PRAZO_PADRAO = 5.0
+PRAZOS = {
+    'projetos_atrasados': 15.0,
+    'resumo_geral': 15.0,
+    'snapshot_projetos': 60.0,
+    'nomes_projetos': 60.0,
+    'receita_mensal_marcas': 60.0,
+    'receita_mensal': 60.0,
+}
+
+# Erros do MySQL de consulta interrompida: MAX_EXECUTION_TIME (3024) e KILL QUERY (1317)
+ERROS_PRAZO = {3024, 1317}
+
+# Bases embutidas nos `except`: a cada rerun do Streamlit estas classes são redefinidas,
+# mas pool e disjuntor (em cache) continuam levantando as da primeira execução
+class PrazoExcedido(TimeoutError):
+    """A consulta passou do prazo do template e foi interrompida"""
+
+class CircuitoAberto(ConnectionError):
+    """Disjuntor aberto: o banco não é consultado até a próxima tentativa de teste"""
+
+@lru_cache(maxsize=None)
+def sql_com_prazo(sql, segundos):
+    """SQL com o hint MAX_EXECUTION_TIME no primeiro SELECT (mesmo objeto str a cada chamada)"""
+    if not segundos:
+        return sql
+    return re.sub(r'^(\s*SELECT)\b', rf'\1 /*+ MAX_EXECUTION_TIME({int(segundos * 1000)}) */', sql, count=1)
+
+@recurso_compartilhado
+def obter_prazos():
+    """{template: segundos}, configurado na seção [prazos] dos secrets (0 desliga o prazo)"""
+    cfg = ler_config("prazos")
+    padrao = float(cfg.get("padrao_s", PRAZO_PADRAO))
+    return {template: float(cfg.get(template, PRAZOS.get(template, padrao))) for template in QUERIES}
+
+# Limite (time.monotonic()) da requisição em andamento no serviço HTTP; None no app
+_LIMITE_REQUISICAO = contextvars.ContextVar('limite_requisicao', default=None)
+
+@contextmanager
+def limite_requisicao(limite):
+    """Consultas feitas dentro do bloco são canceladas (KILL QUERY) quando passar de `limite`"""
+    token = _LIMITE_REQUISICAO.set(limite)
+    try:
+        yield
+    finally:
+        _LIMITE_REQUISICAO.reset(token)
+
+def prazo_efetivo(prazo):
+    """Prazo do template encurtado pelo que resta da requisição (PrazoExcedido se já acabou)"""
+    limite = _LIMITE_REQUISICAO.get()
+    if limite is None:
+        return prazo
+    restante = limite - time.monotonic()
+    if restante <= 0:
+        raise PrazoExcedido("A requisição passou do prazo antes da consulta")
+    return min(prazo, restante) if prazo else restante
+
+class VigiaPrazos:
+    """Uma thread que cancela as consultas que passaram do prazo
+
+    `vigiar` agenda o cancelamento e `liberar` o desfaz quando a consulta
+    termina antes. Se o cancelamento já começou, `liberar` espera ele
+    acabar: a conexão só volta ao pool depois, e o KILL não atinge a
+    consulta seguinte.
+    """
+
+    def __init__(self, cancelar):
+        self._cancelar = cancelar
+        self._cond = threading.Condition()
+        self._agenda = []     # heap de (limite, id)
+        self._vigiadas = {}   # id -> [conexão, estado]
+        self._proximo_id = 0
+        self._thread = None
+        self.canceladas = 0
+
+    def vigiar(self, conn, segundos):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="vigia-prazos", daemon=True)
+                self._thread.start()
+            self._proximo_id += 1
+            self._vigiadas[self._proximo_id] = [conn, 'vigiando']
+            heapq.heappush(self._agenda, (time.monotonic() + segundos, self._proximo_id))
+            self._cond.notify()
+            return self._proximo_id
+
+    def liberar(self, vigia):
+        """Encerra a vigilância; True se a consulta foi cancelada"""
+        with self._cond:
+            while self._vigiadas[vigia][1] == 'cancelando':
+                self._cond.wait()
+            return self._vigiadas.pop(vigia)[1] == 'cancelada'
+
+    def _loop(self):
+        with self._cond:
+            while True:
+                # Vigias já liberados ficam no heap até chegar a vez deles
+                while self._agenda and self._agenda[0][1] not in self._vigiadas:
+                    heapq.heappop(self._agenda)
+                if not self._agenda:
+                    self._cond.wait()
+                    continue
+                limite, vigia = self._agenda[0]
+                restante = limite - time.monotonic()
+                if restante > 0:
+                    self._cond.wait(restante)
+                    continue
+                heapq.heappop(self._agenda)
+                vigiada = self._vigiadas[vigia]
+                vigiada[1] = 'cancelando'
+                self._cond.release()
+                try:
+                    self._cancelar(vigiada[0])
+                except Exception:
+                    pass  # a consulta termina sozinha (ou no MAX_EXECUTION_TIME)
+                finally:
+                    self._cond.acquire()
+                vigiada[1] = 'cancelada'
+                self.canceladas += 1
+                self._cond.notify_all()
+
+class Disjuntor:
+    """Circuit breaker das consultas ao MySQL
+
+    Abre quando, das últimas `janela` consultas, `limiar` estouraram o
+    prazo, perderam a conexão ou usaram mais de `fracao_lenta` do prazo do
+    template (agregações com prazo maior não contam como lentidão). Aberto,
+    recusa na hora (CircuitoAberto) por `espera` segundos; depois deixa
+    passar uma consulta de teste, que fecha o circuito se for bem e o abre
+    de novo se não.
+    """
+
+    # Falhas que indicam banco degradado (erros de SQL não contam)
+    FALHAS = (TimeoutError, mysql.connector.errors.OperationalError,
+              mysql.connector.errors.InterfaceError, mysql.connector.errors.PoolError)
+
+    def __init__(self, janela=20, limiar=5, fracao_lenta=0.8, espera=30.0):
+        self.limiar = limiar
+        self.fracao_lenta = fracao_lenta
+        self.espera = espera
+        self.estado = 'fechado'
+        self._lock = threading.Lock()
+        self._ruins = deque(maxlen=janela)
+        self._aberto_em = 0.0
+        self._testando = False
+        self.aberturas = 0
+        self.recusadas = 0
+
+    def executar(self, funcao, prazo=None):
+        """funcao() se o circuito permitir, registrando falha e lentidão em relação ao prazo"""
+        self._permitir()
+        inicio = time.perf_counter()
+        falhou = False
+        try:
+            return funcao()
+        except self.FALHAS:
+            falhou = True
+            raise
+        finally:
+            lenta = bool(prazo) and time.perf_counter() - inicio >= self.fracao_lenta * prazo
+            self._registrar(falhou or lenta)
+
+    def _permitir(self):
+        with self._lock:
+            if self.estado == 'aberto' and time.monotonic() - self._aberto_em >= self.espera:
+                self.estado, self._testando = 'meio_aberto', False
+            if self.estado == 'fechado':
+                return
+            if self.estado == 'meio_aberto' and not self._testando:
+                self._testando = True
+                return
+            self.recusadas += 1
+        raise CircuitoAberto("Banco lento ou indisponível: consultas suspensas por alguns segundos")
+
+    def _registrar(self, ruim):
+        with self._lock:
+            if self.estado == 'meio_aberto':
+                self._testando = False
+                if ruim:
+                    self._abrir()
+                else:
+                    self.estado = 'fechado'
+                    self._ruins.clear()
+            elif self.estado == 'fechado':
+                self._ruins.append(ruim)
+                if sum(self._ruins) >= self.limiar:
+                    self._abrir()
+
+    def _abrir(self):
+        self.estado = 'aberto'
+        self._aberto_em = time.monotonic()
+        self._ruins.clear()
+        self.aberturas += 1
+
+    def metricas(self):
+        with self._lock:
+            return {'estado': self.estado, 'aberturas': self.aberturas, 'recusadas': self.recusadas,
+                    'ruins_na_janela': sum(self._ruins)}
+
+@recurso_compartilhado
+def obter_disjuntor():
+    """Disjuntor do processo, configurado na seção [disjuntor] dos secrets"""
+    cfg = ler_config("disjuntor")
+    return Disjuntor(
+        janela=int(cfg.get("janela", 20)),
+        limiar=int(cfg.get("limiar", 5)),
+        fracao_lenta=float(cfg.get("fracao_lenta", 0.8)),
+        espera=float(cfg.get("espera_s", 30.0)),
+    )
+
+class ReservaResultados:
+    """Último resultado bom de cada consulta, para servir quando o banco falha
+
+    Diferente do cache, não expira nem é invalidado: só é substituído pelo
+    próximo resultado bom. LRU limitado em bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> (df, tamanho, obtido_em)
+        self._bytes = 0
+        self.servidos = 0
+
+    def guardar(self, chave, df):
+        tamanho = int(df.memory_usage(deep=True).sum())
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            if chave in self._entradas:
+                self._bytes -= self._entradas.pop(chave)[1]
+            self._entradas[chave] = (df, tamanho, datetime.now())
+            self._bytes += tamanho
+            while self._bytes > self.max_bytes:
+                self._bytes -= self._entradas.popitem(last=False)[1][1]
+
+    def obter(self, chave):
+        """Cópia do último resultado com df.attrs['obsoleto_desde'], ou None"""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            self._entradas.move_to_end(chave)
+            self.servidos += 1
+        df = entrada[0].copy(deep=False)
+        df.attrs['obsoleto_desde'] = entrada[2]
+        return df
+
+    def metricas(self):
+        with self._lock:
+            return {'entradas': len(self._entradas), 'bytes': self._bytes, 'servidos': self.servidos}
+
+@recurso_compartilhado
+def obter_reserva():
+    """Reserva de resultados, limitada por [prazos] reserva_mb nos secrets"""
+    return ReservaResultados(max_bytes=int(float(ler_config("prazos").get("reserva_mb", 64)) * 2**20))
+
+def obsoleto_desde(*dfs):
+    """Quando foi obtido o resultado de reserva mais antigo entre os DataFrames (None se todos atuais)"""
+    datas = [df.attrs['obsoleto_desde'] for df in dfs if df is not None and 'obsoleto_desde' in df.attrs]
+    return min(datas) if datas else None
+
+def avisar_obsoleto(*dfs):
+    """Aviso de dados de reserva, com o horário em que foram obtidos"""
+    quando = obsoleto_desde(*dfs)
+    if quando is not None:
+        st.warning(f"⏳ Dados de {quando:%d/%m %H:%M:%S}: o banco não respondeu a tempo, "
+                   f"exibindo o último resultado obtido")
+
+# ============================================================================
+# INVALIDAÇÃO POR ALTERAÇÃO (marcas d'água por tabela)
+# ============================================================================
+
+TABELAS_MONITORADAS = ('projeto', 'usuario', 'receita', 'receita_pagamento', 'DWDT_RECURSO_ALOCACAO')
+
+# cod_projeto das linhas alteradas desde a última marca (quando há coluna de atualização)
+PROJETOS_ALTERADOS = {
+    'projeto': "SELECT DISTINCT t.cod_projeto FROM projeto t WHERE t.{coluna} >= %s",
+    'receita': "SELECT DISTINCT t.cod_projeto FROM receita t WHERE t.{coluna} >= %s",
+    'receita_pagamento': """
+        SELECT DISTINCT r.cod_projeto
+        FROM receita_pagamento t
+        JOIN receita r ON r.cod_receita = t.cod_receita
+        WHERE t.{coluna} >= %s""",
+    'DWDT_RECURSO_ALOCACAO': "SELECT DISTINCT t.cod_projeto FROM DWDT_RECURSO_ALOCACAO t WHERE t.{coluna} >= %s",
+}
+
+class SingleFlight:
+    """Garante uma única execução em andamento por chave; os demais esperam o resultado"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._voos = {}
+
+    def executar(self, chave, funcao):
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = Future()
+        if not lider:
+            return voo.result()
+        try:
+            resultado = funcao()
+            voo.set_result(resultado)
+            return resultado
+        except BaseException as e:
+            voo.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._voos[chave]
+
+class MonitorAlteracoes:
+    """Poller de marcas d'água (COUNT(*) e MAX da coluna de atualização) por tabela
+
+    Quando uma tabela muda, invalida só as entradas do cache que dependem
+    dela — e, se houver coluna de atualização configurada, só as dos
+    projetos alterados. Tabelas sem coluna de atualização usam também o
+    UPDATE_TIME do information_schema, para que UPDATEs em linhas
+    existentes (status de fatura, valores, datas) não passem despercebidos.
+    Entradas quentes (muitos hits) são recarregadas em segundo plano em vez
+    de esperar o próximo miss.
+    """
+
+    def __init__(self, pool, cache, single_flight, intervalo=30, colunas_atualizacao=None,
+                 limiar_quente=3, max_projetos=500):
+        self.pool = pool
+        self.cache = cache
+        self.single_flight = single_flight
+        self.intervalo = intervalo
+        self.colunas = dict(colunas_atualizacao or {})
+        self.limiar_quente = limiar_quente
+        self.max_projetos = max_projetos
+        self.ultima_verificacao = None
+        self.ultimo_erro = None
+        self.recargas = 0
+        self._marcas = {}
+        self._update_time = True  # desligado se o banco não expõe information_schema.TABLES
+        self._assinantes = []
+        self._parar = threading.Event()
+        self._recarregador = ThreadPoolExecutor(max_workers=2, thread_name_prefix="recarga-cache")
+
+    def assinar(self, callback):
+        """callback({tabela: projetos ou None}) é chamado a cada alteração detectada"""
+        self._assinantes.append(callback)
+
+    def iniciar(self):
+        threading.Thread(target=self._loop, name="monitor-alteracoes", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def _loop(self):
+        while True:
+            try:
+                self.verificar()
+            except Exception as e:
+                self.ultimo_erro = str(e)
+            if self._parar.wait(self.intervalo):
+                break
+
+    def _marca(self, cursor, tabela):
+        coluna = self.colunas.get(tabela)
+        cursor.execute(f"SELECT COUNT(*), {f'MAX({coluna})' if coluna else 'NULL'} FROM {tabela}")
+        marca = tuple(cursor.fetchone())
+        if coluna or not self._update_time:
+            return marca
+        try:
+            cursor.execute("SELECT UPDATE_TIME FROM information_schema.TABLES "
+                           "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (tabela,))
+            linha = cursor.fetchone()
+        except Exception:
+            self._update_time = False
+            return marca
+        return marca + (linha[0] if linha else None,)
+
+    def _projetos_alterados(self, cursor, tabela, antiga, nova):
+        """Projetos afetados, ou None quando só dá para invalidar a tabela inteira"""
+        coluna = self.colunas.get(tabela)
+        # Sem coluna de atualização, ou houve DELETE: não há como saber quais projetos
+        if not coluna or tabela not in PROJETOS_ALTERADOS or antiga[1] is None or nova[0] < antiga[0]:
+            return None
+        cursor.execute(PROJETOS_ALTERADOS[tabela].format(coluna=coluna), (antiga[1],))
+        projetos = {linha[0] for linha in cursor.fetchall()}
+        return projetos if len(projetos) <= self.max_projetos else None
+
+    def verificar(self):
+        """Lê as marcas d'água, invalida o que mudou e recarrega as entradas quentes"""
+        def ler(conn):
+            cursor = conn.cursor()
+            try:
+                if self._update_time:
+                    try:
+                        # MySQL 8 guarda as estatísticas do information_schema por até 24h
+                        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+                    except Exception:
+                        pass  # MySQL 5.7: UPDATE_TIME já é lido direto
+                marcas = {tabela: self._marca(cursor, tabela) for tabela in TABELAS_MONITORADAS}
+                alteracoes = {
+                    tabela: self._projetos_alterados(cursor, tabela, self._marcas[tabela], marca)
+                    for tabela, marca in marcas.items()
+                    if tabela in self._marcas and self._marcas[tabela] != marca
+                }
+                return marcas, alteracoes
+            finally:
+                cursor.close()
+
+        marcas, alteracoes = self.pool.executar(ler)
+        self._marcas = marcas
+        self.ultima_verificacao = datetime.now()
+        self.ultimo_erro = None
+        if not alteracoes:
+            return alteracoes
+
+        quentes = set()
+        for tabela, projetos in alteracoes.items():
+            quentes.update(chave for chave, hits in self.cache.invalidar(tabela, projetos)
+                           if hits >= self.limiar_quente)
+        for callback in self._assinantes:
+            callback(alteracoes)
+        for chave in quentes:
+            self._recarregador.submit(self._recarregar, chave)
+        return alteracoes
+
+    def _recarregar(self, chave):
+        template, params = ler_chave_cache(chave)
+        if template in QUERIES:
+            self.single_flight.executar(chave, lambda: _buscar_e_gravar(self.pool, self.cache, template, params))
+            self.recargas += 1
+
+@recurso_compartilhado
+def obter_single_flight():
+    """Deduplicação de misses simultâneos (uma por processo)"""
+    return SingleFlight()
+
+@recurso_compartilhado
+def obter_monitor(_pool):
+    """Monitor de alterações, configurado na seção [invalidacao] dos secrets"""
+    cfg = ler_config("invalidacao")
+    monitor = MonitorAlteracoes(
+        _pool, obter_cache(), obter_single_flight(),
+        intervalo=float(cfg.get("intervalo", 30)),
+        colunas_atualizacao=cfg.get("colunas_atualizacao"),
+        limiar_quente=int(cfg.get("limiar_quente", 3)),
+    )
+    if cfg.get("ativo", True):
+        monitor.iniciar()
+    return monitor
+
 # ============================================================================
 # CAMADA 1: INTENÇÕES (do notebook)
 # ============================================================================
@@ -180,44 +1544,137 @@ INTENCOES = {
 # CAMADA 2: INTERPRETAÇÃO NLP (do notebook)
 # ============================================================================
 
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e com tokens separados por um único espaço"""
+    sem_acento = unicodedata.normalize('NFKD', texto.lower())
+    sem_acento = ''.join(c for c in sem_acento if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', sem_acento))
+
+class MatcherIntencoes:
+    """Autômato Aho-Corasick com as palavras de todas as intenções
+
+    Compilado uma vez; cada pergunta é varrida uma única vez, com custo
+    proporcional ao tamanho do texto e não ao do vocabulário. Mantém a
+    semântica original (substring, cada palavra pontua uma vez por intenção).
+    """
+
+    def __init__(self, intencoes):
+        self.intencoes = list(intencoes)
+        self._pesos = []      # por padrão: (índice da intenção, peso)
+        self._transicoes = [{}]
+        self._falha = [0]
+        self._saidas = [[]]
+
+        for i, (intencao, config) in enumerate(intencoes.items()):
+            for palavra in config['palavras']:
+                self._inserir(normalizar_texto(palavra), len(self._pesos))
+                self._pesos.append((i, config['peso']))
+        self._ligar_falhas()
+
+    def _inserir(self, palavra, id_padrao):
+        estado = 0
+        for c in palavra:
+            proximo = self._transicoes[estado].get(c)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes[estado][c] = proximo
+                self._transicoes.append({})
+                self._falha.append(0)
+                self._saidas.append([])
+            estado = proximo
+        self._saidas[estado].append(id_padrao)
+
+    def _ligar_falhas(self):
+        fila = list(self._transicoes[0].values())
+        for estado in fila:
+            for c, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and c not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                destino = self._transicoes[falha].get(c, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                self._saidas[proximo] = self._saidas[proximo] + self._saidas[self._falha[proximo]]
+
+    def _padroes(self, texto):
+        """Ids dos padrões encontrados no texto já normalizado"""
+        transicoes, falha, saidas = self._transicoes, self._falha, self._saidas
+        encontrados = set()
+        estado = 0
+        for c in texto:
+            while estado and c not in transicoes[estado]:
+                estado = falha[estado]
+            estado = transicoes[estado].get(c, 0)
+            if saidas[estado]:
+                encontrados.update(saidas[estado])
+        return encontrados
+
+    def pontuar(self, pergunta):
+        """Score de cada intenção para a pergunta"""
+        totais = [0] * len(self.intencoes)
+        for id_padrao in self._padroes(normalizar_texto(pergunta)):
+            i, peso = self._pesos[id_padrao]
+            totais[i] += peso
+        return dict(zip(self.intencoes, totais))
+
+    def detectar(self, pergunta):
+        """Intenção de maior score (empate: ordem de INTENCOES) ou None"""
+        scores = self.pontuar(pergunta)
+        if max(scores.values()) == 0:
+            return None
+        return max(scores, key=scores.get)
+
+@recurso_compartilhado
+def obter_matcher_intencoes():
+    """Matcher compilado uma vez por processo (o script é re-executado a cada rerun)"""
+    return MatcherIntencoes(INTENCOES)
+
+def pontuar_intencoes(pergunta):
+    """Scores de todas as intenções para a pergunta"""
+    return obter_matcher_intencoes().pontuar(pergunta)
+
 def detectar_intencao(pergunta):
     """Detecta a intenção da pergunta"""
-    pergunta_lower = pergunta.lower()
-    scores = {}
-    
-    for intencao, config in INTENCOES.items():
-        score = 0
-        for palavra in config['palavras']:
-            if palavra in pergunta_lower:
-                score += config['peso']
-        scores[intencao] = score
-    
-    if max(scores.values()) == 0:
-        return None
-    
-    return max(scores, key=scores.get)
+    return obter_matcher_intencoes().detectar(pergunta)
+
+def detectar_intencoes(perguntas):
+    """Detecta a intenção de uma lista de perguntas (perguntas repetidas são avaliadas uma vez)"""
+    matcher = obter_matcher_intencoes()
+    chaves = [normalizar_texto(p) for p in perguntas]
+    resultados = {chave: matcher.detectar(chave) for chave in set(chaves)}
+    return [resultados[chave] for chave in chaves]
 
 def extrair_codigo_projeto(pergunta):
     """Extrai código do projeto da pergunta"""
-    import re
     match = re.search(r'\b(\d{4,6})\b', pergunta)
     return int(match.group(1)) if match else None
 
-def interpretar_pergunta(pergunta):
+# Intenções que precisam de um projeto: sem código na pergunta, tenta achá-lo pelo nome
+INTENCOES_POR_PROJETO = ('CONSULTA_PROJETO', 'CONSULTA_RECEITA', 'CONSULTA_ALOCACAO', 'CONSULTA_FATURA')
+
+@medir_camada('interpretacao')
+def interpretar_pergunta(pergunta, busca_nomes=None):
     """Interpreta a pergunta completa"""
-    return {
+    interpretacao = {
         'intencao': detectar_intencao(pergunta),
         'cod_projeto': extrair_codigo_projeto(pergunta),
         'pergunta_original': pergunta
     }
+    if (interpretacao['cod_projeto'] is None and busca_nomes is not None
+            and interpretacao['intencao'] in INTENCOES_POR_PROJETO):
+        encontrado = busca_nomes.resolver(pergunta)
+        if encontrado:
+            interpretacao['cod_projeto'] = encontrado['cod_projeto']
+            interpretacao['projeto_por_nome'] = encontrado
+    return interpretacao
 
 # ============================================================================
 # CAMADA 3: EXECUÇÃO (RETRIEVAL - do notebook)
 # ============================================================================
 
-def get_projetos_atrasados(conn):
-    """Busca projetos atrasados REAIS do banco"""
-    query = """
+# Templates parametrizados: %s é vinculado pelo prepared statement, nunca interpolado
+QUERIES = {
+    'projetos_atrasados': """
     SELECT 
         p.cod_projeto,
         p.nom_projeto,
@@ -234,12 +1691,66 @@ def get_projetos_atrasados(conn):
     HAVING dias_atraso > 0
     ORDER BY dias_atraso DESC
     LIMIT 10
-    """
-    return executar_query(conn, query)
+    """,
 
-def get_projeto_detalhes(conn, cod_projeto):
-    """Busca detalhes de um projeto específico"""
-    query = f"""
+    # Explorador de atrasados: dias_atraso decresce com dth_prevista, então a chave de
+    # paginação é (dth_prevista, cod_projeto), percorrida pelo idx_projeto_status_prevista
+    # (o `dth_prevista >= %s` dá o início do intervalo no índice; o OR só desempata).
+    # A página é escolhida antes do join; a receita é somada só para as linhas dela.
+    'projetos_atrasados_total': """
+    SELECT COUNT(*) as total
+    FROM projeto p
+    WHERE p.flg_status = 1
+      AND p.dth_prevista < CURDATE()
+    """,
+
+    'projetos_atrasados_pagina': """
+    SELECT 
+        p.cod_projeto,
+        p.nom_projeto,
+        u.nom_usuario as responsavel,
+        p.dth_prevista as data_prevista,
+        DATEDIFF(NOW(), p.dth_prevista) as dias_atraso,
+        (SELECT COALESCE(SUM(r.total_valor_bruto), 0) FROM receita r
+         WHERE r.cod_projeto = p.cod_projeto) as receita_total
+    FROM (
+        SELECT cod_projeto, nom_projeto, cod_responsavel, dth_prevista
+        FROM projeto
+        WHERE flg_status = 1
+          AND dth_prevista < CURDATE()
+        ORDER BY dth_prevista, cod_projeto
+        LIMIT %s
+    ) p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+    ORDER BY p.dth_prevista, p.cod_projeto
+    """,
+
+    'projetos_atrasados_pagina_apos': """
+    SELECT 
+        p.cod_projeto,
+        p.nom_projeto,
+        u.nom_usuario as responsavel,
+        p.dth_prevista as data_prevista,
+        DATEDIFF(NOW(), p.dth_prevista) as dias_atraso,
+        (SELECT COALESCE(SUM(r.total_valor_bruto), 0) FROM receita r
+         WHERE r.cod_projeto = p.cod_projeto) as receita_total
+    FROM (
+        SELECT cod_projeto, nom_projeto, cod_responsavel, dth_prevista
+        FROM projeto
+        WHERE flg_status = 1
+          AND dth_prevista < CURDATE()
+          AND dth_prevista >= %s AND (dth_prevista > %s OR cod_projeto > %s)
+        ORDER BY dth_prevista, cod_projeto
+        LIMIT %s
+    ) p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+    ORDER BY p.dth_prevista, p.cod_projeto
+    """,
+
+    # Derived tables agregam receita e pagamentos separadamente antes do join: sem o
+    # fan-out receita × pagamento que multiplicaria SUM(total_valor_bruto).
+    # O código do projeto vai em cada derived table (3 parâmetros iguais).
+    'projeto_detalhes': """
     SELECT 
         p.cod_projeto,
         p.nom_projeto,
@@ -248,66 +1759,80 @@ def get_projeto_detalhes(conn, cod_projeto):
         p.dth_prevista,
         p.flg_status,
         DATEDIFF(NOW(), p.dth_prevista) as dias_atraso,
-        COALESCE(SUM(r.total_valor_bruto), 0) as receita_total,
-        COALESCE(SUM(rp.vlr_bruto), 0) as receita_faturada
+        COALESCE(r.receita_total, 0) as receita_total,
+        COALESCE(f.receita_faturada, 0) as receita_faturada
     FROM projeto p
     LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
-    LEFT JOIN receita r ON p.cod_projeto = r.cod_projeto
-    LEFT JOIN receita_pagamento rp ON r.cod_receita = rp.cod_receita 
-        AND rp.flg_status_fatura IN ('Pago', 'Programado')
-    WHERE p.cod_projeto = {cod_projeto}
-    GROUP BY p.cod_projeto, p.nom_projeto, u.nom_usuario, p.dth_inicio, p.dth_prevista, p.flg_status
-    """
-    return executar_query(conn, query)
+    LEFT JOIN (
+        SELECT cod_projeto, SUM(total_valor_bruto) as receita_total
+        FROM receita
+        WHERE cod_projeto = %s
+        GROUP BY cod_projeto
+    ) r ON r.cod_projeto = p.cod_projeto
+    LEFT JOIN (
+        SELECT r.cod_projeto, SUM(rp.vlr_bruto) as receita_faturada
+        FROM receita_pagamento rp
+        JOIN receita r ON rp.cod_receita = r.cod_receita
+        WHERE r.cod_projeto = %s
+          AND rp.flg_status_fatura IN ('Pago', 'Programado')
+        GROUP BY r.cod_projeto
+    ) f ON f.cod_projeto = p.cod_projeto
+    WHERE p.cod_projeto = %s
+    """,
 
-def get_receita_total(conn):
-    """Busca receita total de todos os projetos"""
-    query = """
+    # Uma só varredura de projeto ⋈ receita para a sidebar e a receita total
+    'resumo_geral': """
     SELECT 
         COUNT(DISTINCT p.cod_projeto) as total_projetos,
+        COUNT(DISTINCT u.cod_usuario) as usuarios,
         COALESCE(SUM(r.total_valor_bruto), 0) as receita_total,
         COALESCE(AVG(r.total_valor_bruto), 0) as receita_media
     FROM projeto p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
     LEFT JOIN receita r ON p.cod_projeto = r.cod_projeto
     WHERE p.flg_status = 1
-    """
-    return executar_query(conn, query)
+    """,
 
-def get_receita_projeto(conn, cod_projeto):
-    """Busca receita de um projeto específico"""
-    query = f"""
+    'receita_projeto': """
     SELECT 
         p.cod_projeto,
         p.nom_projeto,
-        COALESCE(SUM(r.total_valor_bruto), 0) as receita_total,
-        COALESCE(SUM(CASE WHEN rp.flg_status_fatura = 'Pago' THEN rp.vlr_bruto ELSE 0 END), 0) as receita_paga,
-        COALESCE(SUM(CASE WHEN rp.flg_status_fatura = 'Programado' THEN rp.vlr_bruto ELSE 0 END), 0) as receita_programada
+        COALESCE(r.receita_total, 0) as receita_total,
+        COALESCE(f.receita_paga, 0) as receita_paga,
+        COALESCE(f.receita_programada, 0) as receita_programada
     FROM projeto p
-    LEFT JOIN receita r ON p.cod_projeto = r.cod_projeto
-    LEFT JOIN receita_pagamento rp ON r.cod_receita = rp.cod_receita
-    WHERE p.cod_projeto = {cod_projeto}
-    GROUP BY p.cod_projeto, p.nom_projeto
-    """
-    return executar_query(conn, query)
+    LEFT JOIN (
+        SELECT cod_projeto, SUM(total_valor_bruto) as receita_total
+        FROM receita
+        WHERE cod_projeto = %s
+        GROUP BY cod_projeto
+    ) r ON r.cod_projeto = p.cod_projeto
+    LEFT JOIN (
+        SELECT 
+            r.cod_projeto,
+            SUM(CASE WHEN rp.flg_status_fatura = 'Pago' THEN rp.vlr_bruto ELSE 0 END) as receita_paga,
+            SUM(CASE WHEN rp.flg_status_fatura = 'Programado' THEN rp.vlr_bruto ELSE 0 END) as receita_programada
+        FROM receita_pagamento rp
+        JOIN receita r ON rp.cod_receita = r.cod_receita
+        WHERE r.cod_projeto = %s
+        GROUP BY r.cod_projeto
+    ) f ON f.cod_projeto = p.cod_projeto
+    WHERE p.cod_projeto = %s
+    """,
 
-def get_alocacoes_projeto(conn, cod_projeto):
-    """Busca alocações de um projeto específico"""
-    query = f"""
+    'alocacoes_projeto': """
     SELECT 
         u.nom_usuario,
         SUM(ra.num_horas_aloc) as horas_alocadas,
         SUM(ra.num_horas_trab) as horas_trabalhadas
     FROM DWDT_RECURSO_ALOCACAO ra
     JOIN usuario u ON ra.cod_usuario = u.cod_usuario
-    WHERE ra.cod_projeto = {cod_projeto}
+    WHERE ra.cod_projeto = %s
     GROUP BY u.nom_usuario
     ORDER BY horas_alocadas DESC
-    """
-    return executar_query(conn, query)
+    """,
 
-def get_faturas_projeto(conn, cod_projeto):
-    """Busca faturas de um projeto"""
-    query = f"""
+    'faturas_projeto': """
     SELECT 
         rp.dsc_receita_pagamento as descricao,
         rp.vlr_bruto as valor,
@@ -315,71 +1840,1961 @@ def get_faturas_projeto(conn, cod_projeto):
         rp.flg_status_fatura as status
     FROM receita_pagamento rp
     JOIN receita r ON rp.cod_receita = r.cod_receita
-    WHERE r.cod_projeto = {cod_projeto}
+    WHERE r.cod_projeto = %s
     ORDER BY rp.dth_faturamento DESC
-    """
-    return executar_query(conn, query)
+    """,
 
-def executar_consulta(conn, interpretacao):
-    """Executa consulta baseada na interpretação"""
-    intencao = interpretacao['intencao']
-    cod_projeto = interpretacao['cod_projeto']
-    
-    if intencao == 'PROJETOS_ATRASADOS':
-        return {'sucesso': True, 'dados': get_projetos_atrasados(conn)}
-    
+    # Resumos calculados no banco + páginas com keyset pagination para listas grandes
+    'faturas_resumo': """
+    SELECT 
+        rp.flg_status_fatura as status,
+        COUNT(*) as count,
+        COALESCE(SUM(rp.vlr_bruto), 0) as sum
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE r.cod_projeto = %s
+    GROUP BY rp.flg_status_fatura
+    ORDER BY sum DESC
+    """,
+
+    'faturas_pagina': """
+    SELECT 
+        rp.cod_receita_pagamento as cod_fatura,
+        rp.dsc_receita_pagamento as descricao,
+        rp.vlr_bruto as valor,
+        rp.dth_faturamento as data_faturamento,
+        rp.flg_status_fatura as status
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE r.cod_projeto = %s
+    ORDER BY rp.dth_faturamento DESC, rp.cod_receita_pagamento DESC
+    LIMIT %s
+    """,
+
+    # MySQL ordena NULL por último no DESC: após uma data, vêm as menores e depois as sem data
+    'faturas_pagina_apos': """
+    SELECT 
+        rp.cod_receita_pagamento as cod_fatura,
+        rp.dsc_receita_pagamento as descricao,
+        rp.vlr_bruto as valor,
+        rp.dth_faturamento as data_faturamento,
+        rp.flg_status_fatura as status
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE r.cod_projeto = %s
+      AND (rp.dth_faturamento < %s
+           OR (rp.dth_faturamento = %s AND rp.cod_receita_pagamento < %s)
+           OR rp.dth_faturamento IS NULL)
+    ORDER BY rp.dth_faturamento DESC, rp.cod_receita_pagamento DESC
+    LIMIT %s
+    """,
+
+    'faturas_pagina_apos_sem_data': """
+    SELECT 
+        rp.cod_receita_pagamento as cod_fatura,
+        rp.dsc_receita_pagamento as descricao,
+        rp.vlr_bruto as valor,
+        rp.dth_faturamento as data_faturamento,
+        rp.flg_status_fatura as status
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE r.cod_projeto = %s
+      AND rp.dth_faturamento IS NULL
+      AND rp.cod_receita_pagamento < %s
+    ORDER BY rp.cod_receita_pagamento DESC
+    LIMIT %s
+    """,
+
+    'alocacoes_resumo': """
+    SELECT 
+        COUNT(DISTINCT u.nom_usuario) as pessoas,
+        COALESCE(SUM(ra.num_horas_aloc), 0) as horas_alocadas,
+        COALESCE(SUM(ra.num_horas_trab), 0) as horas_trabalhadas
+    FROM DWDT_RECURSO_ALOCACAO ra
+    JOIN usuario u ON ra.cod_usuario = u.cod_usuario
+    WHERE ra.cod_projeto = %s
+    HAVING pessoas > 0
+    """,
+
+    'alocacoes_pagina': """
+    SELECT 
+        u.nom_usuario,
+        COALESCE(SUM(ra.num_horas_aloc), 0) as horas_alocadas,
+        COALESCE(SUM(ra.num_horas_trab), 0) as horas_trabalhadas
+    FROM DWDT_RECURSO_ALOCACAO ra
+    JOIN usuario u ON ra.cod_usuario = u.cod_usuario
+    WHERE ra.cod_projeto = %s
+    GROUP BY u.nom_usuario
+    ORDER BY horas_alocadas DESC, u.nom_usuario
+    LIMIT %s
+    """,
+
+    'alocacoes_pagina_apos': """
+    SELECT a.nom_usuario, a.horas_alocadas, a.horas_trabalhadas
+    FROM (
+        SELECT 
+            u.nom_usuario,
+            COALESCE(SUM(ra.num_horas_aloc), 0) as horas_alocadas,
+            COALESCE(SUM(ra.num_horas_trab), 0) as horas_trabalhadas
+        FROM DWDT_RECURSO_ALOCACAO ra
+        JOIN usuario u ON ra.cod_usuario = u.cod_usuario
+        WHERE ra.cod_projeto = %s
+        GROUP BY u.nom_usuario
+    ) a
+    WHERE a.horas_alocadas < %s
+       OR (a.horas_alocadas = %s AND a.nom_usuario > %s)
+    ORDER BY a.horas_alocadas DESC, a.nom_usuario
+    LIMIT %s
+    """,
+
+    # Agregados de todos os projetos de uma vez (derived tables evitam o fan-out receita × pagamento)
+    'snapshot_projetos': """
+    SELECT 
+        p.cod_projeto,
+        p.nom_projeto,
+        u.nom_usuario as responsavel,
+        p.dth_inicio,
+        p.dth_prevista,
+        p.flg_status,
+        COALESCE(r.receita_total, 0) as receita_total,
+        COALESCE(f.receita_paga, 0) as receita_paga,
+        COALESCE(f.receita_programada, 0) as receita_programada
+    FROM projeto p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+    LEFT JOIN (
+        SELECT cod_projeto, SUM(total_valor_bruto) as receita_total
+        FROM receita
+        GROUP BY cod_projeto
+    ) r ON r.cod_projeto = p.cod_projeto
+    LEFT JOIN (
+        SELECT 
+            r.cod_projeto,
+            SUM(CASE WHEN rp.flg_status_fatura = 'Pago' THEN rp.vlr_bruto ELSE 0 END) as receita_paga,
+            SUM(CASE WHEN rp.flg_status_fatura = 'Programado' THEN rp.vlr_bruto ELSE 0 END) as receita_programada
+        FROM receita_pagamento rp
+        JOIN receita r ON rp.cod_receita = r.cod_receita
+        GROUP BY r.cod_projeto
+    ) f ON f.cod_projeto = p.cod_projeto
+    ORDER BY p.cod_projeto
+    """,
+    # Nomes para a busca aproximada: carga completa e projetos criados depois do maior código já lido
+    'nomes_projetos': """
+    SELECT p.cod_projeto, p.nom_projeto, u.nom_usuario as responsavel
+    FROM projeto p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+    ORDER BY p.cod_projeto
+    """,
+    'nomes_projetos_novos': """
+    SELECT p.cod_projeto, p.nom_projeto, u.nom_usuario as responsavel
+    FROM projeto p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+    WHERE p.cod_projeto > %s
+    ORDER BY p.cod_projeto
+    """,
+
+    # Receita mensal: marca de cada mês × status (muda quando qualquer fatura do mês muda)
+    # e agregação por mês × projeto × status de um intervalo [início, fim) de faturamento
+    'receita_mensal_marcas': """
+    SELECT
+        YEAR(rp.dth_faturamento) * 100 + MONTH(rp.dth_faturamento) as mes,
+        rp.flg_status_fatura as status,
+        COUNT(*) as faturas,
+        COALESCE(SUM(rp.vlr_bruto), 0) as valor,
+        SUM(r.cod_projeto) as soma_projetos
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE rp.dth_faturamento IS NOT NULL
+    GROUP BY mes, rp.flg_status_fatura
+    """,
+    'receita_mensal': """
+    SELECT
+        YEAR(rp.dth_faturamento) * 100 + MONTH(rp.dth_faturamento) as mes,
+        r.cod_projeto,
+        rp.flg_status_fatura as status,
+        COUNT(*) as faturas,
+        COALESCE(SUM(rp.vlr_bruto), 0) as valor
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE rp.dth_faturamento >= %s
+      AND rp.dth_faturamento < %s
+    GROUP BY mes, r.cod_projeto, rp.flg_status_fatura
+    """,
+
+    # Versões em lote: {marcadores} vira IN (%s, ...) e cod_lote separa o resultado por projeto
+    'projeto_detalhes_lote': """
+    SELECT 
+        p.cod_projeto as cod_lote,
+        p.cod_projeto,
+        p.nom_projeto,
+        u.nom_usuario as responsavel,
+        p.dth_inicio,
+        p.dth_prevista,
+        p.flg_status,
+        DATEDIFF(NOW(), p.dth_prevista) as dias_atraso,
+        COALESCE(r.receita_total, 0) as receita_total,
+        COALESCE(f.receita_faturada, 0) as receita_faturada
+    FROM projeto p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+    LEFT JOIN (
+        SELECT cod_projeto, SUM(total_valor_bruto) as receita_total
+        FROM receita
+        WHERE cod_projeto IN ({marcadores})
+        GROUP BY cod_projeto
+    ) r ON r.cod_projeto = p.cod_projeto
+    LEFT JOIN (
+        SELECT r.cod_projeto, SUM(rp.vlr_bruto) as receita_faturada
+        FROM receita_pagamento rp
+        JOIN receita r ON rp.cod_receita = r.cod_receita
+        WHERE r.cod_projeto IN ({marcadores})
+          AND rp.flg_status_fatura IN ('Pago', 'Programado')
+        GROUP BY r.cod_projeto
+    ) f ON f.cod_projeto = p.cod_projeto
+    WHERE p.cod_projeto IN ({marcadores})
+    """,
+
+    'receita_projeto_lote': """
+    SELECT 
+        p.cod_projeto as cod_lote,
+        p.cod_projeto,
+        p.nom_projeto,
+        COALESCE(r.receita_total, 0) as receita_total,
+        COALESCE(f.receita_paga, 0) as receita_paga,
+        COALESCE(f.receita_programada, 0) as receita_programada
+    FROM projeto p
+    LEFT JOIN (
+        SELECT cod_projeto, SUM(total_valor_bruto) as receita_total
+        FROM receita
+        WHERE cod_projeto IN ({marcadores})
+        GROUP BY cod_projeto
+    ) r ON r.cod_projeto = p.cod_projeto
+    LEFT JOIN (
+        SELECT 
+            r.cod_projeto,
+            SUM(CASE WHEN rp.flg_status_fatura = 'Pago' THEN rp.vlr_bruto ELSE 0 END) as receita_paga,
+            SUM(CASE WHEN rp.flg_status_fatura = 'Programado' THEN rp.vlr_bruto ELSE 0 END) as receita_programada
+        FROM receita_pagamento rp
+        JOIN receita r ON rp.cod_receita = r.cod_receita
+        WHERE r.cod_projeto IN ({marcadores})
+        GROUP BY r.cod_projeto
+    ) f ON f.cod_projeto = p.cod_projeto
+    WHERE p.cod_projeto IN ({marcadores})
+    """,
+
+    'alocacoes_resumo_lote': """
+    SELECT 
+        ra.cod_projeto as cod_lote,
+        COUNT(DISTINCT u.nom_usuario) as pessoas,
+        COALESCE(SUM(ra.num_horas_aloc), 0) as horas_alocadas,
+        COALESCE(SUM(ra.num_horas_trab), 0) as horas_trabalhadas
+    FROM DWDT_RECURSO_ALOCACAO ra
+    JOIN usuario u ON ra.cod_usuario = u.cod_usuario
+    WHERE ra.cod_projeto IN ({marcadores})
+    GROUP BY ra.cod_projeto
+    """,
+
+    'faturas_resumo_lote': """
+    SELECT 
+        r.cod_projeto as cod_lote,
+        rp.flg_status_fatura as status,
+        COUNT(*) as count,
+        COALESCE(SUM(rp.vlr_bruto), 0) as sum
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE r.cod_projeto IN ({marcadores})
+    GROUP BY r.cod_projeto, rp.flg_status_fatura
+    ORDER BY r.cod_projeto, sum DESC
+    """,
+}
+
+# Tabelas lidas por cada template (para invalidação) e se o 1º parâmetro é o cod_projeto
+DEPENDENCIAS = {
+    'projetos_atrasados': {'tabelas': ('projeto', 'usuario', 'receita'), 'por_projeto': False},
+    'projetos_atrasados_total': {'tabelas': ('projeto',), 'por_projeto': False},
+    'projetos_atrasados_pagina': {'tabelas': ('projeto', 'usuario', 'receita'), 'por_projeto': False},
+    'projetos_atrasados_pagina_apos': {'tabelas': ('projeto', 'usuario', 'receita'), 'por_projeto': False},
+    'projeto_detalhes': {'tabelas': ('projeto', 'usuario', 'receita', 'receita_pagamento'), 'por_projeto': True},
+    'resumo_geral': {'tabelas': ('projeto', 'usuario', 'receita'), 'por_projeto': False},
+    'receita_projeto': {'tabelas': ('projeto', 'receita', 'receita_pagamento'), 'por_projeto': True},
+    'alocacoes_projeto': {'tabelas': ('DWDT_RECURSO_ALOCACAO', 'usuario'), 'por_projeto': True},
+    'faturas_projeto': {'tabelas': ('receita_pagamento', 'receita'), 'por_projeto': True},
+    'faturas_resumo': {'tabelas': ('receita_pagamento', 'receita'), 'por_projeto': True},
+    'faturas_pagina': {'tabelas': ('receita_pagamento', 'receita'), 'por_projeto': True},
+    'faturas_pagina_apos': {'tabelas': ('receita_pagamento', 'receita'), 'por_projeto': True},
+    'faturas_pagina_apos_sem_data': {'tabelas': ('receita_pagamento', 'receita'), 'por_projeto': True},
+    'alocacoes_resumo': {'tabelas': ('DWDT_RECURSO_ALOCACAO', 'usuario'), 'por_projeto': True},
+    'alocacoes_pagina': {'tabelas': ('DWDT_RECURSO_ALOCACAO', 'usuario'), 'por_projeto': True},
+    'alocacoes_pagina_apos': {'tabelas': ('DWDT_RECURSO_ALOCACAO', 'usuario'), 'por_projeto': True},
+}
+
+def get_projetos_atrasados(pool):
+    """Busca os 10 projetos mais atrasados (dashboard)"""
+    return consultar(pool, 'projetos_atrasados')
+
+def get_total_atrasados(pool):
+    """Quantos projetos ativos estão atrasados"""
+    return consultar(pool, 'projetos_atrasados_total')
+
+def get_projeto_detalhes(pool, cod_projeto):
+    """Busca detalhes de um projeto específico"""
+    return consultar(pool, 'projeto_detalhes', cod_projeto, cod_projeto, cod_projeto)
+
+def get_receita_total(pool):
+    """Busca receita total de todos os projetos (mesma entrada de cache do resumo geral)"""
+    return get_resumo_geral(pool)
+
+def get_receita_projeto(pool, cod_projeto):
+    """Busca receita de um projeto específico"""
+    return consultar(pool, 'receita_projeto', cod_projeto, cod_projeto, cod_projeto)
+
+def get_alocacoes_projeto(pool, cod_projeto):
+    """Busca alocações de um projeto específico"""
+    return consultar(pool, 'alocacoes_projeto', cod_projeto)
+
+def get_faturas_projeto(pool, cod_projeto):
+    """Busca faturas de um projeto"""
+    return consultar(pool, 'faturas_projeto', cod_projeto)
+
+def get_faturas_resumo(pool, cod_projeto):
+    """Busca quantidade e valor das faturas por status (agregado no banco)"""
+    return consultar(pool, 'faturas_resumo', cod_projeto)
+
+def get_alocacoes_resumo(pool, cod_projeto):
+    """Busca total de pessoas e horas alocadas/trabalhadas (agregado no banco)"""
+    return consultar(pool, 'alocacoes_resumo', cod_projeto)
+
+TAMANHO_PAGINA = 50
+
+class PaginadorKeyset:
+    """Páginas de uma listagem ordenada, buscadas sob demanda com keyset pagination
+
+    Cada página continua a partir da chave da última linha da anterior
+    (nunca OFFSET), então o custo não cresce com a posição. Busca uma linha
+    a mais para saber se há próxima página.
+    """
+
+    def __init__(self, pool, cod_projeto, primeira, seguinte, colunas_chave, tamanho=TAMANHO_PAGINA):
+        self.pool = pool
+        self.cod_projeto = cod_projeto  # None: listagem sem projeto (o template não o recebe)
+        self._prefixo = () if cod_projeto is None else (cod_projeto,)
+        self.primeira = primeira
+        self.seguinte = seguinte  # função(chave) -> (template, params da chave)
+        self.colunas_chave = colunas_chave
+        self.tamanho = tamanho
+
+    def pagina(self, chave=None):
+        """(DataFrame da página, chave para a próxima página ou None)"""
+        if chave is None:
+            df = consultar(self.pool, self.primeira, *self._prefixo, self.tamanho + 1)
+        else:
+            template, params = self.seguinte(chave)
+            df = consultar(self.pool, template, *self._prefixo, *params, self.tamanho + 1)
+        if df is None:
+            return None, None
+        if len(df) <= self.tamanho:
+            return df, None
+        df = df.iloc[:self.tamanho]
+        ultima = df.iloc[-1]
+        return df, tuple(_valor_python(ultima[coluna]) for coluna in self.colunas_chave)
+
+def _valor_python(valor):
+    """Escalar numpy/pandas → tipo Python (NaT/NaN → None) para usar como parâmetro"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    return valor.item() if hasattr(valor, 'item') else valor
+
+def _proxima_fatura(chave):
+    data, cod_fatura = chave
+    if data is None:
+        return 'faturas_pagina_apos_sem_data', (cod_fatura,)
+    return 'faturas_pagina_apos', (data, data, cod_fatura)
+
+def _proxima_atrasado(chave):
+    data, cod_projeto = chave
+    return 'projetos_atrasados_pagina_apos', (data, data, cod_projeto)
+
+def _proxima_alocacao(chave):
+    horas, nome = chave
+    return 'alocacoes_pagina_apos', (horas, horas, nome)
+
+def paginador_faturas(pool, cod_projeto):
+    """Faturas do projeto, da mais recente para a mais antiga"""
+    return PaginadorKeyset(pool, cod_projeto, 'faturas_pagina', _proxima_fatura,
+                           ('data_faturamento', 'cod_fatura'))
+
+def paginador_atrasados(pool):
+    """Projetos atrasados, do mais atrasado para o menos (previsão mais antiga primeiro)"""
+    return PaginadorKeyset(pool, None, 'projetos_atrasados_pagina', _proxima_atrasado,
+                           ('data_prevista', 'cod_projeto'))
+
+def paginador_alocacoes(pool, cod_projeto):
+    """Pessoas alocadas no projeto, das com mais horas para as com menos"""
+    return PaginadorKeyset(pool, cod_projeto, 'alocacoes_pagina', _proxima_alocacao,
+                           ('horas_alocadas', 'nom_usuario'))
+
+def get_resumo_geral(pool):
+    """Busca o resumo geral (projetos ativos, usuários e receita) da sidebar e dos dashboards"""
+    return consultar(pool, 'resumo_geral')
+
+@recurso_compartilhado
+def obter_executor():
+    """Threads para disparar consultas independentes em paralelo (uma por conexão do pool)"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="consultas")
+
+def carregar_em_paralelo(tarefas):
+    """Executa {nome: função} em paralelo e retorna {nome: resultado}
+
+    As threads herdam o contexto da sessão para que st.cache_data e
+    st.error funcionem como na thread principal.
+    """
+    ctx = get_script_run_ctx()
+
+    def com_contexto(funcao):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return funcao()
+
+    # Cada tarefa numa cópia do contexto: leva junto o limite da requisição (limite_requisicao)
+    futuros = {nome: obter_executor().submit(contextvars.copy_context().run, com_contexto, funcao)
+               for nome, funcao in tarefas.items()}
+    return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+def carregar_dashboard(pool):
+    """Busca em paralelo todos os dados da sidebar e da aba de dashboards"""
+    return carregar_em_paralelo({
+        'resumo': lambda: get_resumo_geral(pool),
+        'atrasados': lambda: get_projetos_atrasados(pool),
+    })
+
+def _sem_codigo(interpretacao):
+    """Erro de projeto não especificado, com os candidatos quando o nome casou com vários"""
+    encontrado = interpretacao.get('projeto_por_nome')
+    if not encontrado:
+        return {'sucesso': False, 'erro': 'Código do projeto não especificado'}
+    opcoes = '; '.join(f"{cod} ({nome})" for cod, nome in encontrado['candidatos'])
+    restantes = encontrado['total_candidatos'] - len(encontrado['candidatos'])
+    return {'sucesso': False, 'erro': f"Mais de um projeto para \"{encontrado['nome']}\": {opcoes}"
+                                      + (f" e mais {restantes}" if restantes > 0 else "")
+                                      + ". Informe o código do projeto."}
+
+@medir_camada('retrieval')
+def executar_consulta(pool, interpretacao):
+    """Executa consulta baseada na interpretação"""
+    intencao = interpretacao['intencao']
+    cod_projeto = interpretacao['cod_projeto']
+    
+    if intencao == 'PROJETOS_ATRASADOS':
+        df = get_total_atrasados(pool)
+        if df is not None:
+            return {'sucesso': True, 'dados': df, 'paginas': paginador_atrasados(pool)}
+        else:
+            return {'sucesso': False, 'erro': 'Não foi possível contar os projetos atrasados'}
+    
     elif intencao == 'CONSULTA_PROJETO':
         if not cod_projeto:
-            return {'sucesso': False, 'erro': 'Código do projeto não especificado'}
-        df = get_projeto_detalhes(conn, cod_projeto)
+            return _sem_codigo(interpretacao)
+        df = obter_snapshot(pool).detalhes(cod_projeto)
+        if df is None:
+            df = get_projeto_detalhes(pool, cod_projeto)
         return {'sucesso': True, 'dados': df} if df is not None and len(df) > 0 else {'sucesso': False, 'erro': 'Projeto não encontrado'}
     
     elif intencao == 'CONSULTA_RECEITA':
+        if not cod_projeto and interpretacao.get('projeto_por_nome'):
+            return _sem_codigo(interpretacao)
         if cod_projeto:
-            df = get_receita_projeto(conn, cod_projeto)
+            df = obter_snapshot(pool).receita(cod_projeto)
+            if df is None:
+                df = get_receita_projeto(pool, cod_projeto)
             return {'sucesso': True, 'dados': df} if df is not None and len(df) > 0 else {'sucesso': False, 'erro': 'Projeto não encontrado'}
         else:
-            return {'sucesso': True, 'dados': get_receita_total(conn)}
+            return {'sucesso': True, 'dados': get_receita_total(pool)}
     
     elif intencao == 'CONSULTA_ALOCACAO':
         if not cod_projeto:
-            return {'sucesso': False, 'erro': 'Código do projeto não especificado'}
-        df = get_alocacoes_projeto(conn, cod_projeto)
-        return {'sucesso': True, 'dados': df} if df is not None and len(df) > 0 else {'sucesso': False, 'erro': 'Sem alocações'}
+            return _sem_codigo(interpretacao)
+        df = get_alocacoes_resumo(pool, cod_projeto)
+        return {'sucesso': True, 'dados': df, 'paginas': paginador_alocacoes(pool, cod_projeto)} if df is not None and len(df) > 0 else {'sucesso': False, 'erro': 'Sem alocações'}
     
     elif intencao == 'CONSULTA_FATURA':
         if not cod_projeto:
-            return {'sucesso': False, 'erro': 'Código do projeto não especificado'}
-        df = get_faturas_projeto(conn, cod_projeto)
-        return {'sucesso': True, 'dados': df} if df is not None and len(df) > 0 else {'sucesso': False, 'erro': 'Sem faturas'}
+            return _sem_codigo(interpretacao)
+        df = get_faturas_resumo(pool, cod_projeto)
+        return {'sucesso': True, 'dados': df, 'paginas': paginador_faturas(pool, cod_projeto)} if df is not None and len(df) > 0 else {'sucesso': False, 'erro': 'Sem faturas'}
     
     return {'sucesso': False, 'erro': 'Intenção não reconhecida'}
 
+# Intenções por projeto que o modo lote funde em um único IN (...) por intenção
+CONSULTAS_LOTE = {
+    'CONSULTA_PROJETO': ('projeto_detalhes_lote', 'Projeto não encontrado'),
+    'CONSULTA_RECEITA': ('receita_projeto_lote', 'Projeto não encontrado'),
+    'CONSULTA_ALOCACAO': ('alocacoes_resumo_lote', 'Sem alocações'),
+    'CONSULTA_FATURA': ('faturas_resumo_lote', 'Sem faturas'),
+}
+
+TAMANHO_MAX_IN = 1024
+
+@lru_cache(maxsize=None)
+def _sql_lote(template, quantidade):
+    """Template com IN de `quantidade` marcadores (sempre o mesmo objeto str por tamanho)"""
+    return QUERIES[template].replace('{marcadores}', ', '.join(['%s'] * quantidade))
+
+def consultar_lote(pool, template, codigos):
+    """Executa um template *_lote para vários projetos, em blocos de até TAMANHO_MAX_IN"""
+    ocorrencias = QUERIES[template].count('{marcadores}')
+    partes = []
+    for inicio in range(0, len(codigos), TAMANHO_MAX_IN):
+        bloco = list(codigos[inicio:inicio + TAMANHO_MAX_IN])
+        # Arredonda para potência de 2 repetindo o último código: poucos textos distintos a preparar
+        tamanho = 1 << (len(bloco) - 1).bit_length()
+        bloco += [bloco[-1]] * (tamanho - len(bloco))
+        prazo = obter_prazos()[template]
+        sql = sql_com_prazo(_sql_lote(template, tamanho), prazo)
+        params = tuple(bloco) * ocorrencias
+        partes.append(obter_disjuntor().executar(lambda: pool.executar(
+            lambda conn: _executar_preparado(pool, conn, f"{template}:{tamanho}", sql, params, prazo),
+            timeout=prazo or None), prazo))
+    return pd.concat(partes, ignore_index=True) if partes else None
+
+def executar_consultas_lote(pool, interpretacoes):
+    """Executa várias interpretações de uma vez, na mesma ordem
+
+    Consultas por projeto viram um IN (...) por intenção; as demais
+    (agregados globais, erros de interpretação) são executadas uma única
+    vez por (intenção, cod_projeto).
+    """
+    codigos = {}
+    for interpretacao in interpretacoes:
+        intencao, cod_projeto = interpretacao['intencao'], interpretacao['cod_projeto']
+        if intencao in CONSULTAS_LOTE and cod_projeto:
+            codigos.setdefault(intencao, set()).add(cod_projeto)
+
+    por_projeto = {}
+    for intencao, cods in codigos.items():
+        df = consultar_lote(pool, CONSULTAS_LOTE[intencao][0], sorted(cods))
+        por_projeto[intencao] = {
+            cod: grupo.drop(columns='cod_lote').reset_index(drop=True)
+            for cod, grupo in df.groupby('cod_lote', sort=False)
+        }
+
+    resultados = []
+    individuais = {}
+    for interpretacao in interpretacoes:
+        intencao, cod_projeto = interpretacao['intencao'], interpretacao['cod_projeto']
+        if intencao in por_projeto and cod_projeto:
+            df = por_projeto[intencao].get(cod_projeto)
+            erro = CONSULTAS_LOTE[intencao][1]
+            resultados.append({'sucesso': True, 'dados': df} if df is not None else {'sucesso': False, 'erro': erro})
+        else:
+            encontrado = interpretacao.get('projeto_por_nome')
+            chave = (intencao, cod_projeto, encontrado and encontrado['nome'])
+            if chave not in individuais:
+                individuais[chave] = executar_consulta(pool, interpretacao)
+            resultados.append(individuais[chave])
+    return resultados
+
+# ============================================================================
+# SNAPSHOT EM MEMÓRIA DOS AGREGADOS POR PROJETO
+# ============================================================================
+
+class SnapshotProjetos:
+    """Agregados por projeto em colunas NumPy, indexados por cod_projeto
+
+    Responde CONSULTA_PROJETO/CONSULTA_RECEITA sem ir ao MySQL. Um thread de
+    fundo recarrega tudo periodicamente e troca o snapshot de forma atômica;
+    códigos ausentes (projeto novo, snapshot ainda carregando) retornam None
+    para que a chamada caia na query ao vivo.
+    """
+
+    TAMANHO_LOTE = 50_000
+
+    def __init__(self, pool, intervalo=300):
+        self.pool = pool
+        self.intervalo = intervalo
+        self.carregado_em = None
+        self.ultimo_erro = None
+        self._dados = None
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        """Carrega em segundo plano e agenda as atualizações periódicas"""
+        self._thread = threading.Thread(target=self._loop, name="snapshot-projetos", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def solicitar_atualizacao(self, *_):
+        """Antecipa a próxima recarga (ex.: o monitor detectou alteração)"""
+        self._acordar.set()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                self.atualizar()
+            except Exception as e:
+                self.ultimo_erro = str(e)
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def _buscar_linhas(self, conn):
+        with _cursor_com_prazo(self.pool, conn, 'snapshot_projetos') as (cursor, sql):
+            cursor.execute(sql)
+            colunas = cursor.column_names
+            linhas = []
+            while True:
+                lote = cursor.fetchmany(self.TAMANHO_LOTE)
+                if not lote:
+                    break
+                linhas.extend(lote)
+            return colunas, linhas
+
+    def atualizar(self):
+        """Recalcula o snapshot completo e substitui o atual"""
+        colunas, linhas = self.pool.executar(self._buscar_linhas,
+                                             timeout=obter_prazos()['snapshot_projetos'] or None)
+        bruto = dict(zip(colunas, zip(*linhas))) if linhas else {c: () for c in colunas}
+
+        responsaveis = pd.Categorical(bruto['responsavel'])
+        dados = {
+            'cod_projeto': np.asarray(bruto['cod_projeto'], dtype=np.int64),
+            'nom_projeto': np.asarray(bruto['nom_projeto'], dtype=object),
+            'responsavel_codigo': responsaveis.codes,
+            'responsavel_nomes': np.asarray(responsaveis.categories, dtype=object),
+            'dth_inicio': np.asarray(bruto['dth_inicio'], dtype=object),
+            'dth_prevista': np.asarray(bruto['dth_prevista'], dtype=object),
+            'flg_status': np.asarray(bruto['flg_status'], dtype=np.int16),
+            'receita_total': np.asarray(bruto['receita_total'], dtype=np.float64),
+            'receita_paga': np.asarray(bruto['receita_paga'], dtype=np.float64),
+            'receita_programada': np.asarray(bruto['receita_programada'], dtype=np.float64),
+        }
+        # A query já vem ordenada; garantimos para o searchsorted
+        if np.any(np.diff(dados['cod_projeto']) < 0):
+            ordem = np.argsort(dados['cod_projeto'], kind='stable')
+            dados = {k: v if k == 'responsavel_nomes' else v[ordem] for k, v in dados.items()}
+
+        self._dados = dados
+        self.carregado_em = datetime.now()
+        self.ultimo_erro = None
+
+    def __len__(self):
+        return 0 if self._dados is None else len(self._dados['cod_projeto'])
+
+    def _linha(self, cod_projeto):
+        """Posição do projeto no snapshot (busca binária) ou None"""
+        dados = self._dados
+        if dados is None:
+            return None, None
+        codigos = dados['cod_projeto']
+        i = int(np.searchsorted(codigos, cod_projeto))
+        if i >= len(codigos) or codigos[i] != cod_projeto:
+            return dados, None
+        return dados, i
+
+    def detalhes(self, cod_projeto):
+        """Equivalente a get_projeto_detalhes, ou None se o código não estiver no snapshot"""
+        dados, i = self._linha(cod_projeto)
+        if i is None:
+            return None
+        codigo_resp = dados['responsavel_codigo'][i]
+        dth_prevista = dados['dth_prevista'][i]
+        return pd.DataFrame([{
+            'cod_projeto': int(dados['cod_projeto'][i]),
+            'nom_projeto': dados['nom_projeto'][i],
+            'responsavel': dados['responsavel_nomes'][codigo_resp] if codigo_resp >= 0 else None,
+            'dth_inicio': dados['dth_inicio'][i],
+            'dth_prevista': dth_prevista,
+            'flg_status': int(dados['flg_status'][i]),
+            'dias_atraso': _dias_desde(dth_prevista),
+            'receita_total': float(dados['receita_total'][i]),
+            'receita_faturada': float(dados['receita_paga'][i] + dados['receita_programada'][i]),
+        }])
+
+    def receita(self, cod_projeto):
+        """Equivalente a get_receita_projeto, ou None se o código não estiver no snapshot"""
+        dados, i = self._linha(cod_projeto)
+        if i is None:
+            return None
+        return pd.DataFrame([{
+            'cod_projeto': int(dados['cod_projeto'][i]),
+            'nom_projeto': dados['nom_projeto'][i],
+            'receita_total': float(dados['receita_total'][i]),
+            'receita_paga': float(dados['receita_paga'][i]),
+            'receita_programada': float(dados['receita_programada'][i]),
+        }])
+
+def _dias_desde(data):
+    """DATEDIFF(NOW(), data) calculado no cliente"""
+    if data is None:
+        return None
+    if isinstance(data, datetime):
+        data = data.date()
+    return (date.today() - data).days
+
+@recurso_compartilhado
+def obter_snapshot(_pool):
+    """Snapshot de agregados por projeto (um por processo, atualizado em segundo plano)"""
+    cfg = ler_config("snapshot")
+    snapshot = SnapshotProjetos(_pool, intervalo=float(cfg.get("intervalo", 300)))
+    if cfg.get("ativo", True):
+        snapshot.iniciar()
+        obter_monitor(_pool).assinar(snapshot.solicitar_atualizacao)
+    return snapshot
+
+# ============================================================================
+# RECEITA MENSAL CONSOLIDADA (mês × projeto × status × responsável)
+# ============================================================================
+
+RESPONSAVEL_AUSENTE = "Sem responsável"
+
+# Colunas da marca de cada mês × status: se alguma mudar, o mês é agregado de novo
+COLUNAS_MARCA = ('faturas', 'valor', 'soma_projetos')
+
+def _mes_seguinte(mes):
+    """AAAAMM do mês seguinte"""
+    return mes + 89 if mes % 100 == 12 else mes + 1
+
+def _inicio_mes(mes):
+    return datetime(mes // 100, mes % 100, 1)
+
+def meses_entre(primeiro, ultimo):
+    """Todos os meses AAAAMM de `primeiro` a `ultimo`, inclusive"""
+    meses = [primeiro]
+    while meses[-1] < ultimo:
+        meses.append(_mes_seguinte(meses[-1]))
+    return meses
+
+def _faixas_meses(meses):
+    """[(primeiro, último)] de cada sequência de meses consecutivos"""
+    faixas = []
+    for mes in sorted(meses):
+        if faixas and _mes_seguinte(faixas[-1][1]) == mes:
+            faixas[-1][1] = mes
+        else:
+            faixas.append([mes, mes])
+    return [tuple(faixa) for faixa in faixas]
+
+def _linhas_vazias():
+    return pd.DataFrame({'mes': np.array([], np.int32), 'cod_projeto': np.array([], np.int64),
+                         'status': pd.Categorical([]), 'faturas': np.array([], np.int64),
+                         'valor': np.array([], np.float64), 'responsavel': pd.Categorical([])})
+
+def _meses_alterados(antigas, novas):
+    """Meses com alguma marca (mês × status) diferente, nova ou que sumiu"""
+    juntas = antigas.merge(novas, on=['mes', 'status'], how='outer', suffixes=('_antes', ''), indicator=True)
+    diferentes = (juntas['_merge'] != 'both').to_numpy()
+    for coluna in COLUNAS_MARCA:
+        diferentes |= (juntas[f'{coluna}_antes'] != juntas[coluna]).to_numpy()
+    return {int(mes) for mes in juntas.loc[diferentes, 'mes'].unique()}
+
+class ReceitaMensal:
+    """Faturas agregadas por mês de faturamento × projeto × status × responsável
+
+    A primeira carga agrega todas as faturas; nas seguintes, uma marca por
+    mês e status (quantidade, valor e soma dos códigos de projeto) indica
+    quais meses mudaram e só esses são agregados de novo. As marcas só são
+    relidas quando o monitor avisa de mudança em receita/receita_pagamento
+    ou a cada `intervalo`; o responsável vem do projeto e uma mudança em
+    projeto/usuario só o reaplica, sem reler faturas. As séries por status e por
+    responsável são recalculadas a cada atualização, então o painel não
+    depende do volume de faturas. A base fica gravada em Parquet para não
+    ser refeita do zero quando o processo reinicia.
+    """
+
+    def __init__(self, pool, diretorio, intervalo=3600):
+        self.pool = pool
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.atualizado_em = None
+        self.duracao_atualizacao = None
+        self.meses_reagregados = 0
+        self.ultimo_erro = None
+        self._dados = None
+        self._responsaveis = None  # cod_projeto ordenado → responsável
+        self._recarregar_responsaveis = False
+        self._faturas_alteradas = False
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def iniciar(self):
+        """Lê a base gravada (se houver) e atualiza em segundo plano"""
+        threading.Thread(target=self._loop, name="receita-mensal", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def solicitar_atualizacao(self, alteracoes):
+        """Callback do monitor: faturas alteradas reagregam meses; projeto/usuario só o responsável"""
+        if 'projeto' in alteracoes or 'usuario' in alteracoes:
+            self._recarregar_responsaveis = True
+        if 'receita' in alteracoes or 'receita_pagamento' in alteracoes:
+            self._faturas_alteradas = True
+        if alteracoes.keys() & {'projeto', 'usuario', 'receita', 'receita_pagamento'}:
+            self._acordar.set()
+
+    def _loop(self):
+        try:
+            self.carregar()
+        except Exception as e:
+            self.ultimo_erro = f"base gravada ignorada: {e}"
+        periodica = True
+        while not self._parar.is_set():
+            try:
+                self.atualizar(reler_faturas=periodica or self._faturas_alteradas)
+            except Exception as e:
+                self.ultimo_erro = str(e)
+            periodica = not self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def _ler(self, template, params=()):
+        prazo = obter_prazos()[template]
+        sql = sql_com_prazo(QUERIES[template], prazo)
+        return self.pool.executar(lambda conn: _executar_preparado(self.pool, conn, template, sql, params, prazo),
+                                  timeout=prazo or None)
+
+    def _ler_marcas(self):
+        marcas = self._ler('receita_mensal_marcas')
+        return pd.DataFrame({
+            'mes': marcas['mes'].astype(np.int32),
+            'status': marcas['status'].astype(object).fillna('').astype(str),
+            'faturas': marcas['faturas'].astype(np.int64),
+            'valor': marcas['valor'].astype(np.float64).round(2),
+            'soma_projetos': marcas['soma_projetos'].astype(np.int64),
+        }).sort_values(['mes', 'status'], ignore_index=True)
+
+    def _agregar(self, primeiro, ultimo):
+        """Linhas mês × projeto × status dos meses de `primeiro` a `ultimo`"""
+        linhas = self._ler('receita_mensal', (_inicio_mes(primeiro), _inicio_mes(_mes_seguinte(ultimo))))
+        return pd.DataFrame({
+            'mes': linhas['mes'].astype(np.int32),
+            'cod_projeto': linhas['cod_projeto'].astype(np.int64),
+            'status': linhas['status'].astype(object).fillna('').astype(str),
+            'faturas': linhas['faturas'].astype(np.int64),
+            'valor': linhas['valor'].astype(np.float64),
+        })
+
+    def _ler_responsaveis(self):
+        projetos = self._ler('nomes_projetos')
+        self._responsaveis = (
+            projetos['cod_projeto'].to_numpy(np.int64),
+            projetos['responsavel'].astype(object).fillna(RESPONSAVEL_AUSENTE).to_numpy(),
+        )
+        self._recarregar_responsaveis = False
+
+    def _aplicar_responsaveis(self, linhas):
+        """Coluna responsavel a partir do cod_projeto (busca binária no mapa de projetos)"""
+        codigos, nomes = self._responsaveis
+        projetos = linhas['cod_projeto'].to_numpy()
+        responsaveis = np.full(len(projetos), RESPONSAVEL_AUSENTE, dtype=object)
+        if len(codigos):
+            posicoes = np.minimum(np.searchsorted(codigos, projetos), len(codigos) - 1)
+            encontrados = codigos[posicoes] == projetos
+            responsaveis[encontrados] = nomes[posicoes[encontrados]]
+        return linhas.assign(responsavel=pd.Categorical(responsaveis))
+
+    def atualizar(self, reler_faturas=True):
+        """Reagrega os meses com marca diferente e recalcula as séries
+
+        reler_faturas=False (só projeto/usuario mudaram) mantém as marcas e
+        as linhas e só reaplica o mapa de responsáveis.
+        """
+        inicio = time.time()
+        dados = self._dados
+        if reler_faturas or dados is None:
+            # Desmarca antes de ler: um aviso que chegue durante a leitura vale para a próxima
+            self._faturas_alteradas = False
+            try:
+                marcas = self._ler_marcas()
+                antigas = marcas.iloc[:0] if dados is None else dados['marcas']
+                alterados = _meses_alterados(antigas, marcas)
+                novas = [self._agregar(primeiro, ultimo) for primeiro, ultimo in _faixas_meses(alterados)]
+            except Exception:
+                self._faturas_alteradas = True
+                raise
+        else:
+            marcas, alterados, novas = dados['marcas'], [], []
+
+        # Mapa de responsáveis: na primeira vez, quando o monitor avisa de mudança em
+        # projeto/usuario ou quando aparece projeto que ainda não está nele
+        remapear = self._responsaveis is None or self._recarregar_responsaveis or any(
+            not np.isin(parte['cod_projeto'].to_numpy(), self._responsaveis[0]).all() for parte in novas)
+        if remapear:
+            anteriores = self._responsaveis
+            self._ler_responsaveis()
+            remapear = anteriores is None or any(
+                not np.array_equal(a, b) for a, b in zip(anteriores, self._responsaveis))
+
+        if dados is None or alterados or remapear:
+            partes = [] if dados is None else [dados['linhas'][~dados['linhas']['mes'].isin(alterados)]]
+            partes += novas if remapear else [self._aplicar_responsaveis(parte) for parte in novas]
+            linhas = pd.concat(partes, ignore_index=True) if partes else _linhas_vazias()
+            if remapear:
+                linhas = self._aplicar_responsaveis(linhas)
+            linhas['status'] = linhas['status'].astype('category')
+            linhas['responsavel'] = linhas['responsavel'].astype('category')
+            self._dados = {'linhas': linhas, 'marcas': marcas, **self._series(linhas)}
+            self._gravar()
+        self.meses_reagregados = len(alterados)
+        self.atualizado_em = datetime.now()
+        self.duracao_atualizacao = time.time() - inicio
+        self.ultimo_erro = None
+
+    @staticmethod
+    def _series(linhas):
+        """Totais por mês × status e por mês × responsável × status (o que o painel lê)"""
+        series = {}
+        for nome, dimensoes in (('por_status', ['mes', 'status']),
+                                ('por_responsavel', ['mes', 'responsavel', 'status'])):
+            serie = linhas.groupby(dimensoes, observed=True, sort=True)[['faturas', 'valor']].sum().reset_index()
+            serie['mes'] = serie['mes'].astype(np.int32)
+            series[nome] = serie
+        return series
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, f"{nome}.parquet")
+
+    def _gravar(self):
+        """Grava linhas e marcas (arquivo temporário + rename: nunca fica pela metade)"""
+        dados = self._dados
+        for nome in ('linhas', 'marcas'):
+            temporario = self._caminho(f"{nome}.tmp")
+            pq.write_table(pa.Table.from_pandas(dados[nome], preserve_index=False), temporario)
+            os.replace(temporario, self._caminho(nome))
+
+    def carregar(self):
+        """Retoma a base gravada; a próxima atualização só reagrega o que mudou desde então"""
+        if not all(os.path.exists(self._caminho(nome)) for nome in ('linhas', 'marcas')):
+            return False
+        linhas = pq.read_table(self._caminho('linhas')).to_pandas()
+        marcas = pq.read_table(self._caminho('marcas')).to_pandas()
+        marcas['status'] = marcas['status'].astype(str)
+        self._dados = {'linhas': linhas, 'marcas': marcas, **self._series(linhas)}
+        self.atualizado_em = datetime.fromtimestamp(os.path.getmtime(self._caminho('linhas')))
+        return True
+
+    def meses(self):
+        """Meses AAAAMM com faturas (vazio enquanto a primeira carga não termina)"""
+        dados = self._dados
+        if dados is None or not len(dados['por_status']):
+            return []
+        return meses_entre(int(dados['por_status']['mes'].iloc[0]), int(dados['por_status']['mes'].iloc[-1]))
+
+    def status(self):
+        dados = self._dados
+        return [] if dados is None else sorted(dados['por_status']['status'].unique())
+
+    def serie(self, dimensao, primeiro=None, ultimo=None, status=None, maiores=None):
+        """Valor e faturas por mês × `dimensao` ('status' ou 'responsavel'), com o mês como data
+
+        Com `maiores`, só os responsáveis de maior valor no período.
+        """
+        dados = self._dados
+        if dados is None:
+            return None
+        serie = dados['por_status' if dimensao == 'status' else 'por_responsavel']
+        filtro = np.ones(len(serie), dtype=bool)
+        if primeiro is not None:
+            filtro &= serie['mes'].to_numpy() >= primeiro
+        if ultimo is not None:
+            filtro &= serie['mes'].to_numpy() <= ultimo
+        if status is not None:
+            filtro &= serie['status'].isin(status).to_numpy()
+        serie = serie[filtro]
+        if maiores:
+            codigos = serie[dimensao].cat.codes.to_numpy()
+            totais = np.bincount(codigos, weights=serie['valor'].to_numpy(),
+                                 minlength=len(serie[dimensao].cat.categories))
+            serie = serie[np.isin(codigos, np.argsort(-totais, kind='stable')[:maiores])]
+        if dimensao != 'status':
+            serie = serie.groupby(['mes', dimensao], observed=True, sort=True)[['faturas', 'valor']].sum().reset_index()
+        meses = serie['mes'].to_numpy()
+        return serie.assign(mes=pd.to_datetime({'year': meses // 100, 'month': meses % 100, 'day': 1}),
+                            **{dimensao: serie[dimensao].astype(str)})
+
+    def metricas(self):
+        dados = self._dados
+        return {
+            'linhas': 0 if dados is None else len(dados['linhas']),
+            'meses': 0 if dados is None else dados['marcas']['mes'].nunique(),
+            'meses_reagregados': self.meses_reagregados,
+            'atualizado_em': self.atualizado_em,
+            'duracao_s': self.duracao_atualizacao,
+        }
+
+@recurso_compartilhado
+def obter_receita_mensal(_pool):
+    """Receita mensal consolidada, configurada na seção [receita_mensal] dos secrets"""
+    cfg = ler_config("receita_mensal")
+    receita = ReceitaMensal(
+        _pool,
+        diretorio=cfg.get("diretorio") or os.path.join(tempfile.gettempdir(), "netproject_receita_mensal"),
+        intervalo=float(cfg.get("intervalo", 3600)),
+    )
+    if cfg.get("ativo", True):
+        receita.iniciar()
+        obter_monitor(_pool).assinar(receita.solicitar_atualizacao)
+    return receita
+
+# ============================================================================
+# BUSCA APROXIMADA DE NOMES (TF-IDF de n-gramas de caracteres)
+# ============================================================================
+
+class IndiceNgramas:
+    """Vetores TF-IDF de n-gramas de caracteres com índice invertido em NumPy
+
+    As listas de cada n-grama ficam em arrays contíguos no formato CSR
+    (documentos e pesos de inicio[t] a inicio[t+1]); a busca soma só as
+    listas dos n-gramas da consulta, sem percorrer todos os documentos.
+    Documentos novos entram por adicionar() com o IDF da construção, até a
+    próxima reconstrução; a cada MAX_NOVOS eles são incorporados às listas CSR.
+    """
+
+    MAX_NOVOS = 256
+
+    def __init__(self, textos, n=3):
+        self.n = n
+        self._trava = threading.Lock()
+        self._vocabulario = {}
+        termos, docs = [], []
+        for doc, texto in enumerate(textos):
+            ids = [self._vocabulario.setdefault(g, len(self._vocabulario)) for g in self._ngramas(texto)]
+            termos.extend(ids)
+            docs.extend([doc] * len(ids))
+
+        total = max(len(textos), 1)
+        chaves, tf = np.unique(np.asarray(termos, dtype=np.int64) * total + np.asarray(docs, dtype=np.int64),
+                               return_counts=True)
+        termos, docs = chaves // total, chaves % total
+        df = np.bincount(termos, minlength=len(self._vocabulario))
+        self._idf = np.log((1 + len(textos)) / (1 + df)) + 1
+        pesos = (1 + np.log(tf)) * self._idf[termos]
+        normas = np.sqrt(np.bincount(docs, weights=pesos ** 2, minlength=len(textos)))
+        # np.unique devolve as chaves ordenadas por termo: as listas já saem no formato CSR
+        self._inicio = np.concatenate(([0], np.cumsum(df)))
+        self._docs = docs.astype(np.int32)
+        self._pesos = (pesos / normas[docs]).astype(np.float32)
+        self._total = len(textos)
+        self._novos = {}  # termo → ([docs], [pesos]) dos documentos adicionados depois da construção
+        self._pendentes = 0
+
+    def __len__(self):
+        return self._total
+
+    def _ngramas(self, texto):
+        """N-gramas de cada palavra com espaço nas bordas (' erp ' → ' er', 'erp', 'rp ')"""
+        n = self.n
+        return [f" {p} "[i:i + n] for p in normalizar_texto(texto).split() for i in range(len(p) + 3 - n)]
+
+    def _vetor(self, texto, novos=False):
+        """(termos, pesos normalizados); n-gramas fora do vocabulário só pesam na norma"""
+        contagem = {}
+        for g in self._ngramas(texto):
+            contagem[g] = contagem.get(g, 0) + 1
+        idf_ausente = math.log(1 + self._total) + 1
+        termos, pesos = [], []
+        for g, tf in contagem.items():
+            t = self._vocabulario.get(g)
+            if t is None and novos:
+                t = self._vocabulario[g] = len(self._vocabulario)
+                self._idf = np.append(self._idf, idf_ausente)
+            peso = (1 + math.log(tf)) * (self._idf[t] if t is not None else idf_ausente)
+            termos.append(t)
+            pesos.append(peso)
+        pesos = np.asarray(pesos)
+        norma = np.sqrt(pesos @ pesos) if len(pesos) else 0.0
+        conhecidos = [i for i, t in enumerate(termos) if t is not None]
+        return [termos[i] for i in conhecidos], (pesos[conhecidos] / norma if norma else pesos[conhecidos])
+
+    def adicionar(self, textos):
+        """Acrescenta documentos sem reconstruir o índice; retorna os ids deles"""
+        with self._trava:
+            ids = []
+            for texto in textos:
+                doc = self._total
+                for t, peso in zip(*self._vetor(texto, novos=True)):
+                    lista = self._novos.setdefault(t, ([], []))
+                    lista[0].append(doc)
+                    lista[1].append(peso)
+                self._total += 1
+                self._pendentes += 1
+                ids.append(doc)
+            if self._pendentes >= self.MAX_NOVOS:
+                self._compactar()
+            return ids
+
+    def _compactar(self):
+        """Incorpora os documentos adicionados às listas CSR (chamado com a trava)"""
+        termos_novos = np.concatenate([np.full(len(docs), t) for t, (docs, _) in self._novos.items()])
+        docs_novos = np.concatenate([docs for docs, _ in self._novos.values()]).astype(np.int32)
+        pesos_novos = np.concatenate([pesos for _, pesos in self._novos.values()]).astype(np.float32)
+        termos = np.concatenate([np.repeat(np.arange(len(self._inicio) - 1), np.diff(self._inicio)), termos_novos])
+        # Ordenação estável: em cada termo os documentos antigos (ids menores) continuam na frente
+        ordem = np.argsort(termos, kind='stable')
+        self._docs = np.concatenate([self._docs, docs_novos])[ordem]
+        self._pesos = np.concatenate([self._pesos, pesos_novos])[ordem]
+        self._inicio = np.concatenate(([0], np.cumsum(np.bincount(termos, minlength=len(self._vocabulario)))))
+        self._novos = {}
+        self._pendentes = 0
+
+    def buscar(self, texto, k=5, minimo=0.0):
+        """(ids, similaridades de cosseno) dos k documentos mais parecidos acima de `minimo`, em ordem decrescente"""
+        termos, pesos = self._vetor(texto)
+        termos = np.asarray(termos, dtype=np.int64)
+        with self._trava:
+            # Junta as listas dos termos construídos sem laço: posições inicio[t]..inicio[t+1] de cada termo
+            construidos = termos < len(self._inicio) - 1
+            inicio = self._inicio[termos[construidos]]
+            tamanhos = self._inicio[termos[construidos] + 1] - inicio
+            posicoes = np.repeat(inicio - np.cumsum(tamanhos) + tamanhos, tamanhos) + np.arange(tamanhos.sum())
+            partes_docs = [self._docs[posicoes]]
+            partes_pesos = [self._pesos[posicoes] * np.repeat(pesos[construidos], tamanhos)]
+            for t, q in zip(termos.tolist(), pesos):
+                if t in self._novos:
+                    docs, pesos_novos = self._novos[t]
+                    partes_docs.append(np.asarray(docs, dtype=np.int32))
+                    partes_pesos.append(np.asarray(pesos_novos) * q)
+
+        # Acumulador denso: bincount é mais barato que ordenar as listas para agrupar por documento
+        scores = np.bincount(np.concatenate(partes_docs), weights=np.concatenate(partes_pesos),
+                             minlength=self._total)
+        # O corte antes do argpartition deixa poucos candidatos para ordenar
+        candidatos = np.flatnonzero(scores > minimo)
+        if len(candidatos) > k:
+            candidatos = candidatos[np.argpartition(scores[candidatos], -k)[-k:]]
+        candidatos = candidatos[np.argsort(-scores[candidatos], kind='stable')]
+        return candidatos, scores[candidatos]
+
+# Palavras da pergunta que não fazem parte de nomes (intenções, artigos, interrogativos)
+PALAVRAS_FORA_DE_NOMES = frozenset(
+    palavra
+    for config in INTENCOES.values() for termo in config['palavras']
+    for palavra in normalizar_texto(termo).split()
+) | frozenset(
+    'o a os as um uma do da dos das de no na nos nas em e para por com qual quais quem como '
+    'me mostre mostrar ver sobre esta estao ha tem projetos total geral detalhes informacoes'.split()
+)
+
+# Palavras das intenções também casam como prefixo (faturas, atrasados, alocados)
+PREFIXOS_INTENCOES = tuple(
+    normalizar_texto(termo) for config in INTENCOES.values() for termo in config['palavras']
+    if ' ' not in termo and len(termo) >= 4
+)
+
+def _texto_de_nome(pergunta):
+    """Pergunta sem as palavras que não fazem parte de nomes nem códigos de projeto"""
+    return ' '.join(p for p in normalizar_texto(pergunta).split()
+                    if p not in PALAVRAS_FORA_DE_NOMES and not p.startswith(PREFIXOS_INTENCOES)
+                    and not (p.isdigit() and 4 <= len(p) <= 6))
+
+def _agrupar_nome(posicoes, nomes, codigos, nome, cod_projeto):
+    """Associa o projeto ao nome (nomes iguais após normalizar viram um documento); True se o nome é novo"""
+    chave = normalizar_texto(nome or '')
+    if not chave:
+        return False
+    i = posicoes.get(chave)
+    if i is not None:
+        codigos[i].append(cod_projeto)
+        return False
+    posicoes[chave] = len(nomes)
+    nomes.append(nome)
+    codigos.append([cod_projeto])
+    return True
+
+class BuscaNomes:
+    """Resolve nomes de projeto ou de responsável citados na pergunta para cod_projeto
+
+    Mantém um IndiceNgramas para os nomes de projeto e outro para os de
+    responsável, carregados em segundo plano. Projetos novos (avisados pelo
+    monitor de alterações) entram de forma incremental; a carga completa é
+    refeita periodicamente ou quando um projeto existente ou um usuário muda.
+    """
+
+    def __init__(self, pool, intervalo=3600, limiar=0.5, margem=0.02, max_candidatos=5):
+        self.pool = pool
+        self.intervalo = intervalo
+        self.limiar = limiar
+        self.margem = margem
+        self.max_candidatos = max_candidatos
+        self.carregado_em = None
+        self.ultimo_erro = None
+        self._dados = None
+        self._reconstruir = False
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+
+    def iniciar(self):
+        """Carrega em segundo plano e agenda as recargas"""
+        threading.Thread(target=self._loop, name="busca-nomes", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def solicitar_atualizacao(self, alteracoes):
+        """Callback do monitor: projetos novos entram no índice, demais mudanças o reconstroem
+
+        Sem a lista de projetos alterados (None: UPDATE ou DELETE sem coluna de
+        atualização configurada) não há como saber se só houve inserções.
+        """
+        if 'usuario' not in alteracoes and 'projeto' not in alteracoes:
+            return
+        dados = self._dados
+        projetos = alteracoes.get('projeto')
+        if ('usuario' in alteracoes or ('projeto' in alteracoes and projetos is None)
+                or (dados is not None and projetos and min(projetos) <= dados['ultimo_codigo'])):
+            self._reconstruir = True
+        self._acordar.set()
+
+    def _loop(self):
+        completa = True
+        while not self._parar.is_set():
+            try:
+                if completa or self._dados is None:
+                    self.atualizar()
+                else:
+                    self.adicionar_novos()
+            except Exception as e:
+                self.ultimo_erro = str(e)
+            completa = not self._acordar.wait(self.intervalo) or self._reconstruir
+            self._acordar.clear()
+            self._reconstruir = False
+
+    def _ler(self, template, params=()):
+        def ler(conn):
+            with _cursor_com_prazo(self.pool, conn, template) as (cursor, sql):
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+        return self.pool.executar(ler, timeout=obter_prazos()[template] or None)
+
+    def atualizar(self):
+        """Reconstrói os dois índices a partir de todos os projetos"""
+        projetos = {'posicoes': {}, 'nomes': [], 'codigos': []}
+        responsaveis = {'posicoes': {}, 'nomes': [], 'codigos': []}
+        nome_projeto = {}
+        ultimo = 0
+        for cod_projeto, nom_projeto, responsavel in self._ler('nomes_projetos'):
+            nome_projeto[cod_projeto] = nom_projeto
+            ultimo = max(ultimo, cod_projeto)
+            for grupo, nome in ((projetos, nom_projeto), (responsaveis, responsavel)):
+                _agrupar_nome(grupo['posicoes'], grupo['nomes'], grupo['codigos'], nome, cod_projeto)
+        for grupo in (projetos, responsaveis):
+            grupo['indice'] = IndiceNgramas(grupo['nomes'])
+
+        self._dados = {'projeto': projetos, 'responsavel': responsaveis,
+                       'nome_projeto': nome_projeto, 'ultimo_codigo': ultimo}
+        self.carregado_em = datetime.now()
+        self.ultimo_erro = None
+
+    def adicionar_novos(self):
+        """Acrescenta os projetos com código maior que o último indexado"""
+        dados = self._dados
+        novos = self._ler('nomes_projetos_novos', (dados['ultimo_codigo'],))
+        for cod_projeto, nom_projeto, responsavel in novos:
+            dados['nome_projeto'][cod_projeto] = nom_projeto
+            for tipo, nome in (('projeto', nom_projeto), ('responsavel', responsavel)):
+                grupo = dados[tipo]
+                if _agrupar_nome(grupo['posicoes'], grupo['nomes'], grupo['codigos'], nome, cod_projeto):
+                    grupo['indice'].adicionar([nome])
+            dados['ultimo_codigo'] = max(dados['ultimo_codigo'], cod_projeto)
+        return len(novos)
+
+    def metricas(self):
+        dados = self._dados
+        if dados is None:
+            return {'projetos': 0, 'nomes_projeto': 0, 'nomes_responsavel': 0}
+        return {'projetos': len(dados['nome_projeto']),
+                'nomes_projeto': len(dados['projeto']['nomes']),
+                'nomes_responsavel': len(dados['responsavel']['nomes'])}
+
+    def resolver(self, pergunta):
+        """Projeto citado pelo nome na pergunta, ou None se nenhum nome for parecido o bastante
+
+        Retorna tipo ('projeto'/'responsavel'), nome casado, similaridade,
+        candidatos [(cod_projeto, nom_projeto)] e cod_projeto (só quando há
+        um único candidato).
+        """
+        dados = self._dados
+        texto = _texto_de_nome(pergunta)
+        if dados is None or not texto:
+            return None
+
+        melhor = None
+        for tipo in ('projeto', 'responsavel'):
+            grupo = dados[tipo]
+            docs, scores = grupo['indice'].buscar(texto, self.max_candidatos, minimo=self.limiar - self.margem)
+            if len(docs) and scores[0] >= self.limiar and (melhor is None or scores[0] > melhor[2][0]):
+                melhor = (tipo, docs, scores)
+        if melhor is None:
+            return None
+
+        tipo, docs, scores = melhor
+        grupo = dados[tipo]
+        # Nomes praticamente empatados com o melhor também são candidatos
+        codigos = [cod for doc in docs[scores >= scores[0] - self.margem] for cod in grupo['codigos'][doc]]
+        return {
+            'tipo': tipo,
+            'nome': grupo['nomes'][docs[0]],
+            'similaridade': float(scores[0]),
+            'cod_projeto': codigos[0] if len(codigos) == 1 else None,
+            'total_candidatos': len(codigos),
+            'candidatos': [(cod, dados['nome_projeto'].get(cod)) for cod in codigos[:self.max_candidatos]],
+        }
+
+@recurso_compartilhado
+def obter_busca_nomes(_pool):
+    """Índice de nomes (um por processo, atualizado em segundo plano)"""
+    cfg = ler_config("busca_nomes")
+    busca = BuscaNomes(_pool, intervalo=float(cfg.get("intervalo", 3600)),
+                       limiar=float(cfg.get("limiar", 0.5)))
+    if cfg.get("ativo", True):
+        busca.iniciar()
+        obter_monitor(_pool).assinar(busca.solicitar_atualizacao)
+    return busca
+
+# ============================================================================
+# RÉPLICA ANALÍTICA (Parquet + DuckDB, opcional)
+# ============================================================================
+
+# Agregações sobre tabelas inteiras que podem sair da réplica (dialeto DuckDB, mesmas colunas)
+QUERIES_REPLICA = {
+    'projetos_atrasados': """
+    SELECT 
+        p.cod_projeto,
+        p.nom_projeto,
+        u.nom_usuario as responsavel,
+        p.dth_prevista as data_prevista,
+        date_diff('day', CAST(p.dth_prevista AS DATE), current_date) as dias_atraso,
+        COALESCE(SUM(r.total_valor_bruto), 0) as receita_total
+    FROM projeto p
+    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+    LEFT JOIN receita r ON p.cod_projeto = r.cod_projeto
+    WHERE p.dth_prevista < localtimestamp
+      AND p.flg_status = 1
+    GROUP BY p.cod_projeto, p.nom_projeto, u.nom_usuario, p.dth_prevista
+    HAVING dias_atraso > 0
+    ORDER BY dias_atraso DESC
+    LIMIT 10
+    """,
+
+    'resumo_geral': QUERIES['resumo_geral'],
+}
+
+# Tipos do mysql.connector → tipos das colunas em Parquet
+TIPOS_ARROW = {
+    'TINY': pa.int64(), 'SHORT': pa.int64(), 'LONG': pa.int64(), 'INT24': pa.int64(),
+    'LONGLONG': pa.int64(), 'YEAR': pa.int64(),
+    'FLOAT': pa.float64(), 'DOUBLE': pa.float64(), 'DECIMAL': pa.float64(), 'NEWDECIMAL': pa.float64(),
+    'DATE': pa.date32(), 'DATETIME': pa.timestamp('us'), 'TIMESTAMP': pa.timestamp('us'),
+}
+
+def _tipo_arrow(tipo_mysql):
+    """Tipo Arrow de uma coluna do cursor (None se o driver não informar: inferido dos dados)"""
+    if tipo_mysql is None:
+        return None
+    return TIPOS_ARROW.get(mysql.connector.FieldType.get_info(tipo_mysql), pa.string())
+
+# Chave primária das tabelas copiadas (para aplicar só as linhas alteradas)
+CHAVES_REPLICA = {
+    'projeto': 'cod_projeto',
+    'usuario': 'cod_usuario',
+    'receita': 'cod_receita',
+    'receita_pagamento': 'cod_receita_pagamento',
+}
+
+class ReplicaAnalitica:
+    """Cópia colunar local das tabelas lidas pelo app, consultada pelo DuckDB
+
+    Agregações sobre as tabelas inteiras (QUERIES_REPLICA) rodam aqui em vez
+    do MySQL transacional; consultas pontuais continuam no MySQL. Cada
+    sincronização grava uma nova versão dos arquivos Parquet e troca a
+    conexão DuckDB de uma vez. Alterações detectadas pelo monitor recopiam
+    só as tabelas alteradas (as demais são reaproveitadas da versão
+    anterior) e, com coluna de atualização e chave primária, só as linhas
+    com a coluna a partir da última cópia. A cada `intervalo` segundos tudo
+    é copiado de novo, o que também pega DELETEs que o incremental não vê.
+    Se a cópia tiver mais de `max_atraso` segundos (ou ainda não existir),
+    tudo vai para o MySQL.
+    """
+
+    TAMANHO_LOTE = 50_000
+
+    def __init__(self, pool, cache, diretorio, intervalo=3600, max_atraso=7200, intervalo_minimo=300,
+                 colunas_atualizacao=None):
+        self.pool = pool
+        self.cache = cache
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.max_atraso = max_atraso
+        self.intervalo_minimo = intervalo_minimo
+        self.colunas = dict(colunas_atualizacao or {})
+        self.sincronizado_em = None
+        self.copia_completa_em = None
+        self.duracao_sincronizacao = None
+        self.tabelas_copiadas = {}  # tabela → 'completa' ou 'incremental' na última sincronização
+        self.ultimo_erro = None
+        self._con = None
+        self._versoes = []  # (diretório, conexão DuckDB) da versão atual e da anterior
+        self._arquivos = {}  # tabela → Parquet da versão atual
+        self._marcas = {}  # tabela → MAX da coluna de atualização na última cópia
+        self._pendentes = set()  # tabelas alteradas desde a última cópia
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def iniciar(self):
+        threading.Thread(target=self._loop, name="replica-analitica", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def solicitar_atualizacao(self, alteracoes):
+        """Antecipa a próxima cópia (o monitor detectou alteração nessas tabelas)"""
+        with self._lock:
+            self._pendentes.update(alteracoes)
+        self._acordar.set()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            inicio = time.time()
+            try:
+                self.sincronizar()
+            except Exception as e:
+                self.ultimo_erro = str(e)
+            self._acordar.wait(max(0.0, self.intervalo - (time.time() - (self.copia_completa_em or 0))))
+            self._acordar.clear()
+            # Alterações seguidas não disparam uma cópia atrás da outra
+            self._parar.wait(max(0.0, self.intervalo_minimo - (time.time() - inicio)))
+
+    def atualizada(self):
+        """Se há cópia e ela está dentro do limite de defasagem"""
+        return self._con is not None and time.time() - self.sincronizado_em <= self.max_atraso
+
+    def _copiar(self, conn, tabela, caminho, filtro="", params=()):
+        """SELECT * da tabela (opcionalmente filtrado) → arquivo Parquet, em lotes"""
+        cursor = conn.cursor()
+        escritor = None
+        try:
+            cursor.execute(f"SELECT * FROM {tabela}{filtro}", params)
+            colunas = list(cursor.column_names)
+            tipos = [_tipo_arrow(d[1]) for d in cursor.description]
+            while True:
+                lote = cursor.fetchmany(self.TAMANHO_LOTE)
+                if not lote:
+                    break
+                arrays = []
+                for valores, tipo in zip(colunas_objeto(lote), tipos):
+                    array = pa.array(valores)
+                    arrays.append(array if tipo is None else array.cast(tipo))
+                dados = pa.Table.from_arrays(arrays, names=colunas)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(caminho, dados.schema)
+                escritor.write_table(dados.cast(escritor.schema))
+            if escritor is None:  # tabela vazia: arquivo só com o schema
+                schema = pa.schema([(c, t or pa.string()) for c, t in zip(colunas, tipos)])
+                pq.write_table(schema.empty_table(), caminho)
+        finally:
+            if escritor is not None:
+                escritor.close()
+            cursor.close()
+
+    def _marca(self, conn, tabela):
+        """(COUNT(*), MAX da coluna de atualização) da tabela no MySQL"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT COUNT(*), MAX({self.colunas[tabela]}) FROM {tabela}")
+            return tuple(cursor.fetchone())
+        finally:
+            cursor.close()
+
+    def _copiar_tabela(self, tabela, caminho, completa):
+        """Grava a tabela em `caminho`; retorna 'completa' ou 'incremental'
+
+        Incremental: lê do MySQL só as linhas com a coluna de atualização a
+        partir da marca da cópia anterior e junta com o Parquet anterior
+        pela chave primária. Se a contagem não bater (houve DELETE), cai
+        para a cópia completa.
+        """
+        coluna, chave = self.colunas.get(tabela), CHAVES_REPLICA.get(tabela)
+        anterior, marca_anterior = self._arquivos.get(tabela), self._marcas.get(tabela)
+        if coluna:
+            total, marca = self.pool.executar(lambda conn: self._marca(conn, tabela))
+        if not completa and coluna and chave and anterior and marca_anterior is not None:
+            delta = caminho + ".delta"
+            self.pool.executar(lambda conn: self._copiar(conn, tabela, delta, f" WHERE {coluna} >= %s",
+                                                         (marca_anterior,)))
+            con = duckdb.connect()
+            try:
+                con.execute(f"""
+                    COPY (
+                        SELECT * FROM read_parquet('{anterior}')
+                        WHERE {chave} NOT IN (SELECT {chave} FROM read_parquet('{delta}'))
+                        UNION ALL BY NAME
+                        SELECT * FROM read_parquet('{delta}')
+                    ) TO '{caminho}' (FORMAT PARQUET)""")
+                linhas = con.execute(f"SELECT COUNT(*) FROM read_parquet('{caminho}')").fetchone()[0]
+            finally:
+                con.close()
+                os.remove(delta)
+            if linhas == total:
+                self._marcas[tabela] = marca
+                return 'incremental'
+            os.remove(caminho)
+        self.pool.executar(lambda conn: self._copiar(conn, tabela, caminho))
+        if coluna:
+            self._marcas[tabela] = marca
+        return 'completa'
+
+    def sincronizar(self, completa=None):
+        """Copia as tabelas alteradas para uma nova versão em Parquet e passa a consultá-la
+
+        completa=None: tudo na primeira vez e quando o `intervalo` venceu; só as
+        tabelas pendentes nas demais.
+        """
+        inicio = time.time()
+        if completa is None:
+            completa = self.copia_completa_em is None or inicio - self.copia_completa_em >= self.intervalo
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, set()
+        if not completa and not pendentes:
+            return
+        versao = tempfile.mkdtemp(prefix="v", dir=self.diretorio)
+        arquivos, marcas, copiadas = {}, dict(self._marcas), {}
+        con = duckdb.connect()
+        try:
+            for tabela in TABELAS_MONITORADAS:
+                caminho = os.path.join(versao, f"{tabela}.parquet")
+                if completa or tabela in pendentes or tabela not in self._arquivos:
+                    copiadas[tabela] = self._copiar_tabela(tabela, caminho, completa)
+                else:
+                    # Sem alteração: o arquivo da versão anterior entra na nova sem reler o MySQL
+                    try:
+                        os.link(self._arquivos[tabela], caminho)
+                    except OSError:
+                        shutil.copyfile(self._arquivos[tabela], caminho)
+                arquivos[tabela] = caminho
+                con.execute(f"CREATE VIEW {tabela} AS SELECT * FROM read_parquet('{caminho}')")
+        except BaseException:
+            con.close()
+            shutil.rmtree(versao, ignore_errors=True)
+            self._marcas = marcas
+            with self._lock:
+                self._pendentes |= pendentes
+            raise
+
+        with self._lock:
+            self._con = con
+            self._arquivos = arquivos
+            self.sincronizado_em = inicio
+            if completa:
+                self.copia_completa_em = inicio
+            self.tabelas_copiadas = copiadas
+            self._versoes.append((versao, con))
+            # Mantém a versão anterior para consultas que ainda estejam lendo dela
+            antigas, self._versoes = self._versoes[:-2], self._versoes[-2:]
+        for antiga, con_antiga in antigas:
+            con_antiga.close()
+            shutil.rmtree(antiga, ignore_errors=True)
+        self.duracao_sincronizacao = time.time() - inicio
+        self.ultimo_erro = None
+        # Resultados dessas tabelas lidos da cópia anterior ficaram velhos
+        for tabela in pendentes:
+            self.cache.invalidar(tabela)
+
+    def consultar(self, template, params=()):
+        """Executa um template de QUERIES_REPLICA na cópia atual"""
+        with self._lock:
+            cursor = self._con.cursor()  # um cursor por chamada: seguro entre threads
+        try:
+            return cursor.execute(QUERIES_REPLICA[template].replace('%s', '?'), list(params)).df()
+        finally:
+            cursor.close()
+
+@recurso_compartilhado
+def obter_replica(_pool):
+    """Réplica analítica, configurada na seção [replica] dos secrets (desligada por padrão)"""
+    cfg = ler_config("replica")
+    if not cfg.get("ativo", False):
+        return None
+    if duckdb is None:
+        st.warning("⚠️ Réplica analítica ativa, mas o pacote `duckdb` não está instalado")
+        return None
+    replica = ReplicaAnalitica(
+        _pool, obter_cache(),
+        diretorio=cfg.get("diretorio") or os.path.join(tempfile.gettempdir(), "netproject_replica"),
+        intervalo=float(cfg.get("intervalo", 3600)),
+        max_atraso=float(cfg.get("max_atraso", 7200)),
+        intervalo_minimo=float(cfg.get("intervalo_minimo", 300)),
+        colunas_atualizacao=ler_config("invalidacao").get("colunas_atualizacao"),
+    ).iniciar()
+    obter_monitor(_pool).assinar(replica.solicitar_atualizacao)
+    # Fica no pool para que o roteamento funcione também nas threads de fundo
+    _pool.replica = replica
+    return replica
+
+# ============================================================================
+# ÍNDICES (diagnóstico e migração)
+# ============================================================================
+
+# Índices dos caminhos quentes: (tabela, nome, colunas de busca, colunas incluídas para cobrir a consulta)
+INDICES_RECOMENDADOS = [
+    ('receita', 'idx_receita_projeto_valor', ('cod_projeto',), ('cod_receita', 'total_valor_bruto')),
+    ('receita_pagamento', 'idx_pagamento_receita_status', ('cod_receita',), ('flg_status_fatura', 'vlr_bruto')),
+    ('DWDT_RECURSO_ALOCACAO', 'idx_alocacao_projeto_usuario', ('cod_projeto',),
+     ('cod_usuario', 'num_horas_aloc', 'num_horas_trab')),
+    ('projeto', 'idx_projeto_status_prevista', ('flg_status', 'dth_prevista'), ()),
+    ('receita_pagamento', 'idx_pagamento_faturamento', ('dth_faturamento',),
+     ('cod_receita', 'flg_status_fatura', 'vlr_bruto')),
+]
+
+# Agregados globais: varrer a tabela inteira é o plano esperado
+VARREDURA_ESPERADA = {'resumo_geral', 'snapshot_projetos', 'nomes_projetos', 'receita_mensal_marcas'}
+
+# Parâmetros de exemplo para o EXPLAIN dos templates que não recebem só o código do projeto
+PARAMS_EXEMPLO = {
+    'faturas_pagina': lambda cod: (cod, TAMANHO_PAGINA + 1),
+    'faturas_pagina_apos': lambda cod: (cod, datetime.now(), datetime.now(), 0, TAMANHO_PAGINA + 1),
+    'faturas_pagina_apos_sem_data': lambda cod: (cod, 0, TAMANHO_PAGINA + 1),
+    'alocacoes_pagina': lambda cod: (cod, TAMANHO_PAGINA + 1),
+    'alocacoes_pagina_apos': lambda cod: (cod, 0, 0, '', TAMANHO_PAGINA + 1),
+    'receita_mensal': lambda cod: (datetime(2024, 1, 1), datetime(2024, 2, 1)),
+    'projetos_atrasados_pagina': lambda cod: (TAMANHO_PAGINA + 1,),
+    'projetos_atrasados_pagina_apos': lambda cod: (datetime(2024, 1, 1), datetime(2024, 1, 1), 0, TAMANHO_PAGINA + 1),
+}
+
+def indices_existentes(cursor):
+    """{tabela: {índice: [colunas na ordem]}} do schema atual"""
+    cursor.execute("""
+        SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+    """)
+    indices = {}
+    for tabela, indice, coluna in cursor.fetchall():
+        indices.setdefault(tabela, {}).setdefault(indice, []).append(coluna)
+    return indices
+
+def indices_sem_uso(cursor):
+    """[(tabela, índice)] sem nenhuma leitura desde que o servidor subiu (None se indisponível)"""
+    try:
+        cursor.execute("""
+            SELECT OBJECT_NAME, INDEX_NAME
+            FROM performance_schema.table_io_waits_summary_by_index_usage
+            WHERE OBJECT_SCHEMA = DATABASE()
+              AND INDEX_NAME IS NOT NULL AND INDEX_NAME <> 'PRIMARY'
+              AND COUNT_STAR = 0
+        """)
+        return [(tabela, indice) for tabela, indice in cursor.fetchall() if tabela in TABELAS_MONITORADAS]
+    except Exception:
+        return None  # performance_schema desligado ou sem permissão
+
+def _situacao_indice(existentes, tabela, busca, incluidas):
+    """'ok' se algum índice cobre a consulta, 'parcial' se só serve para a busca, senão 'ausente'"""
+    colunas = list(busca) + list(incluidas)
+    situacao = 'ausente'
+    for atuais in existentes.get(tabela, {}).values():
+        if atuais[:len(colunas)] == colunas:
+            return 'ok'
+        if atuais[:len(busca)] == list(busca):
+            situacao = 'parcial'
+    return situacao
+
+def indices_redundantes(existentes):
+    """[(tabela, índice, coberto_por)]: índices cujas colunas são prefixo de outro índice"""
+    redundantes = []
+    for tabela, indices in existentes.items():
+        for nome, colunas in indices.items():
+            if nome == 'PRIMARY':
+                continue
+            for outro, maiores in indices.items():
+                if outro != nome and len(maiores) > len(colunas) and maiores[:len(colunas)] == colunas:
+                    redundantes.append((tabela, nome, outro))
+                    break
+    return redundantes
+
+def _resumir_plano(plano, esperada):
+    """Acessos e problemas de um EXPLAIN (MySQL ou EXPLAIN QUERY PLAN do SQLite)"""
+    acessos, problemas = [], []
+    derivadas = set()
+    for linha in plano:
+        if 'type' in linha:  # MySQL
+            tabela = linha.get('table') or ''
+            acessos.append(f"{tabela}: {linha['type']} ({linha.get('key') or 'sem índice'}) {linha.get('Extra') or ''}")
+            # ALL varre a tabela, index varre o índice inteiro; derived tables (<derivedN>) não contam
+            if linha['type'] in ('ALL', 'index') and not tabela.startswith('<') and not esperada:
+                problemas.append(f"varredura completa de {tabela} (~{linha.get('rows')} linhas)")
+        elif 'detail' in linha:  # SQLite
+            detalhe = linha['detail']
+            acessos.append(detalhe)
+            partes = detalhe.split()
+            if partes[0] in ('MATERIALIZE', 'CO-ROUTINE'):
+                derivadas.add(partes[-1])
+            elif partes[0] == 'SCAN' and partes[1] not in derivadas and not esperada:
+                problemas.append(f"varredura completa de {partes[1]}")
+    return acessos, problemas
+
+def diagnosticar_indices(pool):
+    """Índices recomendados (ok/parcial/ausente), sem uso, redundantes e planos de cada template"""
+    def ler(conn):
+        cursor = conn.cursor()
+        try:
+            existentes = indices_existentes(cursor)
+            sem_uso = indices_sem_uso(cursor)
+            cursor.execute("SELECT MIN(cod_projeto) FROM projeto")
+            cod = cursor.fetchone()[0] or 0
+            planos = {}
+            for template, sql in QUERIES.items():
+                if '{marcadores}' in sql:
+                    sql = _sql_lote(template, 1)
+                params = PARAMS_EXEMPLO[template](cod) if template in PARAMS_EXEMPLO else (cod,) * sql.count('%s')
+                try:
+                    plano = capturar_explain(conn, sql, params)
+                    acessos, problemas = _resumir_plano(plano, template in VARREDURA_ESPERADA)
+                    planos[template] = {'acessos': acessos, 'problemas': problemas}
+                except Exception as e:
+                    planos[template] = {'acessos': [], 'problemas': [f"EXPLAIN falhou: {e}"]}
+            return existentes, sem_uso, planos
+        finally:
+            cursor.close()
+
+    existentes, sem_uso, planos = pool.executar(ler)
+    recomendados = [
+        {'tabela': tabela, 'nome': nome, 'colunas': list(busca) + list(incluidas),
+         'situacao': _situacao_indice(existentes, tabela, busca, incluidas)}
+        for tabela, nome, busca, incluidas in INDICES_RECOMENDADOS
+    ]
+    return {'recomendados': recomendados, 'sem_uso': sem_uso,
+            'redundantes': indices_redundantes(existentes), 'planos': planos}
+
+def comando_criar_indice(indice, dialeto='mysql'):
+    """CREATE INDEX do índice recomendado (online no MySQL)"""
+    colunas = ', '.join(indice['colunas'])
+    if dialeto == 'sqlite':
+        return f"CREATE INDEX IF NOT EXISTS {indice['nome']} ON {indice['tabela']} ({colunas})"
+    return f"CREATE INDEX {indice['nome']} ON {indice['tabela']} ({colunas}) ALGORITHM=INPLACE LOCK=NONE"
+
+def gerar_migracao(diagnostico, dialeto='mysql'):
+    """Script idempotente que cria os índices recomendados ausentes ou que não cobrem a consulta"""
+    linhas = [f"-- Índices recomendados pelo diagnóstico de {datetime.now():%Y-%m-%d %H:%M}",
+              "-- Pode ser executado mais de uma vez: índices já existentes são ignorados", ""]
+    pendentes = [i for i in diagnostico['recomendados'] if i['situacao'] != 'ok']
+    for indice in pendentes:
+        linhas.append(f"-- {indice['tabela']} ({', '.join(indice['colunas'])}): {indice['situacao']}")
+        if dialeto == 'sqlite':
+            linhas += [comando_criar_indice(indice, dialeto) + ";", ""]
+            continue
+        # MySQL não tem CREATE INDEX IF NOT EXISTS: consulta o catálogo e prepara o comando
+        linhas += [
+            "SET @ddl := IF((SELECT COUNT(*) FROM information_schema.STATISTICS",
+            f"              WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{indice['tabela']}'",
+            f"                AND INDEX_NAME = '{indice['nome']}') = 0,",
+            f"    '{comando_criar_indice(indice)}',",
+            "    'DO 0');",
+            "PREPARE stmt FROM @ddl;",
+            "EXECUTE stmt;",
+            "DEALLOCATE PREPARE stmt;",
+            "",
+        ]
+    if not pendentes:
+        linhas.append("-- Nada a fazer: todos os índices recomendados existem")
+    return "\n".join(linhas) + "\n"
+
+def aplicar_indices(pool, diagnostico, dialeto='mysql'):
+    """Cria os índices pendentes do diagnóstico; retorna os nomes criados"""
+    pendentes = [i for i in diagnostico['recomendados'] if i['situacao'] != 'ok']
+
+    def criar(conn):
+        cursor = conn.cursor()
+        try:
+            existentes = indices_existentes(cursor)
+            criados = []
+            for indice in pendentes:
+                if indice['nome'] not in existentes.get(indice['tabela'], {}):
+                    cursor.execute(comando_criar_indice(indice, dialeto))
+                    criados.append(indice['nome'])
+            conn.commit()
+            return criados
+        finally:
+            cursor.close()
+
+    return pool.executar(criar)
+
+@recurso_compartilhado
+def obter_diagnostico_indices(_pool):
+    """Diagnóstico de índices feito uma vez por processo (seção [indices] dos secrets)"""
+    if not ler_config("indices").get("verificar", True):
+        return None
+    try:
+        return diagnosticar_indices(_pool)
+    except Exception as e:
+        return {'erro': str(e)}
+
+# ============================================================================
+# FIGURAS (memoizadas pelo conteúdo dos dados, categorias e pontos limitados)
+# ============================================================================
+
+MAX_CATEGORIAS = 20  # acima disso as menores categorias viram uma barra/fatia "Outros"
+MAX_PONTOS = 200  # datas por série antes de agregar por trimestre ou ano
+
+def hash_dados(df):
+    """Hash do conteúdo de um DataFrame (colunas, dtypes e valores; o índice não entra)"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(str(nome), str(tipo)) for nome, tipo in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def agrupar_maiores(df, categoria, valores, limite=MAX_CATEGORIAS, totais=None, categorias=None):
+    """Mantém as `limite - 1` categorias de maior `valores[0]` e soma o resto em "Outros (n)"
+
+    `df` pode trazer só as primeiras linhas de uma listagem maior (a
+    primeira página): `totais` ({coluna: soma de todas as linhas}) e
+    `categorias` (quantas existem) completam o "Outros" com o que não veio.
+    """
+    categorias = len(df) if categorias is None else int(categorias)
+    if categorias <= limite:
+        return df
+    maiores = df.nlargest(limite - 1, valores[0])
+    resto = {coluna: [(df[coluna].sum() if totais is None else totais[coluna]) - maiores[coluna].sum()]
+             for coluna in valores}
+    outros = pd.DataFrame({categoria: [f"Outros ({categorias - len(maiores)})"], **resto})
+    return pd.concat([maiores[[categoria, *valores]].astype({categoria: str}), outros], ignore_index=True)
+
+PERIODOS = (('M', 'Mês'), ('Q', 'Trimestre'), ('Y', 'Ano'))
+
+def reduzir_pontos(df, x, por, valores, max_pontos=MAX_PONTOS):
+    """(df, período): soma `valores` por trimestre ou ano se a série tem mais de `max_pontos` datas"""
+    for frequencia, periodo in PERIODOS:
+        periodos = df[x].dt.to_period(frequencia)
+        if periodos.nunique() <= max_pontos or frequencia == PERIODOS[-1][0]:
+            break
+    if frequencia == 'M':
+        return df, periodo
+    reduzido = (df.assign(**{x: periodos.dt.start_time})
+                .groupby([x, *por], observed=True, sort=True)[valores].sum().reset_index())
+    return reduzido, periodo
+
+class CacheFiguras:
+    """Figuras Plotly prontas por construtor + argumentos + hash do DataFrame de origem
+
+    Reruns e respostas com os mesmos dados reaproveitam a figura em vez de
+    refazer o px.* (validação e montagem dos traces). A chave é o
+    conteúdo, não a identidade do DataFrame: um resultado relido do cache
+    ou recarregado sem mudanças cai na mesma entrada. As figuras são
+    compartilhadas entre sessões e não devem ser alteradas depois de
+    prontas; ajustes de layout vão em `layout`.
+    """
+
+    def __init__(self, max_entradas=256):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._figuras = OrderedDict()
+        self._contadores = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def figura(self, construtor, dados, layout=None, **argumentos):
+        """construtor(dados, **argumentos), com update_layout(**layout), montada uma vez por conteúdo"""
+        chave = (construtor.__module__, construtor.__qualname__, hash_dados(dados),
+                 repr(sorted(argumentos.items())), repr(sorted((layout or {}).items())))
+        with self._lock:
+            fig = self._figuras.get(chave)
+            if fig is not None:
+                self._figuras.move_to_end(chave)
+                self._contadores['hits'] += 1
+                return fig
+            self._contadores['misses'] += 1
+        fig = construtor(dados, **argumentos)
+        if layout:
+            fig.update_layout(**layout)
+        with self._lock:
+            self._figuras[chave] = fig
+            while len(self._figuras) > self.max_entradas:
+                self._figuras.popitem(last=False)
+                self._contadores['evictions'] += 1
+        return fig
+
+    def metricas(self):
+        with self._lock:
+            return {'entradas': len(self._figuras), **self._contadores}
+
+@recurso_compartilhado
+def obter_figuras():
+    """Cache de figuras, configurado na seção [figuras] dos secrets"""
+    return CacheFiguras(max_entradas=int(ler_config("figuras").get("max_entradas", 256)))
+
 # ============================================================================
 # CAMADA 4: GERAÇÃO (GENERATION - do notebook)
 # ============================================================================
 
-def gerar_resposta(interpretacao, resultado):
-    """Gera resposta formatada"""
+@medir_camada('figuras')
+def figuras_resposta(interpretacao, resultado):
+    """Figuras da resposta que não dependem da página exibida: {nome: figura}"""
+    if not resultado['sucesso']:
+        return {}
+    intencao = interpretacao['intencao']
+    dados = resultado['dados']
+    figuras = {}
+    cache = obter_figuras()
+    if intencao == 'CONSULTA_RECEITA' and 'total_projetos' not in dados.columns:
+        proj = dados.iloc[0]
+        distribuicao = pd.DataFrame({
+            'status': ['Pago', 'Programado', 'Pendente'],
+            'valor': [
+                proj['receita_paga'],
+                proj['receita_programada'],
+                max(0, proj['receita_total'] - proj['receita_paga'] - proj['receita_programada'])
+            ],
+        })
+        figuras['distribuicao'] = cache.figura(
+            px.pie, distribuicao, values='valor', names='status', color='status',
+            color_discrete_map={'Pago': '#28a745', 'Programado': '#ffc107', 'Pendente': '#dc3545'},
+            title="Distribuição da Receita")
+    elif intencao == 'CONSULTA_ALOCACAO':
+        # A primeira página já vem ordenada por horas: maiores alocações + "Outros" pelo resumo
+        primeira, _ = resultado['paginas'].pagina()
+        if primeira is not None and len(primeira) > 0:
+            resumo = dados.iloc[0]
+            equipe = agrupar_maiores(primeira, 'nom_usuario', ['horas_alocadas', 'horas_trabalhadas'],
+                                     totais=resumo, categorias=resumo['pessoas'])
+            figuras['horas_por_pessoa'] = cache.figura(
+                px.bar, equipe, x='nom_usuario', y=['horas_alocadas', 'horas_trabalhadas'],
+                title="Horas por Pessoa",
+                labels={'nom_usuario': 'Pessoa', 'value': 'Horas'},
+                barmode='group')
+    elif intencao == 'CONSULTA_FATURA':
+        figuras['por_status'] = cache.figura(
+            px.pie, agrupar_maiores(dados, 'status', ['sum', 'count']), values='sum', names='status',
+            title='Valor Total por Status')
+    return figuras
+
+@medir_camada('geracao')
+def gerar_resposta(interpretacao, resultado, figuras=None):
+    """Gera resposta formatada (com as figuras já montadas, se vierem do cache de respostas)"""
     if not resultado['sucesso']:
         st.error(f"⚠️ {resultado['erro']}")
         return
     
     intencao = interpretacao['intencao']
     dados = resultado['dados']
+    if figuras is None:
+        figuras = figuras_resposta(interpretacao, resultado)
+    avisar_obsoleto(dados)
     
     if intencao == 'PROJETOS_ATRASADOS':
         st.subheader("📊 Projetos Atrasados")
-        st.write(f"Encontrados **{len(dados)}** projetos atrasados:")
+        st.write(f"Encontrados **{int(dados['total'].iloc[0]):,}** projetos atrasados, do mais atrasado para o menos:")
         
-        for _, proj in dados.iterrows():
-            with st.expander(f"🔴 {proj['nom_projeto']} - {proj['dias_atraso']} dias de atraso"):
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Código", f"{proj['cod_projeto']}")
-                col2.metric("Dias de Atraso", f"{proj['dias_atraso']}")
-                col3.metric("Receita", f"R$ {proj['receita_total']:,.2f}")
-                st.write(f"**Responsável:** {proj['responsavel']}")
-                st.write(f"**Previsão:** {proj['data_prevista']}")
+        # Uma tabela por página (virtualizada no navegador), formatada por coluna
+        renderizar_paginas(resultado['paginas'], "atrasados", formatar=formatar_atrasados,
+                           colunas=COLUNAS_ATRASADOS)
     
     elif intencao == 'CONSULTA_PROJETO':
         proj = dados.iloc[0]
@@ -422,38 +3837,27 @@ def gerar_resposta(interpretacao, resultado):
             col3.metric("Programado", f"R$ {proj['receita_programada']:,.2f}")
             
             # Gráfico
-            fig = go.Figure(data=[go.Pie(
-                labels=['Pago', 'Programado', 'Pendente'],
-                values=[
-                    proj['receita_paga'],
-                    proj['receita_programada'],
-                    max(0, proj['receita_total'] - proj['receita_paga'] - proj['receita_programada'])
-                ],
-                marker_colors=['#28a745', '#ffc107', '#dc3545']
-            )])
-            fig.update_layout(title="Distribuição da Receita")
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(figuras['distribuicao'], use_container_width=True)
     
     elif intencao == 'CONSULTA_ALOCACAO':
         st.subheader(f"👥 Equipe Alocada - Projeto {interpretacao['cod_projeto']}")
-        st.write(f"**{len(dados)}** pessoas alocadas:")
+        resumo = dados.iloc[0]
+        st.write(f"**{int(resumo['pessoas'])}** pessoas alocadas "
+                 f"({resumo['horas_alocadas']:,.0f} h alocadas, {resumo['horas_trabalhadas']:,.0f} h trabalhadas):")
         
-        # Tabela
-        st.dataframe(dados, use_container_width=True)
+        # Tabela (página atual)
+        renderizar_paginas(resultado['paginas'], f"alocacoes_{interpretacao['cod_projeto']}")
         
-        # Gráfico
-        fig = px.bar(dados, x='nom_usuario', y=['horas_alocadas', 'horas_trabalhadas'],
-                     title="Horas por Pessoa",
-                     labels={'nom_usuario': 'Pessoa', 'value': 'Horas'},
-                     barmode='group')
-        st.plotly_chart(fig, use_container_width=True)
+        # Gráfico (equipe toda: maiores alocações + "Outros")
+        if 'horas_por_pessoa' in figuras:
+            st.plotly_chart(figuras['horas_por_pessoa'], use_container_width=True)
     
     elif intencao == 'CONSULTA_FATURA':
         st.subheader(f"🧾 Faturas - Projeto {interpretacao['cod_projeto']}")
-        st.write(f"**{len(dados)}** faturas encontradas:")
+        st.write(f"**{int(dados['count'].sum())}** faturas encontradas:")
         
-        # Agrupar por status
-        por_status = dados.groupby('status')['valor'].agg(['count', 'sum']).reset_index()
+        # Resumo por status (agregado no banco)
+        por_status = dados
         
         col1, col2 = st.columns(2)
         with col1:
@@ -461,18 +3865,678 @@ def gerar_resposta(interpretacao, resultado):
             st.dataframe(por_status, use_container_width=True)
         
         with col2:
-            fig = px.pie(por_status, values='sum', names='status', 
-                        title='Valor Total por Status')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(figuras['por_status'], use_container_width=True)
         
-        # Lista completa
+        # Lista completa, paginada
         with st.expander("Ver todas as faturas"):
-            st.dataframe(dados, use_container_width=True)
+            renderizar_paginas(resultado['paginas'], f"faturas_{interpretacao['cod_projeto']}")
+
+def _registros(df):
+    """DataFrame → lista de dicts serializável em JSON (datas em ISO, NaN → null)"""
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+def gerar_resposta_dados(interpretacao, resultado, apos=None):
+    """Mesma resposta de gerar_resposta como dict serializável, sem chamadas st.*
+
+    Listagens paginadas trazem a página que começa depois da chave `apos`
+    (a primeira se None) e a chave `proxima` para continuar.
+    """
+    intencao = interpretacao['intencao']
+    resposta = {
+        'sucesso': resultado['sucesso'],
+        'intencao': intencao,
+        'cod_projeto': interpretacao['cod_projeto'],
+    }
+    if interpretacao.get('projeto_por_nome'):
+        resposta['projeto_por_nome'] = interpretacao['projeto_por_nome']
+    if not resultado['sucesso']:
+        resposta['erro'] = resultado['erro']
+        return resposta
+
+    dados = resultado['dados']
+    if intencao == 'PROJETOS_ATRASADOS':
+        resposta['titulo'] = "Projetos Atrasados"
+        resposta['total_atrasados'] = int(dados['total'].iloc[0])
+
+    elif intencao == 'CONSULTA_PROJETO':
+        proj = _registros(dados)[0]
+        proj['dias_atraso'] = max(proj['dias_atraso'] or 0, 0)
+        resposta['titulo'] = f"Projeto {proj['cod_projeto']}: {proj['nom_projeto']}"
+        resposta['projeto'] = proj
+        resposta['atrasado'] = proj['dias_atraso'] > 0
+
+    elif intencao == 'CONSULTA_RECEITA':
+        rec = _registros(dados)[0]
+        resposta['receita'] = rec
+        if 'total_projetos' in dados.columns:
+            resposta['titulo'] = "Receita Total - Todos os Projetos"
+        else:
+            resposta['titulo'] = f"Receita do Projeto {rec['cod_projeto']}"
+            resposta['distribuicao'] = {
+                'pago': rec['receita_paga'],
+                'programado': rec['receita_programada'],
+                'pendente': max(0, rec['receita_total'] - rec['receita_paga'] - rec['receita_programada']),
+            }
+
+    elif intencao == 'CONSULTA_ALOCACAO':
+        resposta['titulo'] = f"Equipe Alocada - Projeto {interpretacao['cod_projeto']}"
+        resposta['resumo'] = _registros(dados)[0]
+
+    elif intencao == 'CONSULTA_FATURA':
+        resposta['titulo'] = f"Faturas - Projeto {interpretacao['cod_projeto']}"
+        resposta['total_faturas'] = int(dados['count'].sum())
+        resposta['por_status'] = _registros(dados)
+
+    if resultado.get('paginas') is not None:
+        pagina, proxima = resultado['paginas'].pagina(apos)
+        resposta['pagina'] = [] if pagina is None else _registros(pagina)
+        resposta['proxima'] = proxima
+        consultados = [dados, pagina]
+    else:
+        consultados = [dados]
+    quando = obsoleto_desde(*consultados)
+    if quando is not None:
+        resposta['obsoleto_desde'] = quando.isoformat(timespec='seconds')
+    return resposta
+
+def formatar_atrasados(pagina):
+    """Página de projetos atrasados → tabela de exibição (nomes das colunas; tipos preservados para ordenar)"""
+    return pd.DataFrame({
+        'Código': pagina['cod_projeto'].to_numpy(),
+        'Projeto': pagina['nom_projeto'].to_numpy(),
+        'Responsável': pagina['responsavel'].astype(object).to_numpy(),
+        'Previsão': pd.to_datetime(pagina['data_prevista']).to_numpy(),
+        'Dias de Atraso': pagina['dias_atraso'].to_numpy(),
+        'Receita': pagina['receita_total'].to_numpy(),
+    })
+
+# Formato de exibição das colunas de formatar_atrasados (o valor continua numérico/data no grid)
+COLUNAS_ATRASADOS = {
+    'Previsão': st.column_config.DateColumn(format="DD/MM/YYYY"),
+    'Receita': st.column_config.NumberColumn(format="R$ %.2f"),
+}
+
+def renderizar_paginas(paginador, chave, formatar=None, colunas=None):
+    """Tabela paginada com navegação anterior/próxima; retorna o DataFrame da página
+
+    `formatar` (DataFrame → DataFrame) monta a tabela exibida a partir da página
+    e `colunas` é o column_config do st.dataframe.
+    """
+    # Pilha das chaves de início de cada página já visitada
+    pilha = st.session_state.setdefault(f"paginas_{chave}", [None])
+    pagina, proxima = paginador.pagina(pilha[-1])
+    if pagina is None:
+        return pd.DataFrame()
+    
+    avisar_obsoleto(pagina)
+    st.dataframe(pagina if formatar is None else formatar(pagina), use_container_width=True, hide_index=True,
+                 column_config=colunas)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    col1.button("◀ Anterior", key=f"anterior_{chave}", disabled=len(pilha) == 1,
+                on_click=pilha.pop)
+    col2.caption(f"Página {len(pilha)} · {len(pagina)} linhas")
+    col3.button("Próxima ▶", key=f"proxima_{chave}", disabled=proxima is None,
+                on_click=pilha.append, args=(proxima,))
+    return pagina
+
+def preparar_resposta(interpretacao, resultado):
+    """Resposta pronta para exibir: resultado, figuras já montadas e o JSON do serviço"""
+    return {
+        'resultado': resultado,
+        'figuras': figuras_resposta(interpretacao, resultado),
+        'dados': gerar_resposta_dados(interpretacao, resultado),
+        'gerada_em': time.time(),
+    }
+
+# ============================================================================
+# CACHE DE RESPOSTAS (intenção + projeto, com aquecimento)
+# ============================================================================
+
+# Botões de exemplo do chat: (rótulo, pergunta). Também são as perguntas aquecidas na partida
+EXEMPLOS_PERGUNTAS = [
+    ("📊 Projetos Atrasados", "Quais projetos estão atrasados?"),
+    ("💰 Receita Total", "Qual a receita total?"),
+    ("📋 Status Projeto", "Status do projeto 34749"),
+]
+
+# Templates consultados por intenção (as tabelas de DEPENDENCIAS decidem a invalidação)
+TEMPLATES_INTENCAO = {
+    'PROJETOS_ATRASADOS': ('projetos_atrasados_total', 'projetos_atrasados_pagina'),
+    'CONSULTA_PROJETO': ('projeto_detalhes',),
+    'CONSULTA_RECEITA': ('receita_projeto', 'resumo_geral'),
+    'CONSULTA_ALOCACAO': ('alocacoes_resumo', 'alocacoes_pagina'),
+    'CONSULTA_FATURA': ('faturas_resumo', 'faturas_pagina'),
+}
+
+@lru_cache(maxsize=None)
+def tabelas_intencao(intencao):
+    return frozenset(tabela for template in TEMPLATES_INTENCAO.get(intencao, ())
+                     for tabela in DEPENDENCIAS[template]['tabelas'])
+
+class CacheRespostas:
+    """Respostas prontas (preparar_resposta) por intenção + cod_projeto
+
+    Redações diferentes da mesma pergunta caem na mesma entrada, que já
+    traz o resultado, as figuras e o JSON do serviço: sem SQL nem montagem
+    da resposta. A frequência de cada chave decai à metade a cada
+    `meia_vida` segundos; acima de `limiar_quente` a chave é promovida e,
+    como as perguntas de aquecimento, passa a ser recarregada em segundo
+    plano a cada `intervalo` segundos, antes de expirar em `ttl`.
+    Alterações detectadas pelo monitor descartam as respostas que dependem
+    das tabelas (e projetos) alterados; as quentes voltam na próxima recarga.
+    """
+
+    def __init__(self, pool, perguntas_quentes=(), ttl=300, intervalo=60, limiar_quente=5,
+                 meia_vida=600, max_entradas=2000):
+        self.pool = pool
+        self.perguntas_quentes = list(perguntas_quentes)
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self.limiar_quente = limiar_quente
+        self.meia_vida = meia_vida
+        self.max_entradas = max_entradas
+        self.ultimo_erro = None
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> resposta pronta
+        self._interpretacoes = OrderedDict()  # (texto normalizado, versão dos nomes) -> interpretação
+        self._frequencia = {}  # chave -> contagem com decaimento
+        self._quentes = {}  # chave -> interpretação usada na recarga
+        self._fixas = set()  # chaves das perguntas de aquecimento: nunca rebaixadas
+        self._decaido_em = time.time()
+        self._contadores = {'hits': 0, 'misses': 0, 'recargas': 0, 'promovidas': 0, 'invalidacoes': 0}
+        self._parar = threading.Event()
+
+    @staticmethod
+    def chave(interpretacao):
+        """(intenção, cod_projeto), ou None se a resposta não pode ser reaproveitada"""
+        if not interpretacao['intencao']:
+            return None
+        if interpretacao['cod_projeto'] is None and interpretacao.get('projeto_por_nome'):
+            return None  # nome ambíguo: a resposta lista os candidatos desta pergunta
+        return interpretacao['intencao'], interpretacao['cod_projeto']
+
+    def iniciar(self):
+        """Aquece as perguntas quentes e agenda as recargas em segundo plano"""
+        threading.Thread(target=self._loop, name="respostas-quentes", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def _loop(self):
+        try:
+            self.aquecer()
+        except Exception as e:
+            self.ultimo_erro = str(e)
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.decair()
+                self.recarregar_quentes()
+            except Exception as e:
+                self.ultimo_erro = str(e)
+
+    def interpretar(self, pergunta, busca_nomes=None):
+        """interpretar_pergunta com memória por texto normalizado; conta a frequência da chave"""
+        memoria = (normalizar_texto(pergunta), busca_nomes.carregado_em if busca_nomes is not None else None)
+        with self._lock:
+            interpretacao = self._interpretacoes.get(memoria)
+            if interpretacao is not None:
+                self._interpretacoes.move_to_end(memoria)
+        if interpretacao is None:
+            interpretacao = interpretar_pergunta(pergunta, busca_nomes)
+            with self._lock:
+                self._interpretacoes[memoria] = interpretacao
+                while len(self._interpretacoes) > self.max_entradas:
+                    self._interpretacoes.popitem(last=False)
+        interpretacao = {**interpretacao, 'pergunta_original': pergunta}
+        chave = self.chave(interpretacao)
+        if chave is not None:
+            self._contar(chave, interpretacao)
+        return interpretacao
+
+    def _contar(self, chave, interpretacao):
+        with self._lock:
+            frequencia = self._frequencia[chave] = self._frequencia.get(chave, 0.0) + 1
+            if frequencia >= self.limiar_quente and chave not in self._quentes:
+                self._quentes[chave] = interpretacao
+                self._contadores['promovidas'] += 1
+
+    def decair(self):
+        """Aplica o decaimento das frequências e rebaixa as chaves que esfriaram"""
+        agora = time.time()
+        with self._lock:
+            fator = 0.5 ** ((agora - self._decaido_em) / self.meia_vida)
+            self._decaido_em = agora
+            for chave in list(self._frequencia):
+                self._frequencia[chave] *= fator
+                if self._frequencia[chave] < 0.5:
+                    del self._frequencia[chave]
+            for chave in [c for c in self._quentes if c not in self._fixas]:
+                if self._frequencia.get(chave, 0.0) < self.limiar_quente / 2:
+                    del self._quentes[chave]
+
+    @staticmethod
+    def _copia(resposta):
+        """Cópia da resposta guardada para quem a recebe
+
+        Dicts novos em cada nível e o DataFrame por cópia rasa (sem duplicar
+        os dados): reatribuir chaves ou colunas não altera a entrada
+        compartilhada. Figuras, paginadores e as listas do JSON são
+        compartilhados e tratados como somente leitura.
+        """
+        resultado = dict(resposta['resultado'])
+        if isinstance(resultado.get('dados'), pd.DataFrame):
+            resultado['dados'] = resultado['dados'].copy(deep=False)
+        return {**resposta, 'resultado': resultado, 'figuras': dict(resposta['figuras']),
+                'dados': dict(resposta['dados'])}
+
+    def obter(self, interpretacao):
+        """Resposta pronta da interpretação: do cache ou montada agora (e guardada), sempre em cópia"""
+        chave = self.chave(interpretacao)
+        if chave is None:
+            return preparar_resposta(interpretacao, executar_consulta(self.pool, interpretacao))
+        with self._lock:
+            resposta = self._entradas.get(chave)
+            if resposta is not None and time.time() - resposta['gerada_em'] <= self.ttl:
+                self._entradas.move_to_end(chave)
+                self._contadores['hits'] += 1
+                return self._copia(resposta)
+            self._contadores['misses'] += 1
+        # Sessões pedindo a mesma resposta ao mesmo tempo montam uma só (e recebem a mesma)
+        return self._copia(obter_single_flight().executar(f"resposta|{chave[0]}|{chave[1]}",
+                                                          lambda: self._montar(chave, interpretacao)))
+
+    def dados(self, interpretacao):
+        """JSON da resposta para o serviço, com a origem do código desta pergunta"""
+        dados = self.obter(interpretacao)['dados']
+        dados.pop('projeto_por_nome', None)
+        if interpretacao.get('projeto_por_nome'):
+            dados['projeto_por_nome'] = interpretacao['projeto_por_nome']
+        return dados
+
+    def _montar(self, chave, interpretacao):
+        resultado = executar_consulta(self.pool, interpretacao)
+        resposta = preparar_resposta(interpretacao, resultado)
+        # Erros e resultados de reserva (banco sem resposta) não ficam guardados
+        if resultado['sucesso'] and resultado['dados'] is not None and obsoleto_desde(resultado['dados']) is None:
+            self._guardar(chave, resposta)
+        return resposta
+
+    def _guardar(self, chave, resposta):
+        if self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._entradas[chave] = resposta
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def aquecer(self):
+        """Monta as respostas das perguntas quentes configuradas"""
+        busca_nomes = obter_busca_nomes(self.pool)
+        for pergunta in self.perguntas_quentes:
+            interpretacao = interpretar_pergunta(pergunta, busca_nomes)
+            chave = self.chave(interpretacao)
+            if chave is None:
+                continue
+            with self._lock:
+                self._fixas.add(chave)
+                self._quentes[chave] = interpretacao
+            self._montar(chave, interpretacao)
+
+    def recarregar_quentes(self):
+        """Remonta as respostas quentes que têm `intervalo` segundos ou mais (ou foram descartadas)"""
+        limite = time.time() - self.intervalo * 0.9
+        with self._lock:
+            pendentes = [(chave, interpretacao) for chave, interpretacao in self._quentes.items()
+                         if chave not in self._entradas or self._entradas[chave]['gerada_em'] <= limite]
+        for chave, interpretacao in pendentes:
+            self._montar(chave, interpretacao)
+            self._contadores['recargas'] += 1
+
+    def solicitar_atualizacao(self, alteracoes):
+        """Callback do monitor: descarta as respostas que leram as tabelas/projetos alterados"""
+        with self._lock:
+            for intencao, cod_projeto in list(self._entradas):
+                tabelas = tabelas_intencao(intencao)
+                if any(tabela in tabelas and (projetos is None or cod_projeto is None or cod_projeto in projetos)
+                       for tabela, projetos in alteracoes.items()):
+                    del self._entradas[(intencao, cod_projeto)]
+                    self._contadores['invalidacoes'] += 1
+
+    def metricas(self):
+        with self._lock:
+            return {'entradas': len(self._entradas), 'quentes': len(self._quentes), **self._contadores}
+
+@recurso_compartilhado
+def obter_respostas(_pool):
+    """Cache de respostas, configurado na seção [respostas] dos secrets"""
+    cfg = ler_config("respostas")
+    ativo = cfg.get("ativo", True)
+    respostas = CacheRespostas(
+        _pool,
+        perguntas_quentes=cfg.get("perguntas_quentes", [pergunta for _, pergunta in EXEMPLOS_PERGUNTAS]),
+        ttl=float(cfg.get("ttl", 300)),
+        intervalo=float(cfg.get("intervalo", 60)),
+        limiar_quente=float(cfg.get("limiar_quente", 5)),
+        meia_vida=float(cfg.get("meia_vida", 600)),
+        max_entradas=int(cfg.get("max_entradas", 2000)) if ativo else 0,
+    )
+    if ativo:
+        respostas.iniciar()
+        obter_monitor(_pool).assinar(respostas.solicitar_atualizacao)
+    return respostas
 
 # ============================================================================
 # INTERFACE PRINCIPAL
 # ============================================================================
 
+PAINEIS = ["💬 Chat RAG", "📊 Dashboards"]
+
+def renderizar_sidebar():
+    """Sidebar: conexão, estatísticas e métricas do pool. Retorna o pool (ou None)
+
+    Cada interação do chat reexecuta o script inteiro: as estatísticas são
+    lidas uma vez por sessão (e no botão de atualizar) e as métricas
+    internas só com a chave ligada.
+    """
+    st.markdown("### 🔐 Conexão")
+    
+    # Tentar conectar
+    pool = conectar_mysql()
+    
+    if pool:
+        st.success("✅ Conectado ao MySQL")
+        
+        # Estatísticas gerais
+        st.markdown("### 📊 Estatísticas")
+        
+        try:
+            if st.button("🔄 Atualizar", key="atualizar_estatisticas") or 'estatisticas' not in st.session_state:
+                st.session_state.estatisticas = get_resumo_geral(pool)
+            df_stats = st.session_state.estatisticas
+            
+            if df_stats is not None and len(df_stats) > 0:
+                stats = df_stats.iloc[0]
+                st.metric("Projetos Ativos", f"{stats['total_projetos']}")
+                st.metric("Usuários", f"{stats['usuarios']}")
+                st.metric("Receita Total", f"R$ {stats['receita_total']:,.2f}")
+                quando = obsoleto_desde(df_stats)
+                if quando is not None:
+                    st.caption(f"⏳ Dados de {quando:%d/%m %H:%M:%S} (banco sem resposta)")
+        except:
+            pass
+        
+        if st.toggle("📈 Métricas do sistema", key="mostrar_metricas"):
+            renderizar_estado(pool)
+        
+            # Parâmetros de consulta, planos e internos do pool: só com [metricas] painel_admin = true
+            if ler_config("metricas").get("painel_admin", False):
+                with st.expander("⏱️ Desempenho (admin)"):
+                    renderizar_metricas()
+                    renderizar_indices(pool)
+        
+        st.markdown("---")
+        st.markdown("### ℹ️ Sobre")
+        st.markdown("""
+        Este sistema utiliza:
+        - **RAG Architecture**
+        - **NLP** para intenções
+        - **MySQL** real
+        - **Streamlit** web
+        
+        Baseado no notebook:
+        `Rev_F_Projeto_Aplicado_RAG_COMPLETO.ipynb`
+        """)
+        
+    else:
+        st.error("❌ Não conectado")
+        st.info("Configure as credenciais MySQL em `.streamlit/secrets.toml`")
+    
+    return pool
+
+def renderizar_estado(pool):
+    """Pool, caches e cargas de fundo (só leitura de contadores em memória)"""
+    with st.expander("🔌 Pool de Conexões"):
+        m = pool.metricas()
+        st.metric("Em uso", f"{m['em_uso']}/{m['tamanho']}")
+        st.metric("Esperas", f"{m['esperas']}")
+        st.metric("Tempo de espera", f"{m['tempo_espera_total_s']:.2f}s")
+        st.caption(f"Abertas: {m['abertas']} · Reconexões: {m['reconexoes']} · "
+                   f"Espera máx.: {m['tempo_espera_max_s']:.2f}s")
+    
+    with st.expander("🗃️ Cache de Resultados"):
+        m = obter_cache().metricas()
+        consultas = m['hits'] + m['misses']
+        st.metric("Hit rate", f"{m['hits'] / consultas:.0%}" if consultas else "—")
+        st.metric("Uso", f"{m['bytes'] / 2**20:.1f} / {m['max_bytes'] / 2**20:.0f} MB")
+        st.caption(f"Hits: {m['hits']} · Misses: {m['misses']} · "
+                   f"Evictions: {m['evictions']} · Invalidações: {m.get('invalidacoes', 0)} · "
+                   f"Entradas: {m['entradas']}")
+        monitor = obter_monitor(pool)
+        if monitor.ultima_verificacao:
+            st.caption(f"🔄 Alterações verificadas às {monitor.ultima_verificacao:%H:%M:%S}")
+        busca_nomes = obter_busca_nomes(pool)
+        if busca_nomes.carregado_em:
+            m = busca_nomes.metricas()
+            st.caption(f"🔎 Nomes indexados: {m['nomes_projeto']:,} de projeto ({m['projetos']:,} projetos) · "
+                       f"{m['nomes_responsavel']:,} de responsável")
+        m = obter_respostas(pool).metricas()
+        st.caption(f"💬 Respostas prontas: {m['entradas']} ({m['quentes']} quentes) · "
+                   f"hits: {m['hits']} · misses: {m['misses']} · recargas: {m['recargas']}")
+        m = obter_figuras().metricas()
+        st.caption(f"📊 Figuras prontas: {m['entradas']} · hits: {m['hits']} · misses: {m['misses']}")
+        m = obter_receita_mensal(pool).metricas()
+        if m['atualizado_em']:
+            st.caption(f"📈 Receita mensal: {m['meses']:,} meses consolidados às {m['atualizado_em']:%H:%M:%S} "
+                       f"({m['meses_reagregados']} reagregados na última atualização)")
+        replica = pool.replica
+        if replica is not None:
+            if replica.atualizada():
+                st.caption(f"🦆 Réplica analítica de {datetime.fromtimestamp(replica.sincronizado_em):%H:%M:%S} "
+                           f"(cópia em {replica.duracao_sincronizacao:.1f}s)")
+            else:
+                st.caption(f"🦆 Réplica analítica indisponível: agregações no MySQL"
+                           + (f" ({replica.ultimo_erro})" if replica.ultimo_erro else ""))
+
+def renderizar_metricas():
+    """Latências por camada e por template, consultas lentas e exportação"""
+    metricas = obter_metricas()
+    resumo = metricas.resumo()
+    colunas = ['total', 'p50_ms', 'p95_ms', 'p99_ms']
+    
+    st.markdown("**Camadas**")
+    if resumo['camadas']:
+        st.dataframe(pd.DataFrame.from_dict(resumo['camadas'], orient='index')[colunas].round(1),
+                     use_container_width=True)
+    
+    st.markdown("**Consultas por template**")
+    if resumo['consultas']:
+        df = pd.DataFrame.from_dict(resumo['consultas'], orient='index')
+        df = df.reindex(columns=colunas + ['cache_hits', 'cache_misses', 'linhas', 'replica',
+                                           'prazos_excedidos', 'obsoletos'])
+        st.dataframe(df.round(1), use_container_width=True)
+    
+    disjuntor = obter_disjuntor().metricas()
+    reserva = obter_reserva().metricas()
+    simbolo = {'fechado': '🟢', 'meio_aberto': '🟡', 'aberto': '🔴'}[disjuntor['estado']]
+    st.caption(f"{simbolo} Disjuntor {disjuntor['estado'].replace('_', ' ')} · aberturas: {disjuntor['aberturas']} · "
+               f"recusadas: {disjuntor['recusadas']} · resultados de reserva servidos: {reserva['servidos']} "
+               f"({reserva['entradas']} guardados)")
+    
+    lentas = resumo['consultas_lentas']
+    st.markdown(f"**Consultas lentas** (≥ {metricas.limiar_lento * 1000:.0f} ms): {len(lentas)}")
+    for lenta in lentas[:10]:
+        st.caption(f"{lenta['quando']} · `{lenta['template']}` · {lenta['duracao_s'] * 1000:.0f} ms · "
+                   f"{lenta['linhas']} linhas · params {lenta['params']}")
+        if lenta['plano']:
+            st.dataframe(pd.DataFrame(lenta['plano']), use_container_width=True)
+        elif lenta['erro_explain']:
+            st.caption(f"EXPLAIN falhou: {lenta['erro_explain']}")
+    
+    col1, col2 = st.columns(2)
+    col1.download_button("📥 Prometheus", metricas.prometheus(), file_name="metricas.prom", mime="text/plain")
+    col2.download_button("📥 JSON", json.dumps(resumo, ensure_ascii=False, indent=2, default=str),
+                         file_name="metricas.json", mime="application/json")
+
+def renderizar_indices(pool):
+    """Índices recomendados ausentes, índices sem uso e planos com problema"""
+    st.markdown("**Índices**")
+    diagnostico = obter_diagnostico_indices(pool)
+    if diagnostico is None:
+        return
+    if 'erro' in diagnostico:
+        st.caption(f"Diagnóstico indisponível: {diagnostico['erro']}")
+        return
+    
+    pendentes = [i for i in diagnostico['recomendados'] if i['situacao'] != 'ok']
+    if pendentes:
+        st.warning(f"⚠️ {len(pendentes)} índice(s) recomendado(s) ausente(s) ou sem cobertura")
+        for indice in pendentes:
+            st.caption(f"`{indice['tabela']}({', '.join(indice['colunas'])})` · {indice['situacao']}")
+        st.download_button("📥 Migração SQL", gerar_migracao(diagnostico),
+                           file_name="migracao_indices.sql", mime="text/plain")
+    else:
+        st.caption("✅ Todos os índices recomendados existem")
+    if diagnostico['sem_uso']:
+        st.caption("Sem uso desde o início do servidor: "
+                   + ", ".join(f"`{t}.{i}`" for t, i in diagnostico['sem_uso']))
+    if diagnostico['redundantes']:
+        st.caption("Redundantes: " + ", ".join(f"`{t}.{i}` (prefixo de `{o}`)"
+                                               for t, i, o in diagnostico['redundantes']))
+    for template, plano in diagnostico['planos'].items():
+        if plano['problemas']:
+            st.caption(f"`{template}`: {'; '.join(plano['problemas'])}")
+
+def painel_chat(pool):
+    """Chat RAG: cada interação custa só a interpretação e uma consulta"""
+    st.subheader("Faça perguntas sobre os projetos")
+    respostas = obter_respostas(pool)
+    
+    # Exemplos
+    st.markdown("**💡 Exemplos de perguntas:**")
+    for coluna, (rotulo, exemplo) in zip(st.columns(len(EXEMPLOS_PERGUNTAS)), EXEMPLOS_PERGUNTAS):
+        if coluna.button(rotulo):
+            st.session_state.pergunta = exemplo
+    
+    # Input dentro de um form: digitar não dispara rerun, só o envio
+    with st.form("form_pergunta", border=False):
+        pergunta = st.text_input(
+            "Digite sua pergunta:",
+            value=st.session_state.get('pergunta', ''),
+            placeholder="Ex: Quais projetos estão atrasados?"
+        )
+        enviado = st.form_submit_button("🚀 Enviar", use_container_width=True)
+    
+    if enviado:
+        if pergunta:
+            # Nova pergunta: guarda a interpretação e volta a paginação ao início
+            st.session_state.interpretacao = respostas.interpretar(pergunta, obter_busca_nomes(pool))
+            for chave in [k for k in st.session_state if str(k).startswith("paginas_")]:
+                del st.session_state[chave]
+        else:
+            st.session_state.interpretacao = None
+            st.warning("⚠️ Digite uma pergunta!")
+    
+    # A resposta continua na tela nos reruns da paginação (consultas vêm do cache)
+    interpretacao = st.session_state.get('interpretacao')
+    if interpretacao:
+        with st.spinner("🤖 Processando..."):
+            # Fluxo RAG completo
+            if interpretacao['intencao']:
+                st.info(f"🧠 **Intenção detectada:** {interpretacao['intencao']}")
+                encontrado = interpretacao.get('projeto_por_nome')
+                if encontrado and interpretacao['cod_projeto']:
+                    origem = "do responsável" if encontrado['tipo'] == 'responsavel' else "do projeto"
+                    st.caption(f"🔎 Projeto {interpretacao['cod_projeto']} identificado pelo nome {origem} "
+                               f"\"{encontrado['nome']}\" (similaridade {encontrado['similaridade']:.0%})")
+                
+                resposta = respostas.obter(interpretacao)
+                gerar_resposta(interpretacao, resposta['resultado'], resposta['figuras'])
+            else:
+                st.warning("🤔 Não consegui entender a pergunta. Tente reformular.")
+
+def painel_dashboards(pool):
+    """Dashboards gerais: consultas e figuras só rodam com o painel aberto"""
+    st.subheader("📊 Dashboards Gerais")
+    
+    # Dados dos dashboards, buscados em paralelo
+    painel = carregar_dashboard(pool)
+    avisar_obsoleto(painel['atrasados'], painel['resumo'])
+    
+    # Dashboard de projetos atrasados
+    df_atrasados = painel['atrasados']
+    if df_atrasados is not None and len(df_atrasados) > 0:
+        st.markdown("### 🔴 Top 10 Projetos Mais Atrasados")
+        
+        fig = obter_figuras().figura(px.bar, df_atrasados, 
+                    x='nom_projeto', 
+                    y='dias_atraso',
+                    title='Projetos por Dias de Atraso',
+                    labels={'nom_projeto': 'Projeto', 'dias_atraso': 'Dias de Atraso'},
+                    color='dias_atraso',
+                    color_continuous_scale='Reds',
+                    layout={'xaxis_tickangle': -45})
+        st.plotly_chart(fig, use_container_width=True)
+    
+    # Dashboard de receitas
+    df_receita = painel['resumo']
+    if df_receita is not None and len(df_receita) > 0:
+        st.markdown("### 💰 Visão Geral de Receitas")
+        
+        col1, col2, col3 = st.columns(3)
+        rec = df_receita.iloc[0]
+        col1.metric("Total de Projetos", f"{rec['total_projetos']}")
+        col2.metric("Receita Total", f"R$ {rec['receita_total']:,.2f}")
+        col3.metric("Média por Projeto", f"R$ {rec['receita_media']:,.2f}")
+    
+    renderizar_receita_mensal(pool)
+
+def renderizar_receita_mensal(pool):
+    """Receita por mês de faturamento, por status e por responsável (só lê a base consolidada)"""
+    st.markdown("### 📈 Receita Mensal")
+    receita = obter_receita_mensal(pool)
+    meses = receita.meses()
+    if not meses:
+        st.info("⏳ Consolidando a receita mensal..."
+                + (f" ({receita.ultimo_erro})" if receita.ultimo_erro else ""))
+        return
+    
+    # Padrão: três anos para trás e um para frente (faturas programadas), dentro do que existe
+    hoje = date.today().year * 100 + date.today().month
+    inicio = meses[bisect_left(meses, min(max(hoje - 300, meses[0]), meses[-1]))]
+    fim = meses[bisect_left(meses, min(max(hoje + 100, meses[0]), meses[-1]))]
+    col1, col2 = st.columns([2, 1])
+    if len(meses) > 1:
+        rotulos = {f"{mes % 100:02d}/{mes // 100}": mes for mes in meses}
+        periodo = col1.select_slider("Período", options=list(rotulos), key="receita_mensal_periodo",
+                                     value=tuple(f"{mes % 100:02d}/{mes // 100}" for mes in (inicio, fim)))
+        inicio, fim = (rotulos[rotulo] for rotulo in periodo)
+    todos_status = receita.status()
+    status = col2.multiselect("Status", todos_status, default=todos_status, key="receita_mensal_status")
+    
+    # Períodos longos: um ponto por trimestre ou ano em vez de centenas de meses
+    figuras = obter_figuras()
+    por_status, periodo = reduzir_pontos(receita.serie('status', inicio, fim, status),
+                                         'mes', ['status'], ['faturas', 'valor'])
+    fig = figuras.figura(px.bar, por_status, x='mes', y='valor', color='status',
+                         title='Receita por Status de Faturamento',
+                         labels={'mes': periodo, 'valor': 'Valor (R$)', 'status': 'Status'},
+                         category_orders={'status': ['Pago', 'Programado']})
+    st.plotly_chart(fig, use_container_width=True)
+    
+    por_responsavel, periodo = reduzir_pontos(receita.serie('responsavel', inicio, fim, status, maiores=10),
+                                              'mes', ['responsavel'], ['faturas', 'valor'])
+    fig = figuras.figura(px.line, por_responsavel, x='mes', y='valor', color='responsavel',
+                         title='Receita dos 10 Maiores Responsáveis no Período',
+                         labels={'mes': periodo, 'valor': 'Valor (R$)', 'responsavel': 'Responsável'})
+    st.plotly_chart(fig, use_container_width=True)
+    
+    m = receita.metricas()
+    st.caption(f"Consolidado às {m['atualizado_em']:%d/%m %H:%M:%S} · {m['meses']:,} meses · "
+               f"{m['linhas']:,} linhas mês × projeto × status · faturas sem data de faturamento não entram")
+
 def main():
     # Header
     st.markdown("<h1>🤖 Agente RAG - NetProject</h1>", unsafe_allow_html=True)
@@ -489,124 +4553,18 @@ def main():
     
     # Sidebar
     with st.sidebar:
-        st.markdown("### 🔐 Conexão")
-        
-        # Tentar conectar
-        conn = conectar_mysql()
-        
-        if conn:
-            st.success("✅ Conectado ao MySQL")
-            
-            # Estatísticas gerais
-            st.markdown("### 📊 Estatísticas")
-            
-            try:
-                df_stats = executar_query(conn, """
-                    SELECT 
-                        COUNT(DISTINCT p.cod_projeto) as projetos,
-                        COUNT(DISTINCT u.cod_usuario) as usuarios,
-                        COALESCE(SUM(r.total_valor_bruto), 0) as receita
-                    FROM projeto p
-                    LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
-                    LEFT JOIN receita r ON p.cod_projeto = r.cod_projeto
-                    WHERE p.flg_status = 1
-                """)
-                
-                if df_stats is not None and len(df_stats) > 0:
-                    stats = df_stats.iloc[0]
-                    st.metric("Projetos Ativos", f"{stats['projetos']}")
-                    st.metric("Usuários", f"{stats['usuarios']}")
-                    st.metric("Receita Total", f"R$ {stats['receita']:,.2f}")
-            except:
-                pass
-            
-            st.markdown("---")
-            st.markdown("### ℹ️ Sobre")
-            st.markdown("""
-            Este sistema utiliza:
-            - **RAG Architecture**
-            - **NLP** para intenções
-            - **MySQL** real
-            - **Streamlit** web
-            
-            Baseado no notebook:
-            `Rev_F_Projeto_Aplicado_RAG_COMPLETO.ipynb`
-            """)
-            
-        else:
-            st.error("❌ Não conectado")
-            st.info("Configure as credenciais MySQL em `.streamlit/secrets.toml`")
+        pool = renderizar_sidebar()
     
     # Área principal
-    if conn:
-        # Tabs
-        tab1, tab2 = st.tabs(["💬 Chat RAG", "📊 Dashboards"])
+    if pool:
+        # Só o painel selecionado é executado (st.tabs executaria os dois a cada rerun)
+        painel = st.radio("Painel", PAINEIS, horizontal=True,
+                          label_visibility="collapsed", key="painel")
         
-        with tab1:
-            st.subheader("Faça perguntas sobre os projetos")
-            
-            # Exemplos
-            st.markdown("**💡 Exemplos de perguntas:**")
-            col1, col2, col3 = st.columns(3)
-            
-            if col1.button("📊 Projetos Atrasados"):
-                st.session_state.pergunta = "Quais projetos estão atrasados?"
-            if col2.button("💰 Receita Total"):
-                st.session_state.pergunta = "Qual a receita total?"
-            if col3.button("📋 Status Projeto"):
-                st.session_state.pergunta = "Status do projeto 34749"
-            
-            # Input
-            pergunta = st.text_input(
-                "Digite sua pergunta:",
-                value=st.session_state.get('pergunta', ''),
-                placeholder="Ex: Quais projetos estão atrasados?"
-            )
-            
-            if st.button("🚀 Enviar", use_container_width=True):
-                if pergunta:
-                    with st.spinner("🤖 Processando..."):
-                        # Fluxo RAG completo
-                        interpretacao = interpretar_pergunta(pergunta)
-                        
-                        if interpretacao['intencao']:
-                            st.info(f"🧠 **Intenção detectada:** {interpretacao['intencao']}")
-                            
-                            resultado = executar_consulta(conn, interpretacao)
-                            gerar_resposta(interpretacao, resultado)
-                        else:
-                            st.warning("🤔 Não consegui entender a pergunta. Tente reformular.")
-                else:
-                    st.warning("⚠️ Digite uma pergunta!")
-        
-        with tab2:
-            st.subheader("📊 Dashboards Gerais")
-            
-            # Dashboard de projetos atrasados
-            df_atrasados = get_projetos_atrasados(conn)
-            if df_atrasados is not None and len(df_atrasados) > 0:
-                st.markdown("### 🔴 Top 10 Projetos Mais Atrasados")
-                
-                fig = px.bar(df_atrasados, 
-                            x='nom_projeto', 
-                            y='dias_atraso',
-                            title='Projetos por Dias de Atraso',
-                            labels={'nom_projeto': 'Projeto', 'dias_atraso': 'Dias de Atraso'},
-                            color='dias_atraso',
-                            color_continuous_scale='Reds')
-                fig.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Dashboard de receitas
-            df_receita = get_receita_total(conn)
-            if df_receita is not None and len(df_receita) > 0:
-                st.markdown("### 💰 Visão Geral de Receitas")
-                
-                col1, col2, col3 = st.columns(3)
-                rec = df_receita.iloc[0]
-                col1.metric("Total de Projetos", f"{rec['total_projetos']}")
-                col2.metric("Receita Total", f"R$ {rec['receita_total']:,.2f}")
-                col3.metric("Média por Projeto", f"R$ {rec['receita_media']:,.2f}")
+        if painel == PAINEIS[0]:
+            painel_chat(pool)
+        else:
+            painel_dashboards(pool)
     
     else:
         st.error("❌ Não foi possível conectar ao banco de dados")
@@ -0,0 +1,47 @@
+"""
+Fixtures dos testes: base sintética pequena no SQLite (benchmarks/dados_sinteticos.py)
+atrás do mesmo PoolSQLite dos benchmarks (benchmarks/ambiente_sqlite.py)
+"""
+
+import logging
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+logging.disable(logging.WARNING)  # avisos do Streamlit fora do `streamlit run`
+
+import streamlit_app as app  # noqa: E402
+from ambiente_sqlite import PoolSQLite, preparar_recursos  # noqa: E402
+from dados_sinteticos import carregar_sqlite, conectar_sqlite, gerar  # noqa: E402
+
+PROJETOS = 500
+
+@pytest.fixture(scope='session')
+def base(tmp_path_factory):
+    """Caminho do arquivo SQLite com a base sintética"""
+    caminho = str(tmp_path_factory.mktemp('base') / 'base.sqlite')
+    carregar_sqlite(gerar(PROJETOS, semente=7), caminho)
+    return caminho
+
+@pytest.fixture
+def caminho(base):
+    """Arquivo usado por `db` e `pool`; testes que alteram a base sobrescrevem com uma cópia"""
+    return base
+
+@pytest.fixture
+def db(caminho):
+    """Conexão direta ao SQLite, para os totais esperados"""
+    conexao = conectar_sqlite(caminho)
+    yield conexao
+    conexao.close()
+
+@pytest.fixture
+def pool(caminho, monkeypatch):
+    """PoolMySQL sobre a base, com cache e singletons do app novos a cada teste"""
+    pool = PoolSQLite({'caminho': caminho})
+    preparar_recursos(pool, app.CacheMemoria(), fixar=monkeypatch.setattr)
+    return pool
@@ -0,0 +1,55 @@
+"""Diagnóstico e migração de índices (analisar_indices) sobre a base sintética"""
+
+import shutil
+
+import pytest
+
+import streamlit_app as app
+
+# A base sintética só tem os índices das chaves estrangeiras (dados_sinteticos.INDICES)
+SITUACAO_INICIAL = {
+    'idx_receita_projeto_valor': 'parcial',
+    'idx_pagamento_receita_status': 'parcial',
+    'idx_alocacao_projeto_usuario': 'parcial',
+    'idx_projeto_status_prevista': 'ausente',
+    'idx_pagamento_faturamento': 'ausente',
+}
+
+@pytest.fixture
+def caminho(base, tmp_path):
+    """Cópia da base para o `pool` do conftest: os testes criam índices"""
+    copia = str(tmp_path / 'indices.sqlite')
+    shutil.copyfile(base, copia)
+    return copia
+
+def situacoes(diagnostico):
+    return {indice['nome']: indice['situacao'] for indice in diagnostico['recomendados']}
+
+def test_recomendados_ausentes_na_base_sem_indices(pool):
+    diagnostico = app.diagnosticar_indices(pool)
+    assert situacoes(diagnostico) == SITUACAO_INICIAL
+    assert diagnostico['redundantes'] == []
+    # Sem o índice de status/previsão, a lista de atrasados varre projeto
+    assert any('varredura completa de p' in problema
+               for problema in diagnostico['planos']['projetos_atrasados_total']['problemas'])
+
+def test_migracao_cria_so_os_pendentes(pool):
+    migracao = app.gerar_migracao(app.diagnosticar_indices(pool), 'sqlite')
+    for nome in SITUACAO_INICIAL:
+        assert f"CREATE INDEX IF NOT EXISTS {nome} " in migracao
+
+def test_aplicar_deixa_todos_ok_e_e_idempotente(pool):
+    criados = app.aplicar_indices(pool, app.diagnosticar_indices(pool), 'sqlite')
+    assert sorted(criados) == sorted(SITUACAO_INICIAL)
+
+    diagnostico = app.diagnosticar_indices(pool)
+    assert set(situacoes(diagnostico).values()) == {'ok'}
+    # Os índices das chaves estrangeiras viram prefixo dos recomendados
+    assert sorted(nome for _, nome, _ in diagnostico['redundantes']) == [
+        'idx_alocacao_projeto', 'idx_pagamento_receita', 'idx_receita_projeto']
+    for template in ('projetos_atrasados_total', 'projetos_atrasados_pagina', 'receita_projeto',
+                     'alocacoes_pagina', 'faturas_pagina'):
+        assert diagnostico['planos'][template]['problemas'] == [], template
+
+    assert app.aplicar_indices(pool, diagnostico, 'sqlite') == []
+    assert "Nada a fazer" in app.gerar_migracao(diagnostico, 'sqlite')
@@ -0,0 +1,157 @@
+"""Paginação keyset (PaginadorKeyset) conferida contra a listagem inteira com o mesmo ORDER BY"""
+
+import shutil
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import streamlit_app as app
+from dados_sinteticos import conectar_sqlite
+
+TAMANHO = 7  # páginas pequenas: muitas fronteiras, inclusive no meio de empates
+
+FATURAS = """
+    SELECT rp.cod_receita_pagamento
+    FROM receita_pagamento rp
+    JOIN receita r ON rp.cod_receita = r.cod_receita
+    WHERE r.cod_projeto = ?
+    ORDER BY rp.dth_faturamento DESC, rp.cod_receita_pagamento DESC"""
+
+ALOCACOES = """
+    SELECT u.nom_usuario
+    FROM DWDT_RECURSO_ALOCACAO ra
+    JOIN usuario u ON ra.cod_usuario = u.cod_usuario
+    WHERE ra.cod_projeto = ?
+    GROUP BY u.nom_usuario
+    ORDER BY COALESCE(SUM(ra.num_horas_aloc), 0) DESC, u.nom_usuario"""
+
+ATRASADOS = """
+    SELECT cod_projeto
+    FROM projeto
+    WHERE flg_status = 1
+      AND dth_prevista < CURDATE()
+    ORDER BY dth_prevista, cod_projeto"""
+
+@pytest.fixture
+def caminho(base, tmp_path):
+    """Cópia da base com empates na chave de ordenação das três listagens"""
+    copia = str(tmp_path / 'paginacao.sqlite')
+    shutil.copyfile(base, copia)
+    db = conectar_sqlite(copia)
+    # 30 atrasados com a mesma previsão
+    db.execute("""
+        UPDATE projeto SET dth_prevista = '2020-01-01 00:00:00'
+        WHERE cod_projeto IN (SELECT cod_projeto FROM projeto
+                              WHERE flg_status = 1 AND dth_prevista < CURDATE()
+                              ORDER BY cod_projeto LIMIT 30)""")
+    # 20 faturas do projeto com mais faturas na mesma data (as sem data já vêm da base)
+    db.execute("""
+        UPDATE receita_pagamento SET dth_faturamento = '2023-06-01 00:00:00'
+        WHERE cod_receita_pagamento IN (
+            SELECT rp.cod_receita_pagamento
+            FROM receita_pagamento rp
+            JOIN receita r ON rp.cod_receita = r.cod_receita
+            WHERE r.cod_projeto = (SELECT r.cod_projeto FROM receita r
+                                   JOIN receita_pagamento rp ON rp.cod_receita = r.cod_receita
+                                   GROUP BY r.cod_projeto ORDER BY COUNT(*) DESC, r.cod_projeto LIMIT 1)
+              AND rp.dth_faturamento IS NOT NULL
+            ORDER BY rp.cod_receita_pagamento LIMIT 20)""")
+    # Mesmas horas em todas as alocações dos projetos com mais pessoas
+    db.execute("""
+        UPDATE DWDT_RECURSO_ALOCACAO SET num_horas_aloc = 8
+        WHERE cod_projeto IN (SELECT cod_projeto FROM DWDT_RECURSO_ALOCACAO
+                              GROUP BY cod_projeto ORDER BY COUNT(DISTINCT cod_usuario) DESC, cod_projeto
+                              LIMIT 3)""")
+    db.commit()
+    db.close()
+    return copia
+
+def percorrer(paginador):
+    """[(DataFrame, proxima)] de todas as páginas, seguindo o cursor até acabar"""
+    paginador.tamanho = TAMANHO
+    paginas, chave = [], None
+    while True:
+        df, chave = paginador.pagina(chave)
+        paginas.append((df, chave))
+        if chave is None:
+            return paginas
+        assert len(paginas) < 10_000, "o cursor não avança"
+
+def conferir(paginas, coluna, esperado):
+    """Páginas cheias até a última e, juntas, exatamente a listagem sem paginação"""
+    assert all(len(df) == TAMANHO for df, _ in paginas[:-1])
+    assert len(paginas[-1][0]) <= TAMANHO
+    obtido = [valor for df, _ in paginas for valor in df[coluna].tolist()]
+    assert len(obtido) == len(set(obtido))
+    assert obtido == esperado
+
+def projetos_maior_fanout(db, quantidade=5):
+    return [cod for cod, in db.execute("""
+        SELECT r.cod_projeto
+        FROM receita r
+        JOIN receita_pagamento rp ON rp.cod_receita = r.cod_receita
+        GROUP BY r.cod_projeto
+        ORDER BY COUNT(*) DESC, r.cod_projeto
+        LIMIT ?""", (quantidade,))]
+
+def projetos_mais_pessoas(db, quantidade=5):
+    return [cod for cod, in db.execute("""
+        SELECT cod_projeto FROM DWDT_RECURSO_ALOCACAO
+        GROUP BY cod_projeto
+        ORDER BY COUNT(DISTINCT cod_usuario) DESC, cod_projeto
+        LIMIT ?""", (quantidade,))]
+
+def test_faturas_paginas_igual_a_listagem(pool, db):
+    for cod_projeto in projetos_maior_fanout(db):
+        esperado = [cod for cod, in db.execute(FATURAS, (cod_projeto,))]
+        paginas = percorrer(app.paginador_faturas(pool, cod_projeto))
+        conferir(paginas, 'cod_fatura', esperado)
+
+def test_faturas_empates_e_sem_data_por_ultimo(pool, db):
+    cod_projeto = projetos_maior_fanout(db, 1)[0]
+    paginas = percorrer(app.paginador_faturas(pool, cod_projeto))
+    datas = [data for df, _ in paginas for data in df['data_faturamento']]
+    # As faturas sem data vêm todas no fim, depois de todas as datadas
+    sem_data = [pd.isna(data) for data in datas]
+    assert sum(sem_data) > TAMANHO
+    assert sem_data == sorted(sem_data)
+    # Cursores no meio do grupo empatado e no meio das sem data
+    chaves = [chave for _, chave in paginas[:-1]]
+    assert sum(data == datetime(2023, 6, 1) for data, _ in chaves) >= 2
+    assert sum(data is None for data, _ in chaves) >= 1
+
+def test_alocacoes_paginas_igual_a_listagem(pool, db):
+    for cod_projeto in projetos_mais_pessoas(db):
+        esperado = [nome for nome, in db.execute(ALOCACOES, (cod_projeto,))]
+        paginas = percorrer(app.paginador_alocacoes(pool, cod_projeto))
+        conferir(paginas, 'nom_usuario', esperado)
+        assert len(paginas) > 1
+
+def test_atrasados_paginas_igual_a_listagem(pool, db):
+    esperado = [cod for cod, in db.execute(ATRASADOS)]
+    paginas = percorrer(app.paginador_atrasados(pool))
+    conferir(paginas, 'cod_projeto', esperado)
+    assert sum(data == datetime(2020, 1, 1) for data, _ in (chave for _, chave in paginas[:-1])) >= 2
+
+def test_projeto_sem_faturas_tem_uma_pagina_vazia(pool, db):
+    cod_projeto, = db.execute("""
+        SELECT p.cod_projeto FROM projeto p
+        WHERE NOT EXISTS (SELECT 1 FROM receita r WHERE r.cod_projeto = p.cod_projeto)
+        LIMIT 1""").fetchone()
+    paginas = percorrer(app.paginador_faturas(pool, cod_projeto))
+    assert len(paginas) == 1 and paginas[0][0].empty and paginas[0][1] is None
+
+def test_proxima_volta_como_parametro_e_repete_a_pagina(pool, db):
+    cod_projeto = projetos_maior_fanout(db, 1)[0]
+    paginas = percorrer(app.paginador_faturas(pool, cod_projeto))
+    for (_, chave), (seguinte, _) in zip(paginas, paginas[1:]):
+        # Tipos Python (não numpy/pandas), aceitos pelo conector como parâmetros
+        data, cod_fatura = chave
+        assert data is None or type(data) is datetime
+        assert type(cod_fatura) is int
+        # Um paginador novo, só com o cursor, devolve a mesma página seguinte
+        novo = app.paginador_faturas(pool, cod_projeto)
+        novo.tamanho = TAMANHO
+        df, _ = novo.pagina(chave)
+        assert df['cod_fatura'].tolist() == seguinte['cod_fatura'].tolist()
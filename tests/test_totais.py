@@ -0,0 +1,72 @@
+"""Totais de receita dos templates conferidos contra somas diretas nas tabelas"""
+
+import pytest
+
+import streamlit_app as app
+
+def projetos_maior_fanout(db, quantidade=20):
+    """Projetos com mais pagamentos (onde um JOIN antes do SUM multiplicaria a receita)"""
+    return [cod for cod, in db.execute("""
+        SELECT r.cod_projeto
+        FROM receita r
+        JOIN receita_pagamento rp ON rp.cod_receita = r.cod_receita
+        GROUP BY r.cod_projeto
+        ORDER BY COUNT(*) DESC, r.cod_projeto
+        LIMIT ?""", (quantidade,))]
+
+def receita_esperada(db, cod_projeto):
+    total, = db.execute("SELECT COALESCE(SUM(total_valor_bruto), 0) FROM receita WHERE cod_projeto = ?",
+                        (cod_projeto,)).fetchone()
+    pagamentos = dict(db.execute("""
+        SELECT rp.flg_status_fatura, SUM(rp.vlr_bruto)
+        FROM receita_pagamento rp
+        JOIN receita r ON rp.cod_receita = r.cod_receita
+        WHERE r.cod_projeto = ?
+        GROUP BY rp.flg_status_fatura""", (cod_projeto,)).fetchall())
+    return {
+        'receita_total': total,
+        'receita_paga': pagamentos.get('Pago', 0),
+        'receita_programada': pagamentos.get('Programado', 0),
+        'receita_faturada': pagamentos.get('Pago', 0) + pagamentos.get('Programado', 0),
+    }
+
+def test_receita_projeto_igual_a_soma_direta(pool, db):
+    codigos = projetos_maior_fanout(db)
+    assert codigos
+    for cod_projeto in codigos:
+        esperado = receita_esperada(db, cod_projeto)
+        linha = app.get_receita_projeto(pool, cod_projeto).iloc[0]
+        for coluna in ('receita_total', 'receita_paga', 'receita_programada'):
+            assert linha[coluna] == pytest.approx(esperado[coluna], abs=0.005), (cod_projeto, coluna)
+
+def test_projeto_detalhes_igual_a_soma_direta(pool, db):
+    for cod_projeto in projetos_maior_fanout(db):
+        esperado = receita_esperada(db, cod_projeto)
+        linha = app.consultar(pool, 'projeto_detalhes', cod_projeto, cod_projeto, cod_projeto).iloc[0]
+        for coluna in ('receita_total', 'receita_faturada'):
+            assert linha[coluna] == pytest.approx(esperado[coluna], abs=0.005), (cod_projeto, coluna)
+
+def test_projeto_sem_receita_tem_totais_zerados(pool, db):
+    cod_projeto, = db.execute("""
+        SELECT p.cod_projeto FROM projeto p
+        WHERE NOT EXISTS (SELECT 1 FROM receita r WHERE r.cod_projeto = p.cod_projeto)
+        LIMIT 1""").fetchone()
+    linha = app.get_receita_projeto(pool, cod_projeto).iloc[0]
+    assert (linha['receita_total'], linha['receita_paga'], linha['receita_programada']) == (0, 0, 0)
+
+def test_resumo_geral_igual_a_soma_direta(pool, db):
+    projetos, usuarios = db.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT u.cod_usuario)
+        FROM projeto p
+        LEFT JOIN usuario u ON p.cod_responsavel = u.cod_usuario
+        WHERE p.flg_status = 1""").fetchone()
+    receita, media = db.execute("""
+        SELECT COALESCE(SUM(r.total_valor_bruto), 0), COALESCE(AVG(r.total_valor_bruto), 0)
+        FROM receita r
+        JOIN projeto p ON p.cod_projeto = r.cod_projeto
+        WHERE p.flg_status = 1""").fetchone()
+    resumo = app.get_resumo_geral(pool).iloc[0]
+    assert resumo['total_projetos'] == projetos
+    assert resumo['usuarios'] == usuarios
+    assert resumo['receita_total'] == pytest.approx(receita, abs=0.005)
+    assert resumo['receita_media'] == pytest.approx(media, abs=0.005)